@@ -141,6 +141,20 @@ class FeedbackGenerationResponse(BaseModel):
     source: FeedbackSource = Field(description="Indicates if feedback is AI-generated or fallback")
 
 
+class PreGrade(BaseModel):
+    """Diagnosis-independent part of the feedback, computed while the interview is in progress"""
+    clues: list[MissedClue]
+    strengths: list[str]
+    improvements: list[str]
+    decision_tree: DecisionTreeNode = Field(description="Tree without the final diagnosis node")
+    question_count: int
+    ruled_out: list[str] = Field(default_factory=list)
+    key_questions: int = Field(ge=0, le=20)
+    right_tests: int = Field(ge=0, le=20)
+    time_efficiency: int = Field(ge=0, le=10)
+    ruled_out_differentials: int = Field(ge=0, le=10)
+
+
 # Required for self-referencing model
 DecisionTreeNode.model_rebuild()
 
@@ -4,8 +4,10 @@ AI Service for patient simulation and feedback generation using Claude
 
 import os
 import json
+import time
+import asyncio
 import anthropic
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from ai_schemas import (
     PatientSimulationRequest,
@@ -19,14 +21,220 @@ from ai_schemas import (
     FeedbackSource,
     HintGenerationRequest,
     HintGenerationResponse,
+    PreGrade,
+)
+from differential import disease_display_name, get_differential_model, mentioned_symptoms, same_disease
+import metrics
+from response_cache import ResponseCache
+from prompt_cache import CompiledPrompt, PromptCache
+from usage import UsageTracker
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from llm_limiter import (
+    LLMGovernor,
+    backoff_delay,
+    PRIORITY_PATIENT,
+    PRIORITY_HINT,
+    PRIORITY_COMPARE,
+    PRIORITY_FEEDBACK,
 )
 
-# Configure Anthropic client
-client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY", ""))
+# Configure Anthropic client. Retries are handled by call_claude so they go through
+# the shared governor instead of the SDK's own per-request retry loop.
+ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
+client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
 
 # Model to use - claude-3-5-haiku is fast and cost-effective
 CLAUDE_MODEL = "claude-3-5-haiku-20241022"
 
+# Shared limits for every LLM call made by this process
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", 50))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("LLM_TOKENS_PER_MINUTE", 50000))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+
+governor = LLMGovernor(LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+
+# Token, cost and latency totals per endpoint / case / model, for /api/admin/usage
+usage_tracker = UsageTracker(window_seconds=int(os.environ.get("USAGE_WINDOW_SECONDS", 3600)))
+
+# Replies to opening questions, shared across students interviewing the same case
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 2000)),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 3600)),
+    variants=int(os.environ.get("RESPONSE_CACHE_VARIANTS", 3)),
+)
+
+# Prompt templates with each case's data already rendered in; a turn only adds the conversation
+prompt_cache = PromptCache(max_entries=int(os.environ.get("PROMPT_CACHE_MAX_ENTRIES", 1000)))
+
+# Time to first token (including queueing) after which the local answer is served instead.
+# 0 disables hedging for that endpoint.
+LATENCY_BUDGET_PATIENT = float(os.environ.get("LATENCY_BUDGET_PATIENT_MS", 0)) / 1000
+LATENCY_BUDGET_HINT = float(os.environ.get("LATENCY_BUDGET_HINT_MS", 0)) / 1000
+
+# Shared by patient responses, feedback, hints and diagnosis comparison: when the provider
+# is degraded every caller skips straight to its rule-based fallback
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", 5)),
+    reset_timeout=float(os.environ.get("LLM_BREAKER_RESET_SECONDS", 30)),
+    on_state_change=lambda state: metrics.CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[state]),
+)
+if not ANTHROPIC_API_KEY:
+    breaker.force_open()
+
+
+def estimate_request_tokens(kwargs: dict) -> int:
+    """Rough token budget for a request: ~4 characters per token plus max_tokens"""
+    chars = len(kwargs.get("system") or "")
+    for message in kwargs.get("messages", []):
+        chars += len(message.get("content", "")) if isinstance(message.get("content"), str) else 0
+    return chars // 4 + kwargs.get("max_tokens", 0)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in (429, 529)
+
+
+class LatencyBudgetExceeded(Exception):
+    """The LLM produced no output within the endpoint's latency budget"""
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """Errors that say the provider (or our access to it) is degraded, not that the request was bad.
+
+    Rate limits are left to the governor's retry-after pause rather than opening the circuit.
+    """
+    if isinstance(error, anthropic.RateLimitError) or getattr(error, "status_code", None) == 429:
+        return False
+    if is_retryable(error) or isinstance(error, (anthropic.AuthenticationError, anthropic.PermissionDeniedError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code >= 500
+
+
+async def stream_message(deadline: Optional[float], on_text: Optional[Callable[[str], Awaitable]] = None, **kwargs):
+    """Stream a message, passing text chunks to `on_text` as they arrive.
+
+    Gives up with LatencyBudgetExceeded if the first token hasn't arrived by `deadline` (loop time).
+    """
+    loop = asyncio.get_running_loop()
+    async with client.messages.stream(model=CLAUDE_MODEL, **kwargs) as stream:
+        text = stream.text_stream.__aiter__()
+        try:
+            if deadline is None:
+                first = await text.__anext__()
+            else:
+                first = await asyncio.wait_for(text.__anext__(), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            # Leaving the context closes the HTTP stream, so the slow call stops here
+            raise LatencyBudgetExceeded("no output within budget")
+        except StopAsyncIteration:
+            return await stream.get_final_message()
+        if on_text is not None:
+            await on_text(first)
+            async for chunk in text:
+                await on_text(chunk)
+        return await stream.get_final_message()
+
+
+async def call_claude(endpoint: str, priority: int, budget: Optional[float] = None,
+                      case_id: Optional[str] = None, on_text: Optional[Callable[[str], Awaitable]] = None,
+                      **kwargs):
+    """Single entry point for Claude calls.
+
+    Waits for a governor slot (by priority), times the call, records token usage and
+    retries rate limits and overloads with jittered exponential backoff, honoring
+    retry-after. Raises CircuitOpenError without calling out while the breaker is open.
+    With a `budget` (seconds), streams the reply and raises LatencyBudgetExceeded if the
+    first token isn't in by then, so the caller can serve its local answer. With `on_text`,
+    streams the reply and awaits on_text(chunk) for each text delta; a call that fails after
+    text was sent is not retried. Token usage, cost and latency are recorded per endpoint
+    and `case_id` in usage_tracker.
+    """
+    emitted = False
+
+    async def forward_text(chunk: str):
+        nonlocal emitted
+        emitted = True
+        await on_text(chunk)
+
+    estimated_tokens = estimate_request_tokens(kwargs)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget if budget else None
+    # Retries of one call count as a single breaker failure, recorded only once the call gives up
+    provider_failed = False
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not breaker.allow_request():
+            if provider_failed:
+                breaker.record_failure()
+            metrics.LLM_CALLS.inc(endpoint=endpoint, outcome="short_circuited")
+            raise CircuitOpenError(f"LLM circuit is {breaker.state}")
+        try:
+            with metrics.stage("llm_queue", endpoint):
+                if deadline is None:
+                    await governor.acquire(priority, estimated_tokens)
+                else:
+                    await asyncio.wait_for(governor.acquire(priority, estimated_tokens),
+                                           max(0.0, deadline - loop.time()))
+            try:
+                started = time.perf_counter()
+                with metrics.stage("llm_call", endpoint):
+                    if deadline is None and on_text is None:
+                        response = await client.messages.create(model=CLAUDE_MODEL, **kwargs)
+                    else:
+                        response = await stream_message(deadline, forward_text if on_text else None, **kwargs)
+            finally:
+                governor.release()
+        except (asyncio.TimeoutError, LatencyBudgetExceeded) as e:
+            metrics.LLM_CALLS.inc(endpoint=endpoint, outcome="over_budget")
+            limit = f" {budget:.2f}s" if budget is not None else ""
+            raise LatencyBudgetExceeded(f"{endpoint} exceeded its{limit} latency budget") from e
+        except Exception as e:
+            metrics.LLM_CALLS.inc(endpoint=endpoint, outcome="error")
+            provider_failed = is_provider_failure(e)
+            if attempt >= LLM_MAX_RETRIES or not is_retryable(e) or emitted:
+                if provider_failed:
+                    breaker.record_failure()
+                raise
+            retry_after = retry_after_seconds(e)
+            if retry_after:
+                governor.pause(retry_after)
+            delay = max(retry_after or 0.0, backoff_delay(attempt))
+            if deadline is not None and loop.time() + delay >= deadline:
+                if provider_failed:
+                    breaker.record_failure()
+                metrics.LLM_CALLS.inc(endpoint=endpoint, outcome="over_budget")
+                raise LatencyBudgetExceeded(f"{endpoint} retry would exceed its latency budget") from e
+            print(f"LLM {endpoint} attempt {attempt + 1} failed ({str(e)[:100]}), retrying in {delay:.1f}s")
+            metrics.LLM_RETRIES.inc(endpoint=endpoint)
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        metrics.LLM_CALLS.inc(endpoint=endpoint, outcome="success")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            figures = usage_tracker.record(endpoint, case_id, getattr(response, "model", None) or CLAUDE_MODEL,
+                                           usage, time.perf_counter() - started)
+            metrics.LLM_TOKENS.inc(figures["input_tokens"], endpoint=endpoint, direction="input")
+            metrics.LLM_TOKENS.inc(figures["output_tokens"], endpoint=endpoint, direction="output")
+            metrics.LLM_TOKENS.inc(figures["cache_read_tokens"], endpoint=endpoint, direction="cache_read")
+            metrics.LLM_TOKENS.inc(figures["cache_creation_tokens"], endpoint=endpoint, direction="cache_write")
+            metrics.LLM_COST.inc(figures["cost_usd"], endpoint=endpoint)
+            governor.reconcile(estimated_tokens, figures["input_tokens"] + figures["output_tokens"])
+        return response
+
 # ============================================
 # PATIENT SIMULATION PROMPT
 # ============================================
@@ -212,6 +420,9 @@ Respond as the patient. Stay in character. Be realistic and appropriately vague.
 IMPORTANT: Do NOT include any meta-commentary, stage directions in parentheses, or notes about how you're responding. Just give the patient's direct speech. No prefixes like "(Responding as...)" or "(Speaking with concern)".
 """
 
+PATIENT_PROMPT = CompiledPrompt("patient", PATIENT_SIMULATION_PROMPT,
+                                turn_fields=("conversation_history", "student_message"))
+
 # ============================================
 # FEEDBACK GENERATION PROMPT
 # ============================================
@@ -491,6 +702,13 @@ Result: {diagnosis_result}
 Analyze the conversation and provide feedback in the JSON format specified above. Respond ONLY with valid JSON, no additional text.
 """
 
+FEEDBACK_PROMPT = CompiledPrompt("feedback", FEEDBACK_GENERATION_PROMPT,
+                                 turn_fields=("conversation", "student_diagnosis", "diagnosis_result"))
+
+
+def format_bullets(items: list[str]) -> str:
+    return "\n".join(f"- {s}" for s in items) if items else "- None specified"
+
 
 def format_case_data_for_patient(request: PatientSimulationRequest) -> str:
     """Format case data for the patient simulation prompt"""
@@ -511,13 +729,13 @@ Severity: {case.severity or 'Not specified'}
 Triggers: {case.triggers or 'Not specified'}
 
 PRESENTING SYMPTOMS (symptoms the patient HAS - reveal only when asked):
-{chr(10).join(f'- {s}' for s in case.presenting_symptoms) if case.presenting_symptoms else '- None specified'}
+{format_bullets(case.presenting_symptoms)}
 
 ABSENT SYMPTOMS (symptoms the patient does NOT have - deny if asked):
-{chr(10).join(f'- {s}' for s in case.absent_symptoms) if case.absent_symptoms else '- None specified'}
+{format_bullets(case.absent_symptoms)}
 
 EXAM FINDINGS (reveal only when student performs examination):
-{chr(10).join(f'- {s}' for s in case.exam_findings) if case.exam_findings else '- None specified'}
+{format_bullets(case.exam_findings)}
 
 DIAGNOSIS (NEVER reveal this): {case.diagnosis}
 """
@@ -550,13 +768,13 @@ Expected Diagnosis: {case.expected_diagnosis}
 Acceptable Diagnoses: {case.acceptable_diagnoses or 'None specified'}
 
 PRESENTING SYMPTOMS:
-{chr(10).join(f'- {s}' for s in case.presenting_symptoms) if case.presenting_symptoms else '- None specified'}
+{format_bullets(case.presenting_symptoms)}
 
 ABSENT SYMPTOMS:
-{chr(10).join(f'- {s}' for s in case.absent_symptoms) if case.absent_symptoms else '- None specified'}
+{format_bullets(case.absent_symptoms)}
 
 EXAM FINDINGS:
-{chr(10).join(f'- {s}' for s in case.exam_findings) if case.exam_findings else '- None specified'}
+{format_bullets(case.exam_findings)}
 """
 
 
@@ -635,54 +853,99 @@ def generate_fallback_patient_response(request: PatientSimulationRequest) -> str
     return "I'm not feeling well, doctor. Can you ask me more specific questions?"
 
 
+# CompiledPrompt name -> module attribute holding its raw template
+PROMPT_TEMPLATES = {
+    "patient": "PATIENT_SIMULATION_PROMPT",
+    "feedback": "FEEDBACK_GENERATION_PROMPT",
+    "hint": "HINT_GENERATION_PROMPT",
+}
+
+
+def set_prompt(name: str, template: str) -> None:
+    """Replace the 'patient', 'feedback' or 'hint' template and drop prompts bound to the old one"""
+    if name not in PROMPT_TEMPLATES:
+        raise ValueError(f"Unknown prompt {name!r}, expected one of {sorted(PROMPT_TEMPLATES)}")
+    compiled_attr = f"{name.upper()}_PROMPT"
+    # Compile first so a template with bad placeholders leaves the current prompt in place
+    compiled = CompiledPrompt(name, template, tuple(globals()[compiled_attr].turn_fields))
+    globals()[PROMPT_TEMPLATES[name]] = template
+    globals()[compiled_attr] = compiled
+    prompt_cache.clear()
+
+
+def cached_prompt(prompt: CompiledPrompt, case, case_values: Callable[[], dict]):
+    """The prompt bound to this case, rendering the case fields only on a cache miss"""
+    bound, hit = prompt_cache.get(prompt, case, case_values)
+    metrics.record_cache(f"prompt_{prompt.name}", hit)
+    return bound
+
+
+def response_cache_key(request: PatientSimulationRequest, prompt_digest: str) -> str:
+    """Case id plus a digest of its prompt data, so edited cases don't serve stale replies"""
+    return f"{request.case.case_id}:{prompt_digest}"
+
+
 async def generate_patient_response(
-        request: PatientSimulationRequest) -> PatientSimulationResponse:
-    """Generate a patient response using Gemini with fallback"""
-    import asyncio
-    
-    prompt = PATIENT_SIMULATION_PROMPT.format(
-        case_data=format_case_data_for_patient(request),
-        conversation_history=format_conversation_history(request),
-        student_message=request.student_message)
-
-    # Try with retry for rate limits
-    max_retries = 2
-    for attempt in range(max_retries):
-        try:
-            response = client.messages.create(
-                model=CLAUDE_MODEL,
-                max_tokens=500,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            patient_response = response.content[0].text.strip()
-            return PatientSimulationResponse(patient_response=patient_response,
-                                             revealed_symptoms=[],
-                                             internal_notes=None)
-        except Exception as e:
-            error_str = str(e)
-            print(f"AI attempt {attempt + 1} failed: {error_str[:200]}")
-            if "429" in error_str or "rate" in error_str.lower():
-                if attempt < max_retries - 1:
-                    # Wait and retry
-                    print(f"Rate limited, retrying in 5s...")
-                    await asyncio.sleep(5)
-                    continue
-            # For other errors or final attempt, use fallback
-            print(f"Using fallback response")
-            break
+        request: PatientSimulationRequest,
+        on_text: Optional[Callable[[str], Awaitable]] = None) -> PatientSimulationResponse:
+    """Generate a patient response using Claude with fallback.
+
+    `on_text` receives the reply's text chunks as Claude streams them; the returned response
+    is authoritative (cached and fallback replies are not streamed).
+    """
+    with metrics.stage("context_building", "patient"):
+        bound = cached_prompt(PATIENT_PROMPT, request.case,
+                              lambda: {"case_data": format_case_data_for_patient(request)})
+        cache_key = None
+        if response_cache.cacheable(len(request.conversation_history), request.student_message):
+            cache_key = response_cache_key(request, bound.digest)
+            cached = response_cache.get(cache_key, request.student_message)
+            metrics.record_cache("patient_response", cached is not None)
+            if cached is not None:
+                return PatientSimulationResponse(patient_response=cached,
+                                                 revealed_symptoms=[],
+                                                 internal_notes=None)
+        prompt = bound.render(
+            conversation_history=format_conversation_history(request),
+            student_message=request.student_message)
+
+    try:
+        response = await call_claude(
+            "patient",
+            PRIORITY_PATIENT,
+            case_id=request.case.case_id,
+            budget=LATENCY_BUDGET_PATIENT,
+            on_text=on_text,
+            max_tokens=500,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        patient_response = response.content[0].text.strip()
+        if cache_key is not None:
+            response_cache.put(cache_key, request.student_message, patient_response)
+        return PatientSimulationResponse(patient_response=patient_response,
+                                         revealed_symptoms=[],
+                                         internal_notes=None)
+    except LatencyBudgetExceeded as e:
+        print(f"{e}, using fallback response")
+        metrics.HEDGE_WINS.inc(endpoint="patient")
+    except Exception as e:
+        print(f"AI patient response failed: {str(e)[:200]}")
+        print(f"Using fallback response")
     
     # Use rule-based fallback when AI is unavailable
-    fallback_response = generate_fallback_patient_response(request)
+    metrics.FALLBACKS.inc(endpoint="patient")
+    with metrics.stage("fallback", "patient"):
+        fallback_response = generate_fallback_patient_response(request)
     return PatientSimulationResponse(patient_response=fallback_response,
                                      revealed_symptoms=[],
                                      internal_notes=None)
 
 
-def compare_diagnoses(user_diagnosis: str, expected_diagnosis: str) -> str:
+async def compare_diagnoses(user_diagnosis: str, expected_diagnosis: str, case_id: Optional[str] = None) -> str:
     """Use AI to compare user diagnosis with expected diagnosis.
-    Returns: 'correct', 'partial', or 'wrong'
+    Returns: 'correct', 'partial', or 'wrong'. `case_id` attributes the LLM usage to the case.
     """
     if not user_diagnosis or len(user_diagnosis.strip()) < 2:
         return "wrong"
@@ -718,8 +981,10 @@ Respond with ONLY one word:
 Your answer:"""
 
     try:
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
+        response = await call_claude(
+            "compare",
+            PRIORITY_COMPARE,
+            case_id=case_id,
             max_tokens=10,
             messages=[
                 {"role": "user", "content": prompt}
@@ -735,6 +1000,7 @@ Your answer:"""
             return "wrong"
     except Exception as e:
         print(f"AI diagnosis comparison error: {e}")
+        metrics.FALLBACKS.inc(endpoint="compare")
         # Fallback to simple word matching
         if any(w in expected for w in user_diag.split() if len(w) >= 4):
             return "partial"
@@ -784,15 +1050,19 @@ async def generate_feedback(
         request: FeedbackGenerationRequest) -> FeedbackGenerationResponse:
     """Generate detailed feedback using Claude"""
 
-    prompt = FEEDBACK_GENERATION_PROMPT.format(
-        case_data=format_case_data_for_feedback(request),
-        conversation=format_conversation_for_feedback(request),
-        student_diagnosis=request.student_diagnosis,
-        diagnosis_result=request.diagnosis_result)
+    with metrics.stage("context_building", "feedback"):
+        bound = cached_prompt(FEEDBACK_PROMPT, request.case,
+                              lambda: {"case_data": format_case_data_for_feedback(request)})
+        prompt = bound.render(
+            conversation=format_conversation_for_feedback(request),
+            student_diagnosis=request.student_diagnosis,
+            diagnosis_result=request.diagnosis_result)
 
     try:
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
+        response = await call_claude(
+            "feedback",
+            PRIORITY_FEEDBACK,
+            case_id=request.case.case_id,
             max_tokens=3000,
             system="You are a clinical education feedback analyst. You MUST respond with ONLY valid JSON. No text before or after the JSON. No markdown code blocks. Just pure JSON starting with { and ending with }.",
             messages=[
@@ -800,9 +1070,10 @@ async def generate_feedback(
             ]
         )
         
-        raw_text = response.content[0].text
-        response_text = extract_json_from_response(raw_text)
-        feedback_data = json.loads(response_text)
+        with metrics.stage("json_parsing", "feedback"):
+            raw_text = response.content[0].text
+            response_text = extract_json_from_response(raw_text)
+            feedback_data = json.loads(response_text)
         
     except (json.JSONDecodeError, Exception) as e:
         print(f"AI feedback error: {e}")
@@ -957,6 +1228,11 @@ def analyze_conversation_for_clues(request: FeedbackGenerationRequest) -> tuple[
     return clues[:6], strengths[:3], improvements[:3]
 
 
+# Phrases in the student's messages that count as examining the patient / weighing differentials
+TEST_KEYWORDS = ["examine", "check", "look at", "test", "blood pressure", "temperature", "listen", "vital", "vitals"]
+DIFFERENTIAL_KEYWORDS = ["could it be", "rule out", "worry about", "might", "or is it", "exclude"]
+
+
 def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) -> DecisionTreeNode:
     """Build a hierarchical decision tree from the actual conversation"""
     case = request.case
@@ -968,9 +1244,7 @@ def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) ->
     
     # Keywords for detecting different types of questions
     symptom_keywords = ["pain", "hurt", "ache", "feel", "symptom", "when", "how long", "worse", "better", "start"]
-    test_keywords = ["examine", "check", "look at", "test", "blood pressure", "temperature", "listen", "vital", "vitals"]
     history_keywords = ["history", "before", "medication", "allergy", "family", "previous", "past"]
-    differential_keywords = ["could it be", "rule out", "worry about", "might", "or is it", "exclude"]
     
     presenting = case.presenting_symptoms or []
     exam_findings = case.exam_findings or []
@@ -984,9 +1258,9 @@ def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) ->
         if any(word in conversation_text for word in symptom_words):
             asked_symptoms.append(symptom)
     
-    asked_tests = any(kw in conversation_text for kw in test_keywords)
+    asked_tests = any(kw in conversation_text for kw in TEST_KEYWORDS)
     asked_history = any(kw in conversation_text for kw in history_keywords)
-    considered_differentials = any(kw in conversation_text for kw in differential_keywords)
+    considered_differentials = any(kw in conversation_text for kw in DIFFERENTIAL_KEYWORDS)
     
     # Build hierarchical structure: symptoms -> findings -> diagnosis
     # Main symptom branch
@@ -1044,7 +1318,8 @@ def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) ->
     
     # Differential diagnosis branch (ruled out conditions)
     ruled_out_branch = None
-    if considered_differentials and case.expected_diagnosis:
+    locally_ruled_out = rule_out_local_differentials(request)
+    if (considered_differentials or locally_ruled_out) and case.expected_diagnosis:
         common_differentials = {
             "Gastroenteritis": ["Food poisoning", "Appendicitis"],
             "Common Cold": ["Flu", "Allergies"],
@@ -1052,7 +1327,7 @@ def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) ->
             "Migraine": ["Tension headache", "Cluster headache"],
             "UTI": ["Kidney infection", "Sexually transmitted infection"],
         }
-        differentials = common_differentials.get(case.expected_diagnosis, ["Other conditions"])
+        differentials = locally_ruled_out or common_differentials.get(case.expected_diagnosis, ["Other conditions"])
         ruled_out_branch = DecisionTreeNode(
             id="ruled",
             label=f"{differentials[0]} ruled out",
@@ -1074,13 +1349,7 @@ def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) ->
             ))
     
     # Final diagnosis branch
-    diagnosis_branch = DecisionTreeNode(
-        id="diag",
-        label=request.student_diagnosis.upper(),
-        type="diagnosis",
-        asked=is_correct,
-        children=[]
-    )
+    diagnosis_branch = diagnosis_node(request.student_diagnosis, is_correct)
     
     # Assemble root children
     root_children = [symptom_branch]
@@ -1103,10 +1372,36 @@ def build_decision_tree_from_conversation(request: FeedbackGenerationRequest) ->
     )
 
 
+def diagnosis_node(student_diagnosis: str, is_correct: bool) -> DecisionTreeNode:
+    return DecisionTreeNode(
+        id="diag",
+        label=student_diagnosis.upper(),
+        type="diagnosis",
+        asked=is_correct,
+        children=[]
+    )
+
+
+def rule_out_local_differentials(request: FeedbackGenerationRequest) -> list[str]:
+    """Dataset diseases excluded by absent symptoms the student actually asked about"""
+    case = request.case
+    conversation_text = " ".join([m.content.lower() for m in request.conversation if m.sender == "user"])
+    denied = mentioned_symptoms(case.absent_symptoms or [], conversation_text)
+    if not denied:
+        return []
+    ruled_out = get_differential_model().ruled_out(denied)
+    return [disease_display_name(d) for d in ruled_out if not same_disease(d, case.expected_diagnosis)][:3]
+
+
 def create_fallback_feedback(
         request: FeedbackGenerationRequest, reason: str = "AI response parsing failed") -> FeedbackGenerationResponse:
     """Create case-specific fallback feedback if AI parsing fails"""
-    
+    metrics.FALLBACKS.inc(endpoint="feedback")
+    with metrics.stage("fallback", "feedback"):
+        return _build_fallback_feedback(request, reason)
+
+
+def _build_fallback_feedback(request: FeedbackGenerationRequest, reason: str) -> FeedbackGenerationResponse:
     case = request.case
     score_map = {"correct": 85, "partial": 55, "wrong": 25}
     base_score = score_map.get(request.diagnosis_result, 50)
@@ -1117,6 +1412,33 @@ def create_fallback_feedback(
     # Build conversation-based decision tree
     decision_tree = build_decision_tree_from_conversation(request)
     
+    insight = fallback_insight(request, strengths, improvements)
+
+    return FeedbackGenerationResponse(
+        score=base_score,
+        breakdown=ScoreBreakdown(
+            correct_diagnosis=40 if request.diagnosis_result == "correct" else
+            (20 if request.diagnosis_result == "partial" else 5),
+            key_questions=12 if len([c for c in clues if c.asked]) > 2 else 8,
+            right_tests=15,
+            time_efficiency=8,
+            ruled_out_differentials=10 if request.diagnosis_result == "correct" else
+            (7 if rule_out_local_differentials(request) else 5)),
+        decision_tree=decision_tree,
+        clues=clues if clues else [
+            MissedClue(id="c1", text="Chief complaint explored", importance="critical", asked=True),
+            MissedClue(id="c2", text="Duration of symptoms", importance="helpful", asked=True),
+        ],
+        insight=insight,
+        user_diagnosis=request.student_diagnosis,
+        correct_diagnosis=case.expected_diagnosis,
+        result=request.diagnosis_result,
+        source=FeedbackSource(is_ai_generated=False, reason=reason))
+
+
+def fallback_insight(request: FeedbackGenerationRequest, strengths: list[str], improvements: list[str]) -> AIInsight:
+    """Case-specific summary and tip without the LLM"""
+    case = request.case
     # Generate case-specific tip
     presenting = case.presenting_symptoms or []
     specialty_tips = {
@@ -1139,30 +1461,169 @@ def create_fallback_feedback(
     else:
         summary = f"The correct diagnosis was {case.expected_diagnosis}, not {request.student_diagnosis}. Review the key symptoms that differentiate this condition."
 
+    return AIInsight(
+        summary=summary,
+        strengths=strengths,
+        improvements=improvements,
+        tip=tip
+    )
+
+
+# ============================================
+# INCREMENTAL FEEDBACK
+# ============================================
+
+INSIGHT_GENERATION_PROMPT = """
+# ROLE: CLINICAL EDUCATION FEEDBACK ANALYST
+
+A medical student has just finished a diagnostic interview with a simulated patient. The interview has already been scored; your job is to write the personal feedback narrative.
+
+## CASE
+- Expected diagnosis: {expected_diagnosis}
+- Key presenting symptoms: {presenting_symptoms}
+
+## STUDENT PERFORMANCE
+- Student's diagnosis: {student_diagnosis} ({diagnosis_result})
+- Questions asked: {question_count}
+- Clues explored: {asked_clues}
+- Clues missed: {missed_clues}
+- Differentials ruled out: {ruled_out}
+- Score: {score}/100 (diagnosis {correct_diagnosis}/40, key questions {key_questions}/20, examination {right_tests}/20, efficiency {time_efficiency}/10, differentials {ruled_out_differentials}/10)
+
+## STUDENT'S QUESTIONS
+{student_questions}
+
+## OUTPUT FORMAT
+
+Respond with ONLY this JSON:
+
+{{
+  "summary": "<2-3 sentence overall assessment>",
+  "strengths": ["<2-4 specific things the student did well>"],
+  "improvements": ["<2-4 specific areas to improve>"],
+  "tip": "<one actionable tip for next time>"
+}}
+"""
+
+# Keeps the insight prompt small on long interviews
+INSIGHT_MAX_QUESTIONS = 20
+
+
+def pregrade_conversation(request: FeedbackGenerationRequest) -> PreGrade:
+    """Deterministic, diagnosis-independent grading; cheap enough to redo after every turn"""
+    clues, strengths, improvements = analyze_conversation_for_clues(request)
+    tree = build_decision_tree_from_conversation(request)
+    tree.children = [c for c in tree.children if c.id != "diag"]
+
+    student_text = " ".join(m.content.lower() for m in request.conversation if m.sender == "user")
+    question_count = len([m for m in request.conversation if m.sender == "user"])
+    ruled_out = rule_out_local_differentials(request)
+    considered = any(kw in student_text for kw in DIFFERENTIAL_KEYWORDS)
+
+    weights = {"critical": 2, "helpful": 1}
+    total_weight = sum(weights.get(c.importance, 1) for c in clues)
+    asked_weight = sum(weights.get(c.importance, 1) for c in clues if c.asked)
+    key_questions = round(20 * asked_weight / total_weight) if total_weight else min(question_count * 4, 20)
+
+    if any(kw in student_text for kw in TEST_KEYWORDS):
+        right_tests = 20
+    else:
+        right_tests = 5 if request.case.exam_findings else 10
+
+    if question_count == 0:
+        time_efficiency = 0
+    else:
+        time_efficiency = 10 if question_count <= 8 else (7 if question_count <= 12 else 3)
+
+    return PreGrade(
+        clues=clues,
+        strengths=strengths,
+        improvements=improvements,
+        decision_tree=tree,
+        question_count=question_count,
+        ruled_out=ruled_out,
+        key_questions=key_questions,
+        right_tests=right_tests,
+        time_efficiency=time_efficiency,
+        ruled_out_differentials=10 if considered and ruled_out else (7 if considered or ruled_out else 3))
+
+
+def parse_insight(feedback_data: dict) -> AIInsight:
+    # Accept the insight object on its own or nested as in the full feedback format
+    insight_data = feedback_data.get("insight", feedback_data)
+    return AIInsight(
+        summary=insight_data["summary"],
+        strengths=insight_data.get("strengths") or ["Engaged with the patient"],
+        improvements=insight_data.get("improvements") or ["Consider a more systematic approach"],
+        tip=insight_data.get("tip") or "Use structured history-taking for consistent results.")
+
+
+async def generate_incremental_feedback(
+        request: FeedbackGenerationRequest, pregrade: Optional[PreGrade] = None) -> FeedbackGenerationResponse:
+    """Feedback from a pre-grade; Claude only writes the insight narrative over a small prompt"""
+    if pregrade is None:
+        with metrics.stage("pregrade", "feedback"):
+            pregrade = pregrade_conversation(request)
+
+    result = request.diagnosis_result
+    breakdown = ScoreBreakdown(
+        correct_diagnosis=40 if result == "correct" else (20 if result == "partial" else 5),
+        key_questions=pregrade.key_questions,
+        right_tests=pregrade.right_tests,
+        time_efficiency=pregrade.time_efficiency,
+        ruled_out_differentials=pregrade.ruled_out_differentials)
+    score = (breakdown.correct_diagnosis + breakdown.key_questions + breakdown.right_tests
+             + breakdown.time_efficiency + breakdown.ruled_out_differentials)
+    decision_tree = pregrade.decision_tree.model_copy(deep=True)
+    decision_tree.children.append(diagnosis_node(request.student_diagnosis, result == "correct"))
+
+    with metrics.stage("context_building", "feedback"):
+        questions = [m.content.strip()[:200] for m in request.conversation if m.sender == "user"]
+        prompt = INSIGHT_GENERATION_PROMPT.format(
+            expected_diagnosis=request.case.expected_diagnosis,
+            presenting_symptoms=", ".join(request.case.presenting_symptoms[:5]) or "not specified",
+            student_diagnosis=request.student_diagnosis,
+            diagnosis_result=result,
+            question_count=pregrade.question_count,
+            asked_clues=", ".join(c.text for c in pregrade.clues if c.asked) or "none",
+            missed_clues=", ".join(c.text for c in pregrade.clues if not c.asked) or "none",
+            ruled_out=", ".join(pregrade.ruled_out) or "none",
+            score=score,
+            **breakdown.model_dump(),
+            student_questions="\n".join(f"- {q}" for q in questions[-INSIGHT_MAX_QUESTIONS:]) or "- (none)")
+
+    source = FeedbackSource(is_ai_generated=True, reason=None)
+    try:
+        response = await call_claude(
+            "feedback",
+            PRIORITY_FEEDBACK,
+            case_id=request.case.case_id,
+            max_tokens=600,
+            system="You are a clinical education feedback analyst. You MUST respond with ONLY valid JSON. No text before or after the JSON. No markdown code blocks. Just pure JSON starting with { and ending with }.",
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        with metrics.stage("json_parsing", "feedback"):
+            insight = parse_insight(json.loads(extract_json_from_response(response.content[0].text)))
+    except Exception as e:
+        print(f"AI insight error: {str(e)[:200]}")
+        metrics.FALLBACKS.inc(endpoint="feedback")
+        insight = fallback_insight(request, pregrade.strengths, pregrade.improvements)
+        source = FeedbackSource(is_ai_generated=False, reason=str(e))
+
     return FeedbackGenerationResponse(
-        score=base_score,
-        breakdown=ScoreBreakdown(
-            correct_diagnosis=40 if request.diagnosis_result == "correct" else
-            (20 if request.diagnosis_result == "partial" else 5),
-            key_questions=12 if len([c for c in clues if c.asked]) > 2 else 8,
-            right_tests=15,
-            time_efficiency=8,
-            ruled_out_differentials=10 if request.diagnosis_result == "correct" else 5),
+        score=score,
+        breakdown=breakdown,
         decision_tree=decision_tree,
-        clues=clues if clues else [
+        clues=pregrade.clues or [
             MissedClue(id="c1", text="Chief complaint explored", importance="critical", asked=True),
-            MissedClue(id="c2", text="Duration of symptoms", importance="helpful", asked=True),
         ],
-        insight=AIInsight(
-            summary=summary,
-            strengths=strengths,
-            improvements=improvements,
-            tip=tip
-        ),
+        insight=insight,
         user_diagnosis=request.student_diagnosis,
-        correct_diagnosis=case.expected_diagnosis,
-        result=request.diagnosis_result,
-        source=FeedbackSource(is_ai_generated=False, reason=reason))
+        correct_diagnosis=request.case.expected_diagnosis,
+        result=result,
+        source=source)
 
 
 # ============================================
@@ -1217,13 +1678,73 @@ Correct Diagnosis (NEVER reveal this): {diagnosis}
 
 This is hint #{hint_number}. Make your hint appropriately specific for this progression level.
 
+## SUGGESTED HINT
+
+Local analysis of the case and conversation already picked the most useful next question:
+{suggested_hint}
+
 ## YOUR TASK
 
-Analyze what questions the student has already asked. Identify important symptoms or areas they haven't explored yet. Provide a helpful hint that guides them toward asking better questions WITHOUT revealing the diagnosis.
+Rephrase the suggested hint so it reads naturally for this conversation. Only choose a different focus if the conversation shows the student has already covered it. Never reveal the diagnosis.
 
 Respond with ONLY the hint text - no explanations, no meta-commentary, no prefixes. Just ONE short sentence.
 """
 
+HINT_PROMPT = CompiledPrompt("hint", HINT_GENERATION_PROMPT,
+                             turn_fields=("conversation", "hint_number", "suggested_hint"))
+
+
+FALLBACK_HINTS = [
+    "Consider asking about the timeline and how the symptoms have progressed.",
+    "Think about what associated symptoms might help narrow down the diagnosis.",
+    "Have you explored the patient's relevant medical history for this type of complaint?",
+    "A focused physical examination might reveal helpful findings.",
+    "Ask about any factors that make the symptoms better or worse.",
+]
+
+
+def generate_local_hint(request: HintGenerationRequest, hint_number: int) -> str:
+    """Deterministic hint from the local differential engine.
+
+    Hint 2 asks about the symptom with the highest information gain over the remaining
+    candidate diseases, hint 3 points at an unexplored presenting symptom, and hint 4+
+    names competing differentials. Hints 2-3 fall through to the next kind when theirs has
+    nothing to say, and to canned hints when there's no signal at all.
+    """
+    case = request.case
+    conversation_text = " ".join([m.content.lower() for m in request.conversation])
+    model = get_differential_model()
+
+    disclosed = mentioned_symptoms(case.presenting_symptoms, conversation_text)
+    denied = mentioned_symptoms(case.absent_symptoms, conversation_text)
+    unexplored = [s for s in case.presenting_symptoms if s not in disclosed]
+
+    differential = None
+    # Only when a disclosed symptom is in the dataset: otherwise the ranking says nothing about this case
+    if hint_number >= 3 and any(model.resolve(s) for s in disclosed):
+        others = list(dict.fromkeys(disease_display_name(d) for d, _ in model.rank(disclosed, denied)
+                                    if not same_disease(d, case.expected_diagnosis)))
+        if len(others) >= 2:
+            differential = f"What you've found so far could also fit {others[0]} or {others[1]} - what would help tell them apart?"
+
+    if hint_number == 2:
+        best = model.recommend_questions(disclosed, denied, asked_text=conversation_text, top_n=1)
+        if best:
+            return f"Asking whether the patient has any {best[0][0]} would help narrow things down."
+
+    if hint_number >= 4 and differential:
+        return differential
+
+    if hint_number >= 2 and unexplored:
+        target = max(unexplored, key=model.weight)
+        return f"Have you asked whether the patient has noticed any {target.lower()}?"
+
+    if differential:
+        return differential
+
+    hint_index = min(hint_number - 1, len(FALLBACK_HINTS) - 1)
+    return FALLBACK_HINTS[hint_index]
+
 
 def format_conversation_for_hint(request: HintGenerationRequest) -> str:
     """Format conversation history for hint generation"""
@@ -1238,22 +1759,38 @@ def format_conversation_for_hint(request: HintGenerationRequest) -> str:
     return "\n".join(formatted)
 
 
-async def generate_hint(request: HintGenerationRequest) -> HintGenerationResponse:
-    """Generate a progressive hint for the student"""
+async def generate_hint(request: HintGenerationRequest, hedge: bool = True) -> HintGenerationResponse:
+    """Generate a progressive hint for the student.
+
+    The hint itself is chosen locally; Claude only rephrases it while the LLM circuit is up.
+    Prefetches pass hedge=False: nobody is waiting, so the latency budget doesn't apply.
+    """
     hint_number = request.hints_used + 1
+    local_hint = generate_local_hint(request, hint_number)
+
+    if breaker.state == OPEN:
+        metrics.FALLBACKS.inc(endpoint="hint")
+        return HintGenerationResponse(hint=local_hint, hint_number=hint_number)
     
-    prompt = HINT_GENERATION_PROMPT.format(
-        presenting_symptoms="\n".join(f"- {s}" for s in request.case.presenting_symptoms) if request.case.presenting_symptoms else "- None specified",
-        absent_symptoms="\n".join(f"- {s}" for s in request.case.absent_symptoms) if request.case.absent_symptoms else "- None specified",
-        exam_findings="\n".join(f"- {s}" for s in request.case.exam_findings) if request.case.exam_findings else "- None specified",
-        diagnosis=request.case.expected_diagnosis,
+    case = request.case
+    bound = cached_prompt(HINT_PROMPT, case, lambda: {
+        "presenting_symptoms": format_bullets(case.presenting_symptoms),
+        "absent_symptoms": format_bullets(case.absent_symptoms),
+        "exam_findings": format_bullets(case.exam_findings),
+        "diagnosis": case.expected_diagnosis,
+    })
+    prompt = bound.render(
         conversation=format_conversation_for_hint(request),
-        hint_number=hint_number
+        hint_number=hint_number,
+        suggested_hint=local_hint
     )
     
     try:
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
+        response = await call_claude(
+            "hint",
+            PRIORITY_HINT,
+            case_id=request.case.case_id,
+            budget=LATENCY_BUDGET_HINT if hedge else None,
             max_tokens=150,
             messages=[
                 {"role": "user", "content": prompt}
@@ -1261,15 +1798,12 @@ async def generate_hint(request: HintGenerationRequest) -> HintGenerationRespons
         )
         hint_text = response.content[0].text.strip()
         return HintGenerationResponse(hint=hint_text, hint_number=hint_number)
+    except LatencyBudgetExceeded as e:
+        print(f"{e}, using local hint")
+        metrics.HEDGE_WINS.inc(endpoint="hint")
+        metrics.FALLBACKS.inc(endpoint="hint")
+        return HintGenerationResponse(hint=local_hint, hint_number=hint_number)
     except Exception as e:
         print(f"Hint generation error: {str(e)[:200]}")
-        # Fallback hints
-        fallback_hints = [
-            "Consider asking about the timeline and how the symptoms have progressed.",
-            "Think about what associated symptoms might help narrow down the diagnosis.",
-            "Have you explored the patient's relevant medical history for this type of complaint?",
-            "A focused physical examination might reveal helpful findings.",
-            "Ask about any factors that make the symptoms better or worse.",
-        ]
-        hint_index = min(hint_number - 1, len(fallback_hints) - 1)
-        return HintGenerationResponse(hint=fallback_hints[hint_index], hint_number=hint_number)
+        metrics.FALLBACKS.inc(endpoint="hint")
+        return HintGenerationResponse(hint=local_hint, hint_number=hint_number)
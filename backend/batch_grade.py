@@ -0,0 +1,78 @@
+"""
+Re-grade a cohort's submissions through /api/batch-grade
+Input is JSONL (or a JSON array) of {"case_id", "conversation", "diagnosis", "hints_used"?, "id"?}
+records. Results are written as JSONL in completion order, one line per submission.
+Submissions are sent --batch-size at a time (the server caps one request at
+BATCH_GRADE_MAX_SUBMISSIONS), with the admin token from --admin-token or ADMIN_TOKEN.
+
+Usage:
+    python batch_grade.py submissions.jsonl --out graded.jsonl --concurrency 16
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import urllib.request
+import urllib.error
+
+
+def load_submissions(path: str) -> list[dict]:
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-grade interview transcripts")
+    parser.add_argument("input", help="JSONL or JSON array of submissions")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--out", help="Write results here instead of stdout")
+    parser.add_argument("--concurrency", type=int, help="Submissions graded in parallel (server default if omitted)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Submissions per request")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN"), help="Defaults to $ADMIN_TOKEN")
+    args = parser.parse_args()
+
+    submissions = load_submissions(args.input)
+    headers = {"Content-Type": "application/json"}
+    if args.admin_token:
+        headers["X-Admin-Token"] = args.admin_token
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    start = time.perf_counter()
+    graded = errors = 0
+    try:
+        for offset in range(0, len(submissions), args.batch_size):
+            payload = {"submissions": submissions[offset:offset + args.batch_size], "concurrency": args.concurrency}
+            req = urllib.request.Request(args.base_url.rstrip("/") + "/api/batch-grade",
+                                         data=json.dumps(payload).encode(), method="POST", headers=headers)
+            with urllib.request.urlopen(req, timeout=3600) as resp:
+                for line in resp:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    # Index into the whole input file, not this request
+                    record["index"] += offset
+                    if "error" in record:
+                        errors += 1
+                    graded += 1
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+    except urllib.error.HTTPError as e:
+        print(f"Batch grading failed: HTTP {e.code} {e.read()[:500]!r}", file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Graded {graded}/{len(submissions)} submissions ({errors} errors) in {elapsed:.1f}s "
+          f"= {graded / elapsed if elapsed else 0:.2f}/s", file=sys.stderr)
+    return 0 if graded == len(submissions) and not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
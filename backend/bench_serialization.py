@@ -0,0 +1,134 @@
+"""
+Before/after benchmark for API response serialization
+Builds the real case catalog (from the database) and a diagnosis feedback payload, then
+serves each through a throwaway FastAPI app twice:
+
+  before: pydantic models / dicts returned with response_model and the stock JSONResponse
+          (validation, jsonable_encoder, stdlib json)
+  after:  plain dicts returned as FastJSONResponse (orjson, no re-validation)
+
+Both go through the same TestClient, so the difference is serialization. Encode-only timings
+(jsonable_encoder + json.dumps vs orjson.dumps) are reported too.
+
+Usage:
+    python bench_serialization.py --requests 300 --catalog-copies 10
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import schemas
+from ai_service import breaker
+from models import SessionLocal, Case
+from main import to_frontend_case, grade_submission, DiagnosisRequest, MessageInput
+from responses import FastJSONResponse
+
+INTERVIEW = [
+    "What brings you in today?", "When did it start?", "How bad is it on a scale of 1 to 10?",
+    "Does anything make it better or worse?", "Any fever or chills?", "Any nausea or vomiting?",
+    "Have you had anything like this before?", "Are you taking any medications?",
+    "Any allergies?", "Can I examine you?",
+]
+
+
+def build_payloads(catalog_copies: int) -> tuple[list[dict], dict]:
+    db = SessionLocal()
+    try:
+        cases = db.query(Case).all()
+        catalog = [to_frontend_case(c) for c in cases] * catalog_copies
+        case = cases[0]
+        conversation = []
+        for question in INTERVIEW:
+            conversation.append(MessageInput(role="user", content=question))
+            conversation.append(MessageInput(role="assistant", content=f"Well, {case.chief_complaint or 'I feel unwell'}."))
+        submission = DiagnosisRequest(case_id=case.id, diagnosis=case.diagnosis, hints_used=1,
+                                      conversation=conversation)
+        # Keep the LLM out of it: with the circuit open this is the locally generated feedback
+        breaker.force_open()
+        feedback = asyncio.run(grade_submission(case, submission, "correct"))
+    finally:
+        db.close()
+    return catalog, feedback
+
+
+def bench_app(catalog: list[dict], feedback: dict) -> FastAPI:
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.get("/before/catalog", response_model=list[schemas.FrontendCaseResponse])
+    def catalog_before():
+        return [schemas.FrontendCaseResponse(**c) for c in catalog]
+
+    @app.get("/after/catalog", response_model=list[schemas.FrontendCaseResponse])
+    def catalog_after():
+        return FastJSONResponse([dict(c) for c in catalog])
+
+    @app.get("/before/feedback")
+    def feedback_before():
+        return feedback
+
+    @app.get("/after/feedback")
+    def feedback_after():
+        return FastJSONResponse(feedback)
+
+    return app
+
+
+def time_requests(client: TestClient, path: str, n: int) -> list[float]:
+    client.get(path)
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.get(path)
+        times.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.text[:200]
+    return times
+
+
+def time_encode(fn, n: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization before/after benchmark")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per endpoint variant")
+    parser.add_argument("--catalog-copies", type=int, default=10,
+                        help="Repeat the seeded catalog to simulate a larger case bank")
+    args = parser.parse_args()
+
+    catalog, feedback = build_payloads(args.catalog_copies)
+    client = TestClient(bench_app(catalog, feedback))
+
+    for name in ("catalog", "feedback"):
+        before_body = client.get(f"/before/{name}").json()
+        after_body = client.get(f"/after/{name}").json()
+        assert before_body == after_body, f"{name}: before and after responses differ"
+
+    print(f"catalog: {len(catalog)} cases, feedback: {len(json.dumps(feedback))} bytes, "
+          f"{args.requests} requests each\n")
+    print(f"{'payload':<10}{'path':<16}{'before ms':>11}{'after ms':>11}{'speedup':>9}")
+    for name in ("catalog", "feedback"):
+        before = statistics.median(time_requests(client, f"/before/{name}", args.requests)) * 1000
+        after = statistics.median(time_requests(client, f"/after/{name}", args.requests)) * 1000
+        print(f"{name:<10}{'request p50':<16}{before:>11.3f}{after:>11.3f}{before / after:>8.1f}x")
+
+    payloads = {"catalog": catalog, "feedback": feedback}
+    for name, payload in payloads.items():
+        before = time_encode(lambda: json.dumps(jsonable_encoder(payload)).encode(), args.requests) * 1000
+        after = time_encode(lambda: FastJSONResponse(payload).body, args.requests) * 1000
+        print(f"{name:<10}{'encode only':<16}{before:>11.3f}{after:>11.3f}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
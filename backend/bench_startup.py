@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark for the API worker
+Starts fresh interpreters and times how long a new worker takes to become useful:
+
+  import      `import main`
+  catalog     process start -> first /api/cases response (through the app's lifespan)
+  warm        process start -> warm-up finished (catalog, search index, differential model
+              and LLM client all loaded)
+
+Three modes:
+
+  eager   ai_service (and with it the Anthropic SDK) imported before main, and no warm-up:
+          what main did before its imports were deferred
+  lazy    main as it is now with STARTUP_WARMUP=0: ai_service imported on first use
+  warmup  main as it is now: caches and the LLM client load in a background thread
+
+Each mode runs --runs times in a new process and medians are reported. --importtime also
+prints the slowest imports under main, from `python -X importtime`.
+
+Usage:
+    python bench_startup.py --runs 5 --importtime
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r'''
+import json, os, sys, time
+start = time.perf_counter()
+if os.environ.get("BENCH_EAGER") == "1":
+    import ai_service
+import main
+imported = time.perf_counter() - start
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    assert client.get("/api/cases").status_code == 200
+    catalog = time.perf_counter() - start
+    warm = None
+    if main.STARTUP_WARMUP:
+        main.warmed_up.wait(120)
+        warm = time.perf_counter() - start
+print(json.dumps({"import": imported, "catalog": catalog, "warm": warm}))
+'''
+
+# mode -> (import ai_service up front, background warm-up)
+MODES = {"eager": (True, False), "lazy": (False, False), "warmup": (False, True)}
+
+
+def run_child(eager: bool, warmup: bool) -> dict:
+    env = dict(os.environ, BENCH_EAGER="1" if eager else "0", STARTUP_WARMUP="1" if warmup else "0")
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int) -> list[tuple[str, float]]:
+    """main and its direct imports by cumulative import time, in seconds"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    # importtime lists a module after everything it imported, indented one level deeper
+    children: list[tuple[str, float]] = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        row = (name.strip(), int(parts[1]) / 1e6)
+        if depth == 1:
+            children.append(row)
+        elif depth == 0:
+            if row[0] == "main":
+                return sorted([row] + children, key=lambda r: r[1], reverse=True)[:limit]
+            children = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API worker cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports under main")
+    args = parser.parse_args()
+
+    results = {mode: [run_child(*flags) for _ in range(args.runs)] for mode, flags in MODES.items()}
+
+    print(f"{args.runs} cold starts per mode, median seconds\n")
+    print(f"{'mode':<8}{'import':>9}{'catalog':>9}{'warm':>9}")
+    for mode, runs in results.items():
+        median = lambda key: statistics.median(r[key] for r in runs) if runs[0][key] is not None else None
+        warm = median("warm")
+        print(f"{mode:<8}{median('import'):>9.3f}{median('catalog'):>9.3f}"
+              f"{(f'{warm:.3f}' if warm is not None else '-'):>9}")
+    eager, warmup = (statistics.median(r["catalog"] for r in results[m]) for m in ("eager", "warmup"))
+    print(f"\nfirst catalog response {eager / warmup:.1f}x sooner than eager imports")
+
+    if args.importtime:
+        print("\nslowest imports under main (lazy)")
+        for name, seconds in slowest_imports(12):
+            print(f"  {name:<28}{seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
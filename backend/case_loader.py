@@ -0,0 +1,166 @@
+"""
+Streaming loader for training cases
+Reads training_cases.json, JSONL/NDJSON files and directories of shards one case at a
+time, validating each case as it streams, so memory stays flat as the case bank grows.
+Uploaded JSONL bodies are split into lines the same way as they arrive.
+"""
+
+import os
+import json
+import glob
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+
+from schemas import TrainingCase
+
+READ_CHUNK_SIZE = 64 * 1024
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+_decoder = json.JSONDecoder()
+
+
+def expand_case_paths(paths: Iterable[str]) -> list[str]:
+    """Expand directories and glob patterns into a sorted list of case files"""
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = [p for p in glob.glob(os.path.join(path, '*'))
+                       if p.endswith(JSONL_EXTENSIONS + ('.json',))]
+        elif any(c in path for c in '*?['):
+            matches = glob.glob(path)
+        else:
+            matches = [path]
+        expanded.extend(sorted(matches))
+    return expanded
+
+
+def _iter_jsonl(path: str) -> Iterator[dict]:
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"  Skipping {os.path.basename(path)}:{line_number} - invalid JSON: {e}")
+
+
+def _iter_json_cases_array(path: str) -> Iterator[dict]:
+    """Stream objects out of the top-level "cases" array without loading the whole file"""
+    with open(path, 'r') as f:
+        buffer = ''
+        # Find the start of the "cases" array
+        while True:
+            key_pos = buffer.find('"cases"')
+            if key_pos != -1:
+                bracket = buffer.find('[', key_pos)
+                if bracket != -1:
+                    buffer = buffer[bracket + 1:]
+                    break
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+
+        pos = 0
+        eof = False
+        while True:
+            # Skip separators between array items
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            if pos < len(buffer):
+                try:
+                    obj, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield obj
+                    pos = end
+                    continue
+            if eof:
+                return
+            # Need more data: drop consumed text and read the next chunk
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                eof = True
+            buffer += chunk
+
+
+class PayloadTooLargeError(ValueError):
+    """A streamed body, or one line of it, is over its size limit"""
+
+
+async def aiter_jsonl_lines(chunks: AsyncIterable[bytes], max_line_bytes: Optional[int] = None,
+                            max_body_bytes: Optional[int] = None) -> AsyncIterator[tuple[int, bytes]]:
+    """(line number, line) for each non-blank line of a streamed JSONL body, e.g. an upload.
+
+    Only the current partial line is held between chunks. Raises PayloadTooLargeError as soon
+    as a line grows past max_line_bytes or the body past max_body_bytes.
+    """
+    pending: list[bytes] = []
+    pending_size = 0
+    body_size = 0
+    line_number = 0
+    async for chunk in chunks:
+        body_size += len(chunk)
+        if max_body_bytes is not None and body_size > max_body_bytes:
+            raise PayloadTooLargeError(f"Body is over {max_body_bytes} bytes")
+        parts = chunk.split(b'\n')
+        if len(parts) > 1:
+            pending.append(parts[0])
+            parts[0] = b''.join(pending)
+            pending, pending_size = [], 0
+        for line in parts[:-1]:
+            line_number += 1
+            if max_line_bytes is not None and len(line) > max_line_bytes:
+                raise PayloadTooLargeError(f"Line {line_number} is over {max_line_bytes} bytes")
+            if line.strip():
+                yield line_number, line
+        pending.append(parts[-1])
+        pending_size += len(parts[-1])
+        if max_line_bytes is not None and pending_size > max_line_bytes:
+            raise PayloadTooLargeError(f"Line {line_number + 1} is over {max_line_bytes} bytes")
+    tail = b''.join(pending)
+    if tail.strip():
+        yield line_number + 1, tail
+
+
+def iter_raw_cases(path: str) -> Iterator[dict]:
+    """Yield case dicts from a single .json, .jsonl or .ndjson file"""
+    if path.endswith(JSONL_EXTENSIONS):
+        return _iter_jsonl(path)
+    return _iter_json_cases_array(path)
+
+
+def iter_cases(paths: Iterable[str]) -> Iterator[TrainingCase]:
+    """Yield validated cases from files, directories or globs, skipping invalid ones"""
+    for path in expand_case_paths(paths):
+        invalid = 0
+        for raw in iter_raw_cases(path):
+            try:
+                yield TrainingCase.model_validate(raw)
+            except ValidationError as e:
+                invalid += 1
+                case_id = raw.get('case_id', '?') if isinstance(raw, dict) else '?'
+                print(f"  Skipping invalid case {case_id} in {os.path.basename(path)}: {e.error_count()} error(s)")
+        if invalid:
+            print(f"  {invalid} invalid case(s) skipped in {os.path.basename(path)}")
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,151 @@
+"""
+Cached, precompressed snapshot of the case catalog
+GET /api/cases returns the same body to every student, and a whole class asks for it at once
+when a session starts. The body is serialized once and compressed once per encoding. It is
+served with an ETag so a revisit that still has the catalog gets a 304.
+
+Paginated and filtered requests are answered from the same snapshot: specialty and has_exams
+are derived from case text, so they can't be filtered in SQL. Rows are indexed by facet,
+and a page is a bisect to the cursor plus a short scan, however many cases there are.
+"""
+
+import gzip
+import time
+import bisect
+import hashlib
+import threading
+from typing import Callable, Optional
+
+import brotli
+from fastapi import Response
+
+from responses import dumps
+
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip")
+
+# Row fields that can be filtered on (matched case-insensitively)
+FACETS = ("specialty", "difficulty", "has_exams")
+
+
+def facet_value(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+class Snapshot:
+    """One catalog (rows sorted by id) with its serialized and compressed bodies and facet index"""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = sorted(rows, key=lambda row: row["id"])
+        self.ids = [row["id"] for row in self.rows]
+        self.body = dumps(self.rows)
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        # (facet, value) -> ascending row positions
+        self._facets: dict[tuple[str, object], list[int]] = {}
+        for position, row in enumerate(self.rows):
+            for facet in FACETS:
+                self._facets.setdefault((facet, facet_value(row[facet])), []).append(position)
+        self._encoded: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def row(self, case_id: int) -> Optional[dict]:
+        position = bisect.bisect_left(self.ids, case_id)
+        if position < len(self.ids) and self.ids[position] == case_id:
+            return self.rows[position]
+        return None
+
+    def page(self, after: Optional[int], limit: int, filters: dict) -> tuple[list[dict], Optional[int]]:
+        """Up to `limit` rows with id > after matching every filter, and the next cursor (None at the end)"""
+        start = bisect.bisect_right(self.ids, after) if after is not None else 0
+        wanted = {facet: facet_value(value) for facet, value in filters.items() if value is not None}
+        if wanted:
+            # Walk the most selective facet; check the others per row
+            positions = min((self._facets.get(item, []) for item in wanted.items()), key=len)
+            candidates = positions[bisect.bisect_left(positions, start):]
+        else:
+            candidates = range(start, len(self.rows))
+        rows: list[dict] = []
+        for position in candidates:
+            row = self.rows[position]
+            if all(facet_value(row[facet]) == value for facet, value in wanted.items()):
+                if len(rows) == limit:
+                    return rows, rows[-1]["id"]
+                rows.append(row)
+        return rows, None
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        with self._lock:
+            if encoding not in self._encoded:
+                # Compressed once per snapshot, so spend the CPU on the smallest output
+                if encoding == "br":
+                    self._encoded[encoding] = brotli.compress(self.body, quality=11, mode=brotli.MODE_TEXT)
+                else:
+                    self._encoded[encoding] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            return self._encoded[encoding]
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of ENCODINGS the client accepts (honouring q=0), or None for identity"""
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CatalogCache:
+    """Holds the current snapshot (or other value built by `factory` from the same rows);
+    rebuilt after `ttl` seconds or when invalidated"""
+
+    def __init__(self, ttl: float = 300.0, factory: Callable = Snapshot):
+        self.ttl = ttl
+        self.factory = factory
+        self._entry: Optional[tuple[object, float]] = None
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def get(self, build: Callable[[], list]) -> tuple:
+        """(value, cache hit); `build` returns the factory's input and only runs on a miss"""
+        value = self._fresh()
+        if value is not None:
+            return value, True
+        with self._lock:
+            # Another request may have rebuilt it while we waited
+            value = self._fresh()
+            if value is not None:
+                return value, True
+            value = self.factory(build())
+            self._entry = (value, time.monotonic())
+            return value, False
+
+    def invalidate(self) -> None:
+        self._entry = None
+
+
+def snapshot_response(snapshot: Snapshot, if_none_match: Optional[str], accept_encoding: str) -> Response:
+    headers = {"ETag": snapshot.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if if_none_match and snapshot.etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(accept_encoding)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.encoded(encoding), media_type="application/json", headers=headers)
@@ -0,0 +1,85 @@
+"""
+Circuit breaker for the LLM provider
+After enough consecutive failures the circuit opens and callers go straight to their
+rule-based fallbacks. After a cool-down a limited number of half-open probe calls are
+let through; one success closes the circuit again, one failure re-opens it.
+"""
+
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1,
+                 on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_state_change = on_state_change
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            if self.on_state_change:
+                self.on_state_change(state)
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._probes = 0
+            self._set_state(HALF_OPEN)
+
+    def allow_request(self) -> bool:
+        """True if a call may go to the provider now (counts as a probe when half-open)"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                # A probe that never reported back (e.g. cancelled) shouldn't wedge the circuit
+                if self._probes >= self.half_open_max_calls and time.monotonic() - self._probe_started >= self.reset_timeout:
+                    self._probes = 0
+                if self._probes < self.half_open_max_calls:
+                    self._probes += 1
+                    self._probe_started = time.monotonic()
+                    return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probes = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probes = 0
+                self._set_state(OPEN)
+
+    def force_open(self) -> None:
+        """Open without a cool-down probe window, e.g. when no API key is configured"""
+        with self._lock:
+            self._opened_at = float("inf")
+            self._set_state(OPEN)
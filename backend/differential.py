@@ -0,0 +1,287 @@
+"""
+Local differential-diagnosis engine over the Kaggle disease-symptom matrix
+Ranks candidate diseases from disclosed and denied symptoms without an LLM call
+"""
+
+import os
+import re
+import csv
+import json
+import math
+from functools import lru_cache
+
+from symptom_vocab import DATA_DIR, get_vocabulary, normalize_phrase, normalize_symptom_key, split_negation, symptom_label
+
+# Laplace smoothing for P(symptom | disease) so no single answer zeroes out a disease
+SMOOTHING = 0.5
+
+# Each hand-built training case counts as this many dataset rows for its diagnosis
+CASE_ROW_WEIGHT = 10
+
+# Diseases below this posterior are no longer candidates when scoring questions
+CANDIDATE_THRESHOLD = 1e-4
+
+# Misspelled or awkward dataset.csv disease labels -> the name shown to students
+DISEASE_NAME_FIXES = {
+    "(vertigo) paroymsal positional vertigo": "Benign paroxysmal positional vertigo",
+    "osteoarthristis": "Osteoarthritis",
+    "peptic ulcer diseae": "Peptic ulcer disease",
+    "dimorphic hemmorhoids(piles)": "Hemorrhoids",
+    "paralysis (brain hemorrhage)": "Brain hemorrhage",
+    "urinary tract infections": "Urinary tract infection",
+    "atopic dermatitis": "Atopic dermatitis",
+    "hepatitis a": "Hepatitis A",
+}
+
+# Other names for a condition (after DISEASE_NAME_FIXES), so a case diagnosis matches its dataset disease
+DISEASE_ALIASES = {
+    "benign paroxysmal positional vertigo": ["bppv", "positional vertigo", "vertigo"],
+    "hypertension": ["high blood pressure"],
+    "bronchial asthma": ["asthma"],
+    "anemia": ["iron deficiency anemia", "anaemia"],
+    "gastroenteritis": ["viral gastroenteritis", "stomach flu"],
+    "gerd": ["gastroesophageal reflux disease", "acid reflux", "heartburn"],
+    "urinary tract infection": ["uti"],
+    "hemorrhoids": ["piles", "haemorrhoids"],
+    "flu": ["influenza"],
+    "chicken pox": ["chickenpox", "varicella"],
+}
+
+_DISEASE_ALIAS_INDEX = {alias: name for name, aliases in DISEASE_ALIASES.items() for alias in aliases}
+
+
+class DifferentialModel:
+    """Weighted naive Bayes over the disease-symptom matrix in dataset.csv.
+
+    Each symptom's log-likelihood contribution is scaled by its Symptom-severity.csv
+    weight, so a denied 'chest pain' moves the ranking more than a denied 'itching'.
+    """
+
+    def __init__(self, dataset_path: str, severity_path: str, cases_path: str | None = None):
+        row_counts: dict[str, int] = {}
+        symptom_counts: dict[str, dict[str, int]] = {}
+
+        with open(dataset_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if not row or not row[0].strip():
+                    continue
+                disease = row[0].strip()
+                row_counts[disease] = row_counts.get(disease, 0) + 1
+                counts = symptom_counts.setdefault(disease, {})
+                for token in row[1:]:
+                    key = normalize_symptom_key(token)
+                    if key:
+                        counts[key] = counts.get(key, 0) + 1
+
+        weights: dict[str, int] = {}
+        with open(severity_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if len(row) >= 2 and row[1].strip().isdigit():
+                    weights[normalize_symptom_key(row[0])] = int(row[1])
+
+        self.symptoms = sorted({s for counts in symptom_counts.values() for s in counts})
+        self._symptom_set = set(self.symptoms)
+        self._words = {s: set(symptom_label(s).split()) for s in self.symptoms}
+
+        if cases_path and os.path.exists(cases_path):
+            self._add_training_cases(cases_path, row_counts, symptom_counts)
+
+        self.diseases = sorted(row_counts)
+        mean_weight = sum(weights.values()) / len(weights) if weights else 1.0
+        # Relative weights (mean 1.0) keep posteriors on the same scale as plain naive Bayes
+        self.weights = {s: weights.get(s, mean_weight) / mean_weight for s in self.symptoms}
+
+        total_rows = sum(row_counts.values())
+        self.log_prior = [math.log(row_counts[d] / total_rows) for d in self.diseases]
+
+        # P(symptom | disease) per symptom, laid out in self.diseases order
+        self.likelihood: dict[str, list[float]] = {}
+        for s in self.symptoms:
+            self.likelihood[s] = [
+                (symptom_counts[d].get(s, 0) + SMOOTHING) / (row_counts[d] + 2 * SMOOTHING)
+                for d in self.diseases
+            ]
+
+    def _add_training_cases(self, cases_path: str, row_counts: dict[str, int],
+                            symptom_counts: dict[str, dict[str, int]]) -> None:
+        """Fold training_cases.json into the matrix as pseudo-rows per case diagnosis"""
+        with open(cases_path, 'r') as f:
+            cases = json.load(f).get('cases', [])
+
+        known = {d.lower(): d for d in row_counts}
+        for case in cases:
+            keys = {k for phrase in case.get('symptoms', {}).get('reported', []) for k in self.resolve(phrase)}
+            # A case with fewer resolvable symptoms than this says little about its diagnosis
+            if len(keys) < 2:
+                continue
+            disease = known.setdefault(case.get('diagnosis', '').lower(), case.get('diagnosis', ''))
+            if not disease:
+                continue
+            row_counts[disease] = row_counts.get(disease, 0) + CASE_ROW_WEIGHT
+            counts = symptom_counts.setdefault(disease, {})
+            for key in keys:
+                counts[key] = counts.get(key, 0) + CASE_ROW_WEIGHT
+
+    @lru_cache(maxsize=4096)
+    def resolve(self, phrase: str) -> tuple[str, ...]:
+        """Map a free-text symptom phrase ('fever', 'rash') to dataset symptom keys; () when it is negated"""
+        match = get_vocabulary().lookup(phrase)
+        if match is None or match[1]:
+            return ()
+        term = match[0]
+        if term.dataset_key in self._symptom_set:
+            return (term.dataset_key,)
+        # Broader phrases cover every dataset symptom they name ('fever' -> high and mild fever)
+        words = set(term.name.split())
+        return tuple(s for s in self.symptoms if words <= self._words[s])
+
+    def resolve_denied(self, phrase: str) -> tuple[str, ...]:
+        """Dataset keys for a symptom the patient denies, written either 'diarrhea' or 'no diarrhea'"""
+        return self.resolve(split_negation(normalize_phrase(phrase))[0])
+
+    @lru_cache(maxsize=4096)
+    def _group_likelihood(self, keys: tuple[str, ...]) -> tuple[tuple[float, ...], float]:
+        """P(any of keys | disease) approximated by the strongest key, plus the group weight"""
+        probs = tuple(max(self.likelihood[k][i] for k in keys) for i in range(len(self.diseases)))
+        return probs, max(self.weights[k] for k in keys)
+
+    def posterior(self, disclosed: list[str], denied: list[str]) -> list[float]:
+        """Normalized posterior over self.diseases given symptom phrases"""
+        scores = list(self.log_prior)
+        for phrases, present in ((disclosed, True), (denied, False)):
+            for phrase in phrases:
+                keys = self.resolve(phrase) if present else self.resolve_denied(phrase)
+                if not keys:
+                    continue
+                probs, weight = self._group_likelihood(keys)
+                for i, p in enumerate(probs):
+                    scores[i] += weight * math.log(p if present else 1.0 - p)
+
+        top = max(scores)
+        exp_scores = [math.exp(s - top) for s in scores]
+        total = sum(exp_scores)
+        return [e / total for e in exp_scores]
+
+    def rank(self, disclosed: list[str], denied: list[str], top_n: int = 5) -> list[tuple[str, float]]:
+        """Ranked (disease, probability) differentials for the symptoms seen so far.
+
+        Empty when no phrase resolves to a dataset symptom: the posterior would just be the prior.
+        """
+        if not any(self.resolve(p) for p in disclosed) and not any(self.resolve_denied(p) for p in denied):
+            return []
+        post = self.posterior(disclosed, denied)
+        ranked = sorted(zip(self.diseases, post), key=lambda x: x[1], reverse=True)
+        return ranked[:top_n]
+
+    def ruled_out(self, denied: list[str], threshold: float = 0.6) -> list[str]:
+        """Diseases for which a denied symptom is a hallmark (present in most dataset rows)"""
+        excluded: dict[str, float] = {}
+        for phrase in denied:
+            keys = self.resolve_denied(phrase)
+            if not keys:
+                continue
+            probs, _ = self._group_likelihood(keys)
+            for disease, p in zip(self.diseases, probs):
+                if p >= threshold and p > excluded.get(disease, 0.0):
+                    excluded[disease] = p
+        return [d for d, _ in sorted(excluded.items(), key=lambda x: x[1], reverse=True)]
+
+    def mentioned_keys(self, text: str) -> set[str]:
+        """Symptom keys whose label already appears in the given text"""
+        text = text.lower()
+        return {s for s in self.symptoms if symptom_label(s) in text}
+
+    def recommend_questions(self, disclosed: list[str], denied: list[str],
+                            asked_text: str = "", top_n: int = 3) -> list[tuple[str, float]]:
+        """Unasked symptoms ranked by expected information gain over the remaining candidates.
+
+        Returns (symptom label, gain in bits) pairs. A symptom splits the candidates well
+        when roughly half of the posterior mass expects it and half doesn't.
+        """
+        post = self.posterior(disclosed, denied)
+        candidates = [i for i, p in enumerate(post) if p >= CANDIDATE_THRESHOLD]
+        if len(candidates) < 2:
+            return []
+        mass = sum(post[i] for i in candidates)
+        prior = [post[i] / mass for i in candidates]
+        base_entropy = _entropy(prior)
+
+        asked = self.mentioned_keys(asked_text)
+        for phrase in disclosed:
+            asked.update(self.resolve(phrase))
+        for phrase in denied:
+            asked.update(self.resolve_denied(phrase))
+
+        gains = []
+        for s in self.symptoms:
+            if s in asked:
+                continue
+            lik = self.likelihood[s]
+            yes = [p * lik[i] for p, i in zip(prior, candidates)]
+            p_yes = sum(yes)
+            no = [p - y for p, y in zip(prior, yes)]
+            p_no = 1.0 - p_yes
+            if p_yes <= 0.0 or p_no <= 0.0:
+                continue
+            expected = p_yes * _entropy([y / p_yes for y in yes]) + p_no * _entropy([n / p_no for n in no])
+            gains.append((symptom_label(s), base_entropy - expected))
+
+        gains.sort(key=lambda x: x[1], reverse=True)
+        return gains[:top_n]
+
+    def weight(self, phrase: str) -> float:
+        """Relative severity weight of a symptom phrase (1.0 when unknown)"""
+        keys = self.resolve(phrase)
+        return max(self.weights[k] for k in keys) if keys else 1.0
+
+
+def _entropy(probs: list[float]) -> float:
+    return -sum(p * math.log2(p) for p in probs if p > 0.0)
+
+
+@lru_cache(maxsize=1)
+def get_differential_model() -> DifferentialModel:
+    """Load the matrix (plus the training cases) once per process"""
+    return DifferentialModel(
+        os.path.join(DATA_DIR, 'dataset.csv'),
+        os.path.join(DATA_DIR, 'Symptom-severity.csv'),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training_cases.json'),
+    )
+
+
+def disease_display_name(disease: str) -> str:
+    """The name to show for a dataset disease label ('Osteoarthristis' -> 'Osteoarthritis')"""
+    return DISEASE_NAME_FIXES.get(" ".join(disease.lower().split()), disease)
+
+
+@lru_cache(maxsize=1024)
+def disease_key(name: str) -> str:
+    """Lowercase, punctuation-free canonical form of a disease name, with aliases folded in"""
+    text = re.sub(r"[^a-z0-9]+", " ", disease_display_name(name).lower()).strip()
+    return _DISEASE_ALIAS_INDEX.get(text, text)
+
+
+def same_disease(disease: str, diagnosis: str) -> bool:
+    """Loose match between a dataset disease and a case diagnosis: equal keys, or one key's
+    words inside the other's ('Arthritis' and 'Rheumatoid Arthritis')"""
+    a, b = disease_key(disease), disease_key(diagnosis)
+    return f" {a} " in f" {b} " or f" {b} " in f" {a} "
+
+
+def mentioned_symptoms(symptoms: list[str], conversation_text: str) -> list[str]:
+    """Case symptoms that came up in the conversation (same word test as the decision tree,
+    plus any alias of the symptom, so asking about 'diarrhea' covers a case listing 'diarrhoea')"""
+    vocab = get_vocabulary()
+    found = []
+    for symptom in symptoms:
+        phrase, _ = split_negation(normalize_phrase(symptom))
+        words = [w for w in phrase.split() if len(w) > 3] or [phrase or symptom.lower()]
+        match = vocab.lookup(symptom)
+        forms = vocab.surface_forms(match[0].name) if match else ()
+        if any(word in conversation_text for word in words) or any(form in conversation_text for form in forms):
+            found.append(symptom)
+    return found
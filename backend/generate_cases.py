@@ -0,0 +1,230 @@
+"""
+Offline batch generator that synthesizes training cases from the Kaggle dataset
+Writes sharded JSONL in the training_cases.json case format.
+
+Usage:
+    python generate_cases.py --per-disease 100 --seed 42 --out generated_cases
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import random
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from differential import DATA_DIR, normalize_symptom_key, symptom_label
+
+DURATIONS = ["1 day", "2 days", "3 days", "5 days", "1 week", "2 weeks", "1 month", "several months"]
+ONSETS = ["came on suddenly", "started gradually", "has been getting slowly worse", "comes and goes"]
+TRIGGERS = ["nothing obvious", "possibly something I ate", "after a busy week at work",
+            "recent travel", "changes in the weather", "not sure"]
+
+
+def load_generation_inputs() -> dict:
+    """Read the dataset rows, severity weights, descriptions and precautions per disease"""
+    rows: dict[str, list[list[str]]] = {}
+    with open(os.path.join(DATA_DIR, 'dataset.csv'), 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            keys = [normalize_symptom_key(t) for t in row[1:] if t.strip()]
+            rows.setdefault(row[0].strip(), []).append(keys)
+
+    weights: dict[str, int] = {}
+    with open(os.path.join(DATA_DIR, 'Symptom-severity.csv'), 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) >= 2 and row[1].strip().isdigit():
+                weights[normalize_symptom_key(row[0])] = int(row[1])
+
+    descriptions: dict[str, str] = {}
+    with open(os.path.join(DATA_DIR, 'symptom_Description.csv'), 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) >= 2:
+                descriptions[row[0].strip().lower()] = row[1].strip()
+
+    precautions: dict[str, list[str]] = {}
+    with open(os.path.join(DATA_DIR, 'symptom_precaution.csv'), 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row:
+                precautions[row[0].strip().lower()] = [p.strip() for p in row[1:] if p.strip()]
+
+    return {"rows": rows, "weights": weights, "descriptions": descriptions, "precautions": precautions}
+
+
+def stable_seed(*parts) -> int:
+    """Seed derived from a hash so output is identical across runs and worker counts"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def symptom_set_hash(diagnosis: str, symptoms: list[str]) -> str:
+    """Dedup key: the diagnosis plus its unordered reported symptoms"""
+    payload = diagnosis.lower() + "|" + "|".join(sorted(s.lower() for s in symptoms))
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def slugify(text: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in text.lower()).strip("_")
+
+
+def synthesize_case(rng: random.Random, disease: str, row: list[str], other_symptoms: list[str],
+                    weights: dict[str, int], description: str, precautions: list[str]) -> dict:
+    """Build one case in training_cases.json format from a single dataset row"""
+    keep = min(len(row), rng.randint(3, 6))
+    reported_keys = rng.sample(row, keep) if len(row) > keep else list(row)
+    reported_keys.sort(key=lambda k: weights.get(k, 3), reverse=True)
+    reported = [symptom_label(k) for k in reported_keys]
+
+    negative_keys = rng.sample(other_symptoms, min(3, len(other_symptoms)))
+    negative = [f"no {symptom_label(k)}" for k in negative_keys]
+
+    mean_weight = sum(weights.get(k, 3) for k in reported_keys) / len(reported_keys)
+    severity = "mild" if mean_weight < 3 else ("moderate" if mean_weight < 5 else "severe")
+    duration = rng.choice(DURATIONS)
+
+    if len(reported) >= 2:
+        chief_complaint = f"I've had {reported[0]} and {reported[1]} for {duration} now"
+    else:
+        chief_complaint = f"I've had {reported[0]} for {duration} now"
+
+    # Fewer disclosed symptoms means less to go on, so a harder case
+    difficulty = 1 if len(reported) >= 5 else (2 if len(reported) >= 4 else 3)
+
+    return {
+        "case_id": f"{slugify(disease)}_{symptom_set_hash(disease, reported)}",
+        "patient": {
+            "age": rng.randint(18, 80),
+            "gender": rng.choice(["Male", "Female"]),
+        },
+        "presentation": {
+            "chief_complaint": chief_complaint,
+            "history": f"It {rng.choice(ONSETS)}. The {reported[0]} was the first thing I noticed.",
+            "duration": duration,
+            "severity": severity,
+            "triggers": rng.choice(TRIGGERS),
+        },
+        "symptoms": {
+            "reported": reported,
+            "negative": negative,
+            "exam_findings": [],
+        },
+        "diagnosis": disease,
+        "description": description,
+        "precautions": precautions,
+        "difficulty": difficulty,
+        "source": "Kaggle generated",
+    }
+
+
+def generate_disease_cases(disease: str, rows: list[list[str]], other_symptoms: list[str],
+                           weights: dict[str, int], description: str, precautions: list[str],
+                           count: int, seed: int) -> list[dict]:
+    """Worker: up to `count` unique cases for one disease"""
+    rng = random.Random(stable_seed(seed, disease))
+    cases = []
+    seen = set()
+    # Some diseases only have a handful of distinct symptom subsets
+    for _ in range(count * 5):
+        if len(cases) >= count:
+            break
+        case = synthesize_case(rng, disease, rng.choice(rows), other_symptoms, weights, description, precautions)
+        key = symptom_set_hash(disease, case["symptoms"]["reported"])
+        if key in seen:
+            continue
+        seen.add(key)
+        cases.append(case)
+    return cases
+
+
+def write_shards(cases, out_dir: str, shard_size: int) -> list[str]:
+    """Write cases as cases-00000.jsonl, cases-00001.jsonl, ... and return the paths.
+
+    Shards from an earlier run are removed first, so the loader never picks up stale cases.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(out_dir, "cases-*.jsonl")):
+        os.remove(stale)
+    paths = []
+    f = None
+    for i, case in enumerate(cases):
+        if i % shard_size == 0:
+            if f:
+                f.close()
+            path = os.path.join(out_dir, f"cases-{i // shard_size:05d}.jsonl")
+            paths.append(path)
+            f = open(path, 'w')
+        f.write(json.dumps(case) + "\n")
+    if f:
+        f.close()
+    return paths
+
+
+def generate_cases(per_disease: int, seed: int, out_dir: str, shard_size: int, workers: int | None) -> list[str]:
+    inputs = load_generation_inputs()
+    rows = inputs["rows"]
+    diseases = sorted(rows)
+    symptoms_by_disease = {d: {k for r in rows[d] for k in r} for d in diseases}
+    all_symptoms = sorted(set().union(*symptoms_by_disease.values()))
+
+    jobs = []
+    for disease in diseases:
+        other = [s for s in all_symptoms if s not in symptoms_by_disease[disease]]
+        jobs.append((
+            disease, rows[disease], other, inputs["weights"],
+            inputs["descriptions"].get(disease.lower(), ""),
+            inputs["precautions"].get(disease.lower(), []),
+            per_disease, seed,
+        ))
+
+    def dedup(results):
+        seen = set()
+        for disease_cases in results:
+            for case in disease_cases:
+                if case["case_id"] in seen:
+                    continue
+                seen.add(case["case_id"])
+                yield case
+
+    print(f"Generating up to {per_disease} cases for each of {len(diseases)} diseases...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps disease order, so shards are identical for a given seed
+        results = pool.map(generate_disease_cases, *zip(*jobs))
+        paths = write_shards(dedup(results), out_dir, shard_size)
+
+    total = 0
+    for path in paths:
+        with open(path, 'r') as f:
+            total += sum(1 for _ in f)
+    print(f"Wrote {total} cases to {len(paths)} shard(s) in {out_dir}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate training cases from the Kaggle dataset")
+    parser.add_argument("--per-disease", type=int, default=50, help="Cases to generate per disease")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for deterministic output")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated_cases"),
+                        help="Output directory for JSONL shards")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Cases per shard file")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    generate_cases(args.per_disease, args.seed, args.out, args.shard_size, args.workers)
+
+
+if __name__ == '__main__':
+    main()
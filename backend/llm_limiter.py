@@ -0,0 +1,146 @@
+"""
+Process-wide governor for LLM calls
+Caps concurrent calls, budgets requests and tokens per minute with token buckets,
+pauses everyone when the provider sends retry-after, and grants slots by priority so
+patient turns are served before hints and background feedback.
+"""
+
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+# Lower number = served first
+PRIORITY_PATIENT = 0
+PRIORITY_HINT = 1
+PRIORITY_COMPARE = 2
+PRIORITY_FEEDBACK = 3
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff, so retries from many requests spread out"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Refills continuously up to capacity; capacity is the per-minute budget"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if available now)"""
+        self._refill()
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMGovernor:
+    """Priority-ordered admission control for LLM calls"""
+
+    def __init__(self, max_concurrency: int, requests_per_minute: float, tokens_per_minute: float):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.active = 0
+        self.paused_until = 0.0
+        self._waiters: list[list] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w[2].done())
+
+    def has_headroom(self, reserve: float = 0.25) -> bool:
+        """True if nothing is waiting and more than `reserve` of each per-minute budget is left.
+
+        Speculative work checks this so it only spends capacity real requests aren't using.
+        """
+        return (self.queued == 0 and self.active < self.max_concurrency
+                and time.monotonic() >= self.paused_until
+                and self.requests.wait_time(self.requests.capacity * reserve) == 0
+                and self.tokens.wait_time(self.tokens.capacity * reserve) == 0)
+
+    def pause(self, seconds: float) -> None:
+        """Hold all new calls for `seconds` (provider asked us to back off)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        while self._waiters and self.active < self.max_concurrency:
+            priority, _, future, tokens = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = max(
+                self.paused_until - time.monotonic(),
+                self.requests.wait_time(1),
+                self.tokens.wait_time(tokens),
+            )
+            if delay > 0:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.active += 1
+            future.set_result(None)
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    async def acquire(self, priority: int, tokens: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._counter), future, tokens])
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: give the slot back
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._schedule()
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Return over-estimated tokens to the budget once real usage is known"""
+        if actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int):
+        await self.acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self.release()
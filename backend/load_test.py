@@ -0,0 +1,171 @@
+"""
+Load driver that simulates concurrent students running full interviews against the API
+Each student picks a case, asks a scripted series of questions via /api/patient-message,
+requests hints via /api/hint, then submits via /api/submit-diagnosis. Reports throughput
+and p50/p95/p99 latency per endpoint.
+
+Usage (offline, against the stub LLM):
+    python stub_llm.py --port 8100 &
+    ANTHROPIC_BASE_URL=http://localhost:8100 ANTHROPIC_API_KEY=stub python main.py &
+    python load_test.py --students 30 --turns 6 --hints 1
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+STUDENT_QUESTIONS = [
+    "What brings you in today?",
+    "How long has this been going on?",
+    "Can you describe the symptoms in more detail?",
+    "Does anything make it better or worse?",
+    "Have you had a fever or chills?",
+    "Any nausea, vomiting or changes in appetite?",
+    "Do you take any regular medications?",
+    "Any relevant medical history or allergies?",
+    "Has anyone around you been unwell?",
+    "I'd like to examine you now if that's okay.",
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoadTestResults:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "wall_seconds": round(wall_seconds, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def http_json(method: str, url: str, payload: dict | None = None, timeout: float = 120) -> tuple[int, dict | list | None]:
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        return 0, None
+
+
+async def timed_post(results: LoadTestResults, base_url: str, path: str, payload: dict) -> dict | None:
+    start = time.perf_counter()
+    status, body = await asyncio.to_thread(http_json, "POST", base_url + path, payload)
+    results.record(path, time.perf_counter() - start, status == 200)
+    return body if status == 200 and isinstance(body, dict) else None
+
+
+async def run_student(student_id: int, args, case_ids: list[int], results: LoadTestResults):
+    rng = random.Random(args.seed * 100003 + student_id)
+    case_id = rng.choice(case_ids)
+    conversation: list[dict] = []
+    # Every interview opens the same way; the rest of the script is shuffled per student
+    follow_ups = STUDENT_QUESTIONS[1:]
+    rng.shuffle(follow_ups)
+    questions = STUDENT_QUESTIONS[:1] + follow_ups
+    hint_turns = set(rng.sample(range(1, args.turns + 1), min(args.hints, args.turns)))
+    hints_used = 0
+
+    for turn in range(1, args.turns + 1):
+        question = questions[(turn - 1) % len(questions)]
+        body = await timed_post(results, args.base_url, "/api/patient-message", {
+            "case_id": case_id, "conversation": conversation, "student_message": question,
+            "hints_used": hints_used})
+        conversation.append({"role": "user", "content": question})
+        conversation.append({"role": "assistant", "content": (body or {}).get("response", "")})
+
+        if turn in hint_turns:
+            await timed_post(results, args.base_url, "/api/hint", {
+                "case_id": case_id, "conversation": conversation, "hints_used": hints_used})
+            hints_used += 1
+
+        if args.think_ms:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+    await timed_post(results, args.base_url, "/api/submit-diagnosis", {
+        "case_id": case_id, "conversation": conversation,
+        "diagnosis": rng.choice(["Common Cold", "Migraine", "Gastroenteritis"]), "hints_used": hints_used})
+
+
+async def run_load_test(args) -> dict:
+    # One thread per student, or the default executor would queue requests client-side
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.students + 1))
+    status, cases = await asyncio.to_thread(http_json, "GET", args.base_url + "/api/cases")
+    if status != 200 or not cases:
+        raise SystemExit(f"Could not list cases from {args.base_url}/api/cases (status {status})")
+    case_ids = [c["id"] for c in cases]
+
+    results = LoadTestResults()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_student(i, args, case_ids, results) for i in range(args.students)))
+    return results.summary(time.perf_counter() - start)
+
+
+def print_report(summary: dict):
+    print(f"\n{'endpoint':<26}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, s in summary["endpoints"].items():
+        print(f"{endpoint:<26}{s['requests']:>7}{s['errors']:>6}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+    print(f"\n{summary['total_requests']} requests in {summary['wall_seconds']}s "
+          f"= {summary['throughput_rps']} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent students against the backend")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--students", type=int, default=20, help="Concurrent simulated students")
+    parser.add_argument("--turns", type=int, default=6, help="Patient messages per interview")
+    parser.add_argument("--hints", type=int, default=1, help="Hints requested per interview")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between turns")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the summary as JSON to this path")
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
+
+    summary = asyncio.run(run_load_test(args))
+    print_report(summary)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
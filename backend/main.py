@@ -6,18 +6,26 @@ Database only stores cases. Chats are session-based (frontend manages state).
 import os
 import sys
 import re
+import time
+import asyncio
+import secrets
+import importlib
+import threading
+from contextlib import asynccontextmanager
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, BackgroundTasks, Header, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List
 
-from models import get_db, engine, Base, Case
+from models import get_db, engine, Base, Case, SessionLocal
 import schemas
+import metrics
 from ai_schemas import (
     PatientSimulationRequest,
     PatientCaseContext,
@@ -26,13 +34,71 @@ from ai_schemas import (
     FeedbackCaseContext,
     FeedbackConversationMessage,
 )
-from ai_service import generate_patient_response, generate_feedback, compare_diagnoses, generate_hint
 from ai_schemas import HintGenerationRequest, HintCaseContext, HintConversationMessage
+from prefetch import Prefetcher, conversation_state_key
+from responses import FastJSONResponse, dumps_line
+from catalog import CatalogCache, snapshot_response
+from search_index import SearchIndex
+from case_loader import PayloadTooLargeError, aiter_jsonl_lines
+from seed_data import iter_case_exports, write_case_batch
+from circuit_breaker import CLOSED
+
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "1") != "0"
+warmed_up = threading.Event()
+
+
+def warm_up():
+    """Build the catalog snapshot and search index, load the differential model and import the
+    LLM client, so the first requests to a new worker don't pay for them"""
+    start = time.perf_counter()
+    try:
+        db = SessionLocal()
+        try:
+            catalog_cache.get(lambda: [to_frontend_case(c) for c in db.query(Case).all()])
+            search_cache.get(lambda: search_documents(db))
+        finally:
+            db.close()
+        from differential import get_differential_model
+        get_differential_model()
+        # ai_service pulls in the Anthropic SDK, the bulk of import time; endpoints import it lazily
+        import ai_service
+        print(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print(f"Warm-up failed after {time.perf_counter() - start:.2f}s: {e}")
+    finally:
+        warmed_up.set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Off the event loop: the worker serves requests while caches fill
+    if STARTUP_WARMUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    else:
+        # Nothing to wait for; caches fill on first use
+        warmed_up.set()
+    yield
+
+
+_ai_service_loaded = False
+
+
+async def import_ai_service() -> None:
+    """Import ai_service in a worker thread the first time, so the event loop keeps serving
+    while the Anthropic SDK loads. Afterwards `from ai_service import ...` is a dict lookup."""
+    global _ai_service_loaded
+    if not _ai_service_loaded:
+        # Waits on the import lock if the warm-up thread is importing it right now
+        await asyncio.to_thread(importlib.import_module, "ai_service")
+        _ai_service_loaded = True
+
 
 app = FastAPI(
     title="Medical Case Training API",
     description="API for medical student training with GP-level patient cases",
-    version="3.0.0"
+    version="3.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -41,8 +107,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Compresses dynamic JSON (feedback, filtered catalog lists) above the threshold; the full
+# catalog is served precompressed by its snapshot and passes through untouched.
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.environ.get("GZIP_MINIMUM_SIZE", 1024)),
+    compresslevel=int(os.environ.get("GZIP_LEVEL", 6)),
+)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/api/cases/{case_id}) so ids don't explode cardinality
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start,
+                                        method=request.method, endpoint=endpoint, status=status)
+
 
 class MessageInput(BaseModel):
     role: str
@@ -52,6 +143,8 @@ class PatientMessageRequest(BaseModel):
     case_id: int
     conversation: List[MessageInput]
     student_message: str
+    # Lets the server prefetch the next hint for this conversation state
+    hints_used: Optional[int] = None
 
 class DiagnosisRequest(BaseModel):
     case_id: int
@@ -60,6 +153,20 @@ class DiagnosisRequest(BaseModel):
     hints_used: int = 0
 
 
+class BatchGradeRecord(DiagnosisRequest):
+    # Caller's identifier (e.g. student id), echoed back with the result
+    id: Optional[str] = None
+
+
+# Each distinct diagnosis in a batch can cost an LLM comparison, so one request is bounded
+BATCH_GRADE_MAX_SUBMISSIONS = int(os.environ.get("BATCH_GRADE_MAX_SUBMISSIONS", 500))
+
+
+class BatchGradeRequest(BaseModel):
+    submissions: List[BatchGradeRecord] = Field(max_length=BATCH_GRADE_MAX_SUBMISSIONS)
+    concurrency: Optional[int] = None
+
+
 class HintRequest(BaseModel):
     case_id: int
     conversation: List[MessageInput]
@@ -140,24 +247,217 @@ def root():
 
 @app.get("/api/health")
 def health():
-    return {"status": "healthy"}
+    # Probes must not load the LLM client (or wait on warm-up importing it); a breaker that
+    # isn't loaded yet has never opened
+    breaker = getattr(sys.modules.get("ai_service"), "breaker", None)
+    return {"status": "healthy", "llm": breaker.state if breaker else CLOSED, "warm": warmed_up.is_set()}
+
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of request, stage, LLM and cache metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """The X-Admin-Token header must match ADMIN_TOKEN; admin endpoints are disabled while it is unset"""
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: ADMIN_TOKEN is not set")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/api/admin/usage", dependencies=[Depends(require_admin)])
+def llm_usage(
+    window: Optional[int] = Query(default=None, ge=60, description="Seconds to look back (default: whole window)"),
+    group_by: str = Query(default="endpoint", pattern="^(endpoint|case|model)$"),
+    limit: int = Query(default=20, ge=1, le=500),
+):
+    """LLM token usage, cost, latency and prompt-cache hit ratio over the rolling window"""
+    from ai_service import usage_tracker
+    return usage_tracker.summary(window_seconds=window, group_by=group_by, limit=limit)
+
+
+def to_frontend_case(c: Case) -> dict:
+    """schemas.FrontendCaseResponse as a plain dict, ready to serialize without validation"""
+    return {
+        "id": c.id,
+        "title": c.chief_complaint or c.diagnosis,
+        "description": c.description or "",
+        "specialty": get_specialty(c.description or "", c.diagnosis),
+        "difficulty": difficulty_to_string(c.difficulty or 2),
+        "expected_diagnosis": c.diagnosis,
+        "acceptable_diagnoses": "",
+        "image_url": None,
+        "status": "available",
+        "has_exams": has_exam_findings(c.description or ""),
+    }
+
+
+catalog_cache = CatalogCache(ttl=float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", 300)))
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
+CATALOG_FIELDS = tuple(schemas.FrontendCaseResponse.model_fields)
+
+
+def parse_fields(fields: str) -> list[str]:
+    """Sparse fieldset from a comma-separated list of catalog fields"""
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in CATALOG_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown fields {unknown}; choose from {', '.join(CATALOG_FIELDS)}")
+    return selected
+
+
+# Catalog endpoints return responses directly; response_model only documents the shape
 @app.get("/api/cases", response_model=list[schemas.FrontendCaseResponse])
-def list_cases(db: Session = Depends(get_db)):
-    cases = db.query(Case).all()
-    return [schemas.FrontendCaseResponse(
-        id=c.id,
-        title=c.chief_complaint or c.diagnosis,
-        description=c.description or "",
-        specialty=get_specialty(c.description or "", c.diagnosis),
-        difficulty=difficulty_to_string(c.difficulty or 2),
-        expected_diagnosis=c.diagnosis,
-        acceptable_diagnoses="",
-        image_url=None,
-        status="available",
-        has_exams=has_exam_findings(c.description or "")
-    ) for c in cases]
+def list_cases(
+    db: Session = Depends(get_db),
+    accept_encoding: str = Header(default=""),
+    if_none_match: Optional[str] = Header(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=CATALOG_MAX_PAGE_SIZE),
+    after: Optional[int] = Query(default=None, description="Cursor: X-Next-Cursor from the previous page"),
+    specialty: Optional[str] = None,
+    difficulty: Optional[str] = Query(default=None, description="Beginner, Intermediate or Advanced"),
+    has_exams: Optional[bool] = None,
+    fields: Optional[str] = Query(default=None, description="Comma-separated subset, e.g. id,title,specialty"),
+):
+    """All cases, or one keyset page of them when any paging, filter or fields parameter is given.
+
+    Pages are ordered by id; X-Next-Cursor is set while more cases match.
+    """
+    snapshot, hit = catalog_cache.get(lambda: [to_frontend_case(c) for c in db.query(Case).all()])
+    metrics.record_cache("catalog", hit)
+    filters = {"specialty": specialty, "difficulty": difficulty, "has_exams": has_exams}
+    if limit is None and after is None and fields is None and all(v is None for v in filters.values()):
+        return snapshot_response(snapshot, if_none_match, accept_encoding)
+
+    selected = parse_fields(fields) if fields is not None else None
+    rows, next_cursor = snapshot.page(after, limit or CATALOG_PAGE_SIZE, filters)
+    if selected is not None:
+        rows = [{f: row[f] for f in selected} for row in rows]
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    return FastJSONResponse(rows, headers=headers)
+
+
+search_cache = CatalogCache(ttl=float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", 300)), factory=SearchIndex)
+SEARCH_FIELDS = "id,title,specialty,difficulty,expected_diagnosis"
+
+
+def search_documents(db: Session) -> list[tuple[int, dict[str, str]]]:
+    from models import CaseSymptom, Symptom
+
+    symptoms: dict[int, list[str]] = {}
+    for case_id, name in db.query(CaseSymptom.case_id, Symptom.name).join(Symptom).filter(
+            CaseSymptom.symptom_type != 'absent'):
+        symptoms.setdefault(case_id, []).append(name)
+    return [(c.id, {
+        "chief_complaint": c.chief_complaint or "",
+        "description": c.description or "",
+        "diagnosis": c.diagnosis,
+        "symptoms": " ".join(symptoms.get(c.id, [])),
+    }) for c in db.query(Case.id, Case.chief_complaint, Case.description, Case.diagnosis)]
+
+
+@app.get("/api/cases/search")
+def search_cases(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    fields: str = Query(default=SEARCH_FIELDS, description="Comma-separated catalog fields to return"),
+    db: Session = Depends(get_db),
+):
+    """Ranked full-text search over complaint, description, diagnosis and symptoms; the last word matches as a prefix"""
+    selected = parse_fields(fields)
+    index, hit = search_cache.get(lambda: search_documents(db))
+    metrics.record_cache("search_index", hit)
+    snapshot, hit = catalog_cache.get(lambda: [to_frontend_case(c) for c in db.query(Case).all()])
+    metrics.record_cache("catalog", hit)
+    results = []
+    for case_id, score in index.search(q, limit):
+        row = snapshot.row(case_id)
+        if row is not None:
+            results.append({**{f: row[f] for f in selected}, "score": round(score, 3)})
+    return FastJSONResponse(results)
+
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ERRORS = 100
+IMPORT_MAX_LINE_BYTES = int(os.environ.get("IMPORT_MAX_LINE_BYTES", 1024 * 1024))
+IMPORT_MAX_BODY_BYTES = int(os.environ.get("IMPORT_MAX_BODY_BYTES", 512 * 1024 * 1024))
+
+
+@app.post("/api/admin/cases/import", dependencies=[Depends(require_admin)])
+async def import_cases(
+    request: Request,
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    """Import an NDJSON/JSONL body of training cases (the export format), one case per line.
+
+    The body is parsed as it arrives and written batch_size cases per transaction. Cases whose
+    case_id already exists are skipped; invalid lines are reported and skipped. A line over
+    IMPORT_MAX_LINE_BYTES or a body over IMPORT_MAX_BODY_BYTES stops the import with a 413;
+    batches written before that stay imported.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > IMPORT_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Body is over {IMPORT_MAX_BODY_BYTES} bytes")
+    symptom_ids: dict[str, int] = {}
+    imported = skipped = invalid = 0
+    errors: list[dict] = []
+    batch: dict[str, schemas.TrainingCase] = {}
+
+    async def write(batch: dict[str, schemas.TrainingCase]) -> None:
+        nonlocal imported, skipped
+        written = await asyncio.to_thread(write_case_batch, db, list(batch.values()), symptom_ids)
+        imported += written
+        skipped += len(batch) - written
+
+    lines = aiter_jsonl_lines(request.stream(), IMPORT_MAX_LINE_BYTES, IMPORT_MAX_BODY_BYTES)
+    try:
+        async for line_number, line in lines:
+            try:
+                case = schemas.TrainingCase.model_validate_json(line)
+            except ValidationError as e:
+                invalid += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    error = e.errors(include_url=False)[0]
+                    errors.append({"line": line_number, "field": ".".join(str(p) for p in error["loc"]), "error": error["msg"]})
+                continue
+            if case.case_id in batch:
+                skipped += 1
+                continue
+            batch[case.case_id] = case
+            if len(batch) >= batch_size:
+                await write(batch)
+                batch = {}
+        if batch:
+            await write(batch)
+    except PayloadTooLargeError as e:
+        raise HTTPException(status_code=413, detail={"error": str(e), "imported": imported, "skipped": skipped})
+    finally:
+        if imported:
+            catalog_cache.invalidate()
+            search_cache.invalidate()
+    return {"imported": imported, "skipped": skipped, "invalid": invalid, "errors": errors}
+
+
+@app.get("/api/admin/cases/export", dependencies=[Depends(require_admin)])
+def export_cases(batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=5000)):
+    """Every case as NDJSON in the import format, streamed from a server-side cursor"""
+    def stream():
+        # Own session: the response outlives the request's dependencies
+        db = SessionLocal()
+        try:
+            for row in iter_case_exports(db, batch_size):
+                yield dumps_line(row)
+        finally:
+            db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="cases.jsonl"'})
 
 
 @app.get("/api/cases/{case_id}", response_model=schemas.FrontendCaseResponse)
@@ -165,37 +465,15 @@ def get_case(case_id: int, db: Session = Depends(get_db)):
     c = db.query(Case).filter(Case.id == case_id).first()
     if not c:
         raise HTTPException(status_code=404, detail="Case not found")
-    return schemas.FrontendCaseResponse(
-        id=c.id,
-        title=c.chief_complaint or c.diagnosis,
-        description=c.description or "",
-        specialty=get_specialty(c.description or "", c.diagnosis),
-        difficulty=difficulty_to_string(c.difficulty or 2),
-        expected_diagnosis=c.diagnosis,
-        acceptable_diagnoses="",
-        image_url=None,
-        status="available",
-        has_exams=has_exam_findings(c.description or "")
-    )
+    return FastJSONResponse(to_frontend_case(c))
 
 
-@app.get("/api/cases/difficulty/{difficulty}")
+@app.get("/api/cases/difficulty/{difficulty}", response_model=list[schemas.FrontendCaseResponse])
 def cases_by_difficulty(difficulty: str, db: Session = Depends(get_db)):
     diff_map = {"beginner": 1, "intermediate": 2, "advanced": 3}
     diff_int = diff_map.get(difficulty.lower(), 2)
     cases = db.query(Case).filter(Case.difficulty == diff_int).all()
-    return [schemas.FrontendCaseResponse(
-        id=c.id,
-        title=c.chief_complaint or c.diagnosis,
-        description=c.description or "",
-        specialty=get_specialty(c.description or "", c.diagnosis),
-        difficulty=difficulty_to_string(c.difficulty or 2),
-        expected_diagnosis=c.diagnosis,
-        acceptable_diagnoses="",
-        image_url=None,
-        status="available",
-        has_exams=has_exam_findings(c.description or "")
-    ) for c in cases]
+    return FastJSONResponse([to_frontend_case(c) for c in cases])
 
 
 @app.get("/api/cases/{case_id}/similar", response_model=list[schemas.FrontendCaseResponse])
@@ -234,83 +512,184 @@ def get_similar_cases(case_id: int, db: Session = Depends(get_db)):
     
     similar_cases.sort(key=lambda x: x[1], reverse=True)
     
-    return [schemas.FrontendCaseResponse(
-        id=c.id,
-        title=c.chief_complaint or c.diagnosis,
-        description=c.description or "",
-        specialty=get_specialty(c.description or "", c.diagnosis),
-        difficulty=difficulty_to_string(c.difficulty or 2),
-        expected_diagnosis=c.diagnosis,
-        acceptable_diagnoses="",
-        image_url=None,
-        status="available",
-        has_exams=has_exam_findings(c.description or "")
-    ) for c, _ in similar_cases]
+    return FastJSONResponse([to_frontend_case(c) for c, _ in similar_cases])
+
+
+hint_prefetcher = Prefetcher()
+HINT_PREFETCH_ENABLED = os.environ.get("HINT_PREFETCH", "1") != "0"
+
+# "incremental": grade deterministically as turns arrive and only ask Claude for the
+# insight narrative at submit time. "full": one large feedback generation at submit.
+FEEDBACK_MODE = os.environ.get("FEEDBACK_MODE", "full")
+pregrade_cache = Prefetcher()
+
+
+def build_hint_request(case: Case, conversation: List[tuple[str, str]], hints_used: int) -> HintGenerationRequest:
+    extracted = extract_symptoms_from_description(case.description or "")
+    return HintGenerationRequest(
+        case=HintCaseContext(
+            case_id=f"case_{case.id}",
+            presenting_symptoms=extracted["presenting"],
+            absent_symptoms=extracted["absent"],
+            exam_findings=extracted["exam_findings"],
+            expected_diagnosis=case.diagnosis
+        ),
+        conversation=[HintConversationMessage(role=role, content=content) for role, content in conversation],
+        hints_used=hints_used
+    )
+
+
+async def prefetch_hint(key: str, request: HintGenerationRequest, supersedes: Optional[str] = None):
+    """Background task: start generating the hint for a conversation state"""
+    await import_ai_service()
+    from ai_service import generate_hint, governor
+    # Speculation only uses spare LLM capacity; it must not delay real requests
+    if not governor.has_headroom():
+        # Still drop the previous state's hint: nothing will ask for it again
+        if supersedes is not None and supersedes != key:
+            hint_prefetcher.discard(supersedes)
+        return
+    hint_prefetcher.prefetch(key, lambda: generate_hint(request, hedge=False), supersedes=supersedes)
+
+
+def build_feedback_request(case: Case, conversation: List[tuple[str, str]], student_diagnosis: str,
+                           result: str) -> FeedbackGenerationRequest:
+    extracted = extract_symptoms_from_description(case.description or "")
+    return FeedbackGenerationRequest(
+        case=FeedbackCaseContext(
+            case_id=f"case_{case.id}",
+            title=case.chief_complaint or case.diagnosis,
+            description=case.description or "",
+            specialty=get_specialty(case.description or "", case.diagnosis),
+            difficulty=difficulty_to_string(case.difficulty or 2),
+            expected_diagnosis=case.diagnosis,
+            acceptable_diagnoses="",
+            presenting_symptoms=extracted["presenting"],
+            absent_symptoms=extracted["absent"],
+            exam_findings=extracted["exam_findings"]
+        ),
+        conversation=[FeedbackConversationMessage(sender=role, content=content, timestamp=None)
+                      for role, content in conversation],
+        student_diagnosis=student_diagnosis,
+        diagnosis_result=result,
+        time_spent_seconds=None
+    )
+
+
+async def prefetch_pregrade(key: str, request: FeedbackGenerationRequest, supersedes: Optional[str] = None):
+    """Background task: grade the interview so far off the event loop"""
+    await import_ai_service()
+    from ai_service import pregrade_conversation
+    pregrade_cache.prefetch(key, lambda: asyncio.to_thread(pregrade_conversation, request), supersedes=supersedes)
+
+
+def build_patient_context(case: Case) -> PatientCaseContext:
+    extracted = extract_symptoms_from_description(case.description or "")
+    demographics = infer_demographics(case.description or "")
+    return PatientCaseContext(
+        case_id=f"case_{case.id}",
+        age=demographics["age"],
+        gender=demographics["gender"],
+        chief_complaint=case.chief_complaint,
+        history=case.history,
+        duration=case.duration,
+        severity=case.severity,
+        triggers=case.triggers,
+        diagnosis=case.diagnosis,
+        description=case.description,
+        presenting_symptoms=extracted["presenting"],
+        absent_symptoms=extracted["absent"],
+        exam_findings=extracted["exam_findings"]
+    )
+
+
+def speculate_after_turn(background_tasks: BackgroundTasks, case: Case, before: List[tuple[str, str]],
+                         after: List[tuple[str, str]], hints_used: Optional[int]):
+    """Queue pre-grading and the next hint for the conversation state after a patient turn"""
+    if FEEDBACK_MODE == "incremental":
+        background_tasks.add_task(
+            prefetch_pregrade,
+            conversation_state_key(case.id, after),
+            # Placeholders: the pre-grade doesn't depend on the diagnosis
+            build_feedback_request(case, after, "", "wrong"),
+            supersedes=conversation_state_key(case.id, before))
+    if HINT_PREFETCH_ENABLED and hints_used is not None:
+        background_tasks.add_task(
+            prefetch_hint,
+            conversation_state_key(case.id, after, hints_used),
+            build_hint_request(case, after, hints_used),
+            supersedes=conversation_state_key(case.id, before, hints_used))
+
+
+def interview_messages(conversation: List[MessageInput]) -> List[tuple[str, str]]:
+    """(role, content) pairs the hint generator sees; hint bubbles from the UI are dropped"""
+    return [(m.role, m.content) for m in conversation if m.role in ("user", "assistant")]
+
+
+FALLBACK_PATIENT_REPLY = "I'm here, doctor. What would you like to know about how I'm feeling?"
 
 
 @app.post("/api/patient-message")
-async def patient_message(data: PatientMessageRequest, db: Session = Depends(get_db)):
+async def patient_message(data: PatientMessageRequest, background_tasks: BackgroundTasks,
+                          db: Session = Depends(get_db)):
     """Stateless patient simulation - receives full conversation history"""
-    case = db.query(Case).filter(Case.id == data.case_id).first()
+    await import_ai_service()
+    from ai_service import generate_patient_response
+    with metrics.stage("db_lookup", "patient"):
+        case = db.query(Case).filter(Case.id == data.case_id).first()
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
     
-    history = [ConversationMessage(role=m.role, content=m.content) for m in data.conversation]
-    extracted = extract_symptoms_from_description(case.description or "")
-    demographics = infer_demographics(case.description or "")
-    
     try:
-        request = PatientSimulationRequest(
-            case=PatientCaseContext(
-                case_id=f"case_{case.id}",
-                age=demographics["age"],
-                gender=demographics["gender"],
-                chief_complaint=case.chief_complaint,
-                history=case.history,
-                duration=case.duration,
-                severity=case.severity,
-                triggers=case.triggers,
-                diagnosis=case.diagnosis,
-                description=case.description,
-                presenting_symptoms=extracted["presenting"],
-                absent_symptoms=extracted["absent"],
-                exam_findings=extracted["exam_findings"]
-            ),
-            conversation_history=history,
-            student_message=data.student_message
-        )
+        with metrics.stage("context_building", "patient"):
+            history = [ConversationMessage(role=m.role, content=m.content) for m in data.conversation]
+            request = PatientSimulationRequest(
+                case=build_patient_context(case),
+                conversation_history=history,
+                student_message=data.student_message
+            )
         response = await generate_patient_response(request)
+        before = interview_messages(data.conversation)
+        after = before + [("user", data.student_message), ("assistant", response.patient_response)]
+        speculate_after_turn(background_tasks, case, before, after, data.hints_used)
         return {"response": response.patient_response}
     except Exception as e:
         import traceback
         print(f"AI error: {e}")
         print(f"Traceback: {traceback.format_exc()}")
-        return {"response": "I'm here, doctor. What would you like to know about how I'm feeling?"}
+        metrics.FALLBACKS.inc(endpoint="patient")
+        return {"response": FALLBACK_PATIENT_REPLY}
 
 
 @app.post("/api/hint")
-async def get_hint(data: HintRequest, db: Session = Depends(get_db)):
+async def get_hint(data: HintRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Get a progressive hint for the current case"""
-    case = db.query(Case).filter(Case.id == data.case_id).first()
+    with metrics.stage("db_lookup", "hint"):
+        case = db.query(Case).filter(Case.id == data.case_id).first()
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
     
-    extracted = extract_symptoms_from_description(case.description or "")
-    history = [HintConversationMessage(role=m.role, content=m.content) for m in data.conversation]
-    
+    return await serve_hint(case, interview_messages(data.conversation), data.hints_used, background_tasks)
+
+
+async def serve_hint(case: Case, conversation: List[tuple[str, str]], hints_used: int,
+                     background_tasks: BackgroundTasks) -> dict:
+    """Next hint (prefetched if available), then queue the one after it"""
+    await import_ai_service()
+    from ai_service import generate_hint
     try:
-        request = HintGenerationRequest(
-            case=HintCaseContext(
-                case_id=f"case_{case.id}",
-                presenting_symptoms=extracted["presenting"],
-                absent_symptoms=extracted["absent"],
-                exam_findings=extracted["exam_findings"],
-                expected_diagnosis=case.diagnosis
-            ),
-            conversation=history,
-            hints_used=data.hints_used
-        )
-        response = await generate_hint(request)
+        key = conversation_state_key(case.id, conversation, hints_used)
+        response = await hint_prefetcher.take(key)
+        metrics.record_cache("hint_prefetch", response is not None)
+        if response is None:
+            with metrics.stage("context_building", "hint"):
+                request = build_hint_request(case, conversation, hints_used)
+            response = await generate_hint(request)
+        if HINT_PREFETCH_ENABLED:
+            background_tasks.add_task(
+                prefetch_hint,
+                conversation_state_key(case.id, conversation, hints_used + 1),
+                build_hint_request(case, conversation, hints_used + 1))
         return {"hint": response.hint, "hintNumber": response.hint_number}
     except Exception as e:
         import traceback
@@ -321,40 +700,42 @@ async def get_hint(data: HintRequest, db: Session = Depends(get_db)):
             "Think about what associated symptoms might help narrow down the diagnosis.",
             "Have you explored the patient's relevant medical history?",
         ]
-        hint_index = min(data.hints_used, len(fallback_hints) - 1)
-        return {"hint": fallback_hints[hint_index], "hintNumber": data.hints_used + 1}
+        metrics.FALLBACKS.inc(endpoint="hint")
+        hint_index = min(hints_used, len(fallback_hints) - 1)
+        return {"hint": fallback_hints[hint_index], "hintNumber": hints_used + 1}
 
 
 @app.post("/api/submit-diagnosis")
 async def submit_diagnosis(data: DiagnosisRequest, db: Session = Depends(get_db)):
     """Submit diagnosis and get feedback - stateless, receives full conversation"""
-    case = db.query(Case).filter(Case.id == data.case_id).first()
+    await import_ai_service()
+    from ai_service import compare_diagnoses
+    with metrics.stage("db_lookup", "feedback"):
+        case = db.query(Case).filter(Case.id == data.case_id).first()
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
     
-    result = compare_diagnoses(data.diagnosis, case.diagnosis)
-    extracted = extract_symptoms_from_description(case.description or "")
-    
+    result = await compare_diagnoses(data.diagnosis, case.diagnosis, case_id=f"case_{case.id}")
+    return FastJSONResponse(await grade_submission(case, data, result))
+
+
+async def grade_submission(case: Case, data: DiagnosisRequest, result: str) -> dict:
+    """Feedback payload for one submission whose diagnosis has already been compared"""
+    await import_ai_service()
+    from ai_service import generate_feedback, generate_incremental_feedback
     try:
-        request = FeedbackGenerationRequest(
-            case=FeedbackCaseContext(
-                case_id=f"case_{case.id}",
-                title=case.chief_complaint or case.diagnosis,
-                description=case.description or "",
-                specialty=get_specialty(case.description or "", case.diagnosis),
-                difficulty=difficulty_to_string(case.difficulty or 2),
-                expected_diagnosis=case.diagnosis,
-                acceptable_diagnoses="",
-                presenting_symptoms=extracted["presenting"],
-                absent_symptoms=extracted["absent"],
-                exam_findings=extracted["exam_findings"]
-            ),
-            conversation=[FeedbackConversationMessage(sender=m.role, content=m.content, timestamp=None) for m in data.conversation],
-            student_diagnosis=data.diagnosis,
-            diagnosis_result=result,
-            time_spent_seconds=None
-        )
-        fb = await generate_feedback(request)
+        if FEEDBACK_MODE == "incremental":
+            conversation = interview_messages(data.conversation)
+            pregrade = await pregrade_cache.take(conversation_state_key(case.id, conversation))
+            metrics.record_cache("pregrade", pregrade is not None)
+            with metrics.stage("context_building", "feedback"):
+                request = build_feedback_request(case, conversation, data.diagnosis, result)
+            fb = await generate_incremental_feedback(request, pregrade)
+        else:
+            with metrics.stage("context_building", "feedback"):
+                request = build_feedback_request(
+                    case, [(m.role, m.content) for m in data.conversation], data.diagnosis, result)
+            fb = await generate_feedback(request)
         hint_penalty = data.hints_used * 3
         adjusted_score = max(0, fb.score - hint_penalty)
         return {
@@ -378,9 +759,157 @@ async def submit_diagnosis(data: DiagnosisRequest, db: Session = Depends(get_db)
         }
     except Exception as e:
         print(f"AI feedback error: {e}")
+        metrics.FALLBACKS.inc(endpoint="feedback")
         return generate_fallback_response(case, data.conversation, data.diagnosis, result, data.hints_used)
 
 
+# Client frames per interview connection, malformed ones included, before the server closes it
+WS_MAX_TURNS = int(os.environ.get("WS_MAX_TURNS", 200))
+
+
+@app.websocket("/ws/interview/{case_id}")
+async def interview_socket(websocket: WebSocket, case_id: int):
+    """One interview over a single connection; the case and transcript stay in memory.
+
+    Client sends {"type": "message", "content"}, {"type": "hint"} or {"type": "submit", "diagnosis"}.
+    Server replies with "token" chunks then a final "message" (authoritative, replaces the
+    chunks), "hint", or "feedback" (same body as /api/submit-diagnosis, then closes).
+    Frames that aren't JSON text get an "error" reply; after WS_MAX_TURNS frames the socket closes.
+    """
+    await import_ai_service()
+    from ai_service import generate_patient_response, compare_diagnoses
+    db = SessionLocal()
+    try:
+        with metrics.stage("db_lookup", "ws"):
+            case = db.query(Case).filter(Case.id == case_id).first()
+    finally:
+        db.close()
+    if not case:
+        await websocket.close(code=4404, reason="Case not found")
+        return
+
+    await websocket.accept()
+    patient_case = build_patient_context(case)
+    conversation: List[tuple[str, str]] = []
+    history: List[ConversationMessage] = []
+    hints_used = 0
+
+    async def send_token(chunk: str):
+        await websocket.send_json({"type": "token", "text": chunk})
+
+    await websocket.send_json({"type": "ready", "caseId": case.id})
+    try:
+        for _ in range(WS_MAX_TURNS):
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError):
+                # Invalid JSON, or a binary frame where text was expected
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON text frame"})
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+            background_tasks = BackgroundTasks()
+
+            if kind == "message":
+                content = str(message.get("content") or "").strip()
+                if not content:
+                    await websocket.send_json({"type": "error", "detail": "Empty message"})
+                    continue
+                request = PatientSimulationRequest(case=patient_case, conversation_history=list(history),
+                                                   student_message=content)
+                try:
+                    reply = (await generate_patient_response(request, on_text=send_token)).patient_response
+                except Exception as e:
+                    print(f"AI error: {e}")
+                    metrics.FALLBACKS.inc(endpoint="patient")
+                    reply = FALLBACK_PATIENT_REPLY
+                before = list(conversation)
+                conversation += [("user", content), ("assistant", reply)]
+                history += [ConversationMessage(role="user", content=content),
+                            ConversationMessage(role="assistant", content=reply)]
+                await websocket.send_json({"type": "message", "content": reply})
+                speculate_after_turn(background_tasks, case, before, conversation, hints_used)
+
+            elif kind == "hint":
+                payload = await serve_hint(case, conversation, hints_used, background_tasks)
+                hints_used += 1
+                await websocket.send_json({"type": "hint", **payload})
+
+            elif kind == "submit":
+                diagnosis = str(message.get("diagnosis") or "").strip()
+                if not diagnosis:
+                    await websocket.send_json({"type": "error", "detail": "Diagnosis required"})
+                    continue
+                result = await compare_diagnoses(diagnosis, case.diagnosis, case_id=f"case_{case.id}")
+                submission = DiagnosisRequest(
+                    case_id=case.id, diagnosis=diagnosis, hints_used=hints_used,
+                    conversation=[MessageInput(role=role, content=content) for role, content in conversation])
+                payload = await grade_submission(case, submission, result)
+                await websocket.send_json({"type": "feedback", **payload})
+                await websocket.close()
+                return
+
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+
+            await background_tasks()
+
+        await websocket.send_json({"type": "error", "detail": f"Interview exceeded {WS_MAX_TURNS} messages"})
+        await websocket.close(code=1008, reason="Too many messages")
+    except WebSocketDisconnect:
+        pass
+
+
+BATCH_GRADE_CONCURRENCY = int(os.environ.get("BATCH_GRADE_CONCURRENCY", 8))
+BATCH_GRADE_MAX_CONCURRENCY = int(os.environ.get("BATCH_GRADE_MAX_CONCURRENCY", 32))
+
+
+@app.post("/api/batch-grade", dependencies=[Depends(require_admin)])
+async def batch_grade(data: BatchGradeRequest, db: Session = Depends(get_db)):
+    """Grade many submissions at once; streams one JSON line per submission as each finishes.
+
+    Admin only, and at most BATCH_GRADE_MAX_SUBMISSIONS per request.
+    """
+    await import_ai_service()
+    from ai_service import compare_diagnoses
+    with metrics.stage("db_lookup", "batch_grade"):
+        case_ids = {s.case_id for s in data.submissions}
+        cases = {c.id: c for c in db.query(Case).filter(Case.id.in_(case_ids)).all()}
+    concurrency = max(1, min(data.concurrency or BATCH_GRADE_CONCURRENCY, BATCH_GRADE_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    # A class mostly submits a handful of distinct diagnoses per case: compare each once per case
+    comparisons: dict[tuple[int, str], asyncio.Task] = {}
+
+    def comparison(diagnosis: str, case: Case) -> asyncio.Task:
+        key = (case.id, " ".join(diagnosis.lower().split()))
+        hit = key in comparisons
+        if not hit:
+            comparisons[key] = asyncio.create_task(
+                compare_diagnoses(diagnosis, case.diagnosis, case_id=f"case_{case.id}"))
+        metrics.record_cache("diagnosis_comparison", hit)
+        return comparisons[key]
+
+    async def grade(index: int, submission: BatchGradeRecord) -> dict:
+        case = cases.get(submission.case_id)
+        if case is None:
+            return {"index": index, "id": submission.id, "caseId": submission.case_id, "error": "Case not found"}
+        async with semaphore:
+            result = await comparison(submission.diagnosis, case)
+            graded = await grade_submission(case, submission, result)
+        return {"index": index, "id": submission.id, "caseId": submission.case_id, **graded}
+
+    async def stream():
+        tasks = [asyncio.create_task(grade(i, s)) for i, s in enumerate(data.submissions)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield dumps_line(await finished)
+        finally:
+            # Client went away: stop grading
+            for task in tasks + list(comparisons.values()):
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 def generate_fallback_response(case, conversation, user_diagnosis, result, hints_used=0):
     n = len([m for m in conversation if m.role == "user"])
     is_correct = result == "correct"
@@ -450,5 +979,7 @@ def generate_fallback_response(case, conversation, user_diagnosis, result, hints
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     Base.metadata.create_all(bind=engine)
     uvicorn.run(app, host="0.0.0.0", port=8000)
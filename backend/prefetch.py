@@ -0,0 +1,88 @@
+"""
+Speculative background work keyed by conversation state
+Used to generate the next hint and pre-grade the interview after each turn, so the
+student's click is usually answered from memory. Results are keyed by a hash of the
+conversation state, and a state's entry is dropped once the conversation moves on.
+"""
+
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+# Roles that are part of the interview; hint bubbles are UI-only
+CONVERSATION_ROLES = ("user", "assistant")
+
+
+def conversation_state_key(case_id: int, conversation: list[tuple[str, str]], hints_used: Optional[int] = None) -> str:
+    """Stable digest of (case, interview so far, hints already shown if it matters)"""
+    digest = hashlib.sha256(f"{case_id}|{hints_used}".encode())
+    for role, content in conversation:
+        if role in CONVERSATION_ROLES:
+            digest.update(f"\x1e{role}\x1f{content.strip()}".encode())
+    return digest.hexdigest()
+
+
+class Prefetcher:
+    """In-flight and finished background results keyed by conversation state"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (task, created_at)
+        self._tasks: OrderedDict[str, tuple[asyncio.Task, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def discard(self, key: str) -> None:
+        entry = self._tasks.pop(key, None)
+        if entry is not None and not entry[0].done():
+            entry[0].cancel()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._tasks:
+            key, (_, created_at) = next(iter(self._tasks.items()))
+            if len(self._tasks) <= self.max_entries and now - created_at < self.ttl:
+                break
+            self.discard(key)
+
+    def prefetch(self, key: str, generate: Callable[[], Awaitable], supersedes: Optional[str] = None) -> None:
+        """Start `generate()` for `key` unless already cached or running; drops the state it replaces"""
+        if supersedes is not None and supersedes != key:
+            self.discard(supersedes)
+        if key in self._tasks:
+            return
+        task = asyncio.create_task(generate())
+        task.add_done_callback(lambda t: self._forget_failed(key, t))
+        self._tasks[key] = (task, time.monotonic())
+        self._evict()
+
+    def _forget_failed(self, key: str, task: asyncio.Task) -> None:
+        # A failed prefetch just means the work is redone on demand
+        if task.cancelled() or task.exception() is None:
+            return
+        entry = self._tasks.get(key)
+        if entry is not None and entry[0] is task:
+            del self._tasks[key]
+
+    async def take(self, key: str):
+        """The prefetched result for `key` (waiting if still running), or None"""
+        entry = self._tasks.pop(key, None)
+        if entry is None:
+            return None
+        task, created_at = entry
+        if time.monotonic() - created_at >= self.ttl:
+            task.cancel()
+            return None
+        try:
+            # shield: a client disconnect shouldn't cancel work a retry could still use
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
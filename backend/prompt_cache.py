@@ -0,0 +1,109 @@
+"""
+Precompiled prompt templates with per-case rendering cached
+Each template is parsed once into literal text and fields. The case fields are rendered
+once per (case id, case version) into a few static chunks. After that a turn only joins
+those chunks with the conversation and student message, so the multi-kilobyte template
+is never run through str.format() again.
+"""
+
+import string
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+
+class CompiledPrompt:
+    """A str.format() template split into case fields (rendered once) and turn fields"""
+
+    def __init__(self, name: str, template: str, turn_fields: tuple[str, ...]):
+        self.name = name
+        self.turn_fields = frozenset(turn_fields)
+        # Alternating literal text and field names, with "{{"/"}}" already unescaped
+        self.segments: list[tuple[bool, str]] = []
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if literal:
+                self.segments.append((False, literal))
+            if field is not None:
+                if spec or conversion or not field.isidentifier():
+                    raise ValueError(f"{name}: only plain {{field}} placeholders are supported, got {field!r}")
+                self.segments.append((True, field))
+        self.case_fields = frozenset(f for is_field, f in self.segments if is_field) - self.turn_fields
+        missing = self.turn_fields - {f for is_field, f in self.segments if is_field}
+        if missing:
+            raise ValueError(f"{name}: turn fields not in template: {sorted(missing)}")
+
+    def bind(self, case_values: dict) -> "BoundPrompt":
+        """Render the case fields; consecutive static text collapses into one chunk"""
+        chunks: list[str] = []
+        slots: list[str] = []
+        pending: list[str] = []
+        for is_field, value in self.segments:
+            if is_field and value in self.turn_fields:
+                chunks.append("".join(pending))
+                slots.append(value)
+                pending = []
+            else:
+                pending.append(str(case_values[value]) if is_field else value)
+        chunks.append("".join(pending))
+        return BoundPrompt(chunks, slots)
+
+
+class BoundPrompt:
+    """A template with its case fields filled in; render() adds the turn fields"""
+    __slots__ = ("chunks", "slots", "_digest")
+
+    def __init__(self, chunks: list[str], slots: list[str]):
+        # len(chunks) == len(slots) + 1: chunk, slot, chunk, slot, ..., chunk
+        self.chunks = chunks
+        self.slots = slots
+        self._digest: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        """Short digest of the case-specific text, for keying caches that depend on it"""
+        if self._digest is None:
+            self._digest = hashlib.sha1("\x00".join(self.chunks).encode()).hexdigest()[:12]
+        return self._digest
+
+    def render(self, **turn_values) -> str:
+        parts = [self.chunks[0]]
+        for slot, chunk in zip(self.slots, self.chunks[1:]):
+            parts.append(str(turn_values[slot]))
+            parts.append(chunk)
+        return "".join(parts)
+
+
+def case_version(case: BaseModel) -> tuple:
+    """Hashable fingerprint of a case context; an edited case gets a new prompt"""
+    return tuple(tuple(value) if isinstance(value, list) else value
+                 for value in (getattr(case, name) for name in type(case).model_fields))
+
+
+class PromptCache:
+    """LRU of bound prompts keyed by (template, case id, case version)"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, BoundPrompt] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prompt: CompiledPrompt, case: BaseModel,
+            case_values: Callable[[], dict]) -> tuple[BoundPrompt, bool]:
+        """(bound prompt, cache hit) for this case; `case_values` is only called on a miss"""
+        key = (prompt.name, getattr(case, "case_id", None), case_version(case))
+        bound = self._entries.get(key)
+        if bound is not None:
+            self._entries.move_to_end(key)
+            return bound, True
+        bound = prompt.bind(case_values())
+        self._entries[key] = bound
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return bound, False
+
+    def clear(self) -> None:
+        self._entries.clear()
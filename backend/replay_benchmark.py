@@ -0,0 +1,309 @@
+"""
+Offline replay benchmark for the AI pipeline
+Replays a corpus of interview transcripts through generate_patient_response,
+compare_diagnoses and generate_feedback, several times per transcript, and records
+latency, token usage, fallbacks and grading stability per case. Reports are JSON and
+can be diffed with the `compare` subcommand to choose a model or prompt on data.
+
+Transcripts are JSONL records {"case_id", "conversation": [{"role", "content"}], "diagnosis"}
+where case_id refers to training_cases.json (or --cases files). Recorded patient replies
+are kept as history; student turns without one are answered by the generated reply.
+Without --transcripts, scripted interviews are synthesized from the training cases.
+
+Usage:
+    python stub_llm.py --port 8100 &
+    ANTHROPIC_BASE_URL=http://localhost:8100 ANTHROPIC_API_KEY=stub \\
+        python replay_benchmark.py run --limit 10 --repeats 3 --out baseline.json
+    python replay_benchmark.py run --model claude-3-5-sonnet-20241022 --out sonnet.json
+    python replay_benchmark.py compare baseline.json sonnet.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+
+import ai_service
+import metrics
+from ai_schemas import (
+    PatientSimulationRequest,
+    PatientCaseContext,
+    ConversationMessage,
+    FeedbackGenerationRequest,
+    FeedbackCaseContext,
+    FeedbackConversationMessage,
+)
+from case_loader import iter_cases
+from load_test import STUDENT_QUESTIONS, percentile
+from schemas import TrainingCase
+
+DEFAULT_CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training_cases.json')
+STAGES = ("patient", "compare", "feedback")
+
+
+def load_transcripts(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthesize_transcripts(cases: dict[str, TrainingCase], limit: int, turns: int) -> list[dict]:
+    """Scripted interviews (questions only) that end with the correct diagnosis"""
+    transcripts = []
+    for case in list(cases.values())[:limit]:
+        questions = STUDENT_QUESTIONS[:turns]
+        transcripts.append({
+            "case_id": case.case_id,
+            "conversation": [{"role": "user", "content": q} for q in questions],
+            "diagnosis": case.diagnosis,
+        })
+    return transcripts
+
+
+def patient_context(case: TrainingCase) -> PatientCaseContext:
+    return PatientCaseContext(
+        case_id=case.case_id,
+        age=str(case.patient.age),
+        gender=case.patient.gender,
+        chief_complaint=case.presentation.chief_complaint,
+        history=case.presentation.history,
+        duration=case.presentation.duration,
+        severity=case.presentation.severity,
+        triggers=case.presentation.triggers,
+        diagnosis=case.diagnosis,
+        description=case.description,
+        presenting_symptoms=case.symptoms.reported,
+        absent_symptoms=case.symptoms.negative,
+        exam_findings=case.symptoms.exam_findings,
+    )
+
+
+def feedback_context(case: TrainingCase) -> FeedbackCaseContext:
+    return FeedbackCaseContext(
+        case_id=case.case_id,
+        title=case.presentation.chief_complaint,
+        description=case.description or "",
+        specialty="General Medicine",
+        difficulty={1: "Beginner", 2: "Intermediate", 3: "Advanced"}.get(case.difficulty, "Intermediate"),
+        expected_diagnosis=case.diagnosis,
+        acceptable_diagnoses="",
+        presenting_symptoms=case.symptoms.reported,
+        absent_symptoms=case.symptoms.negative,
+        exam_findings=case.symptoms.exam_findings,
+    )
+
+
+def token_snapshot() -> dict[str, tuple[float, float]]:
+    return {stage: (metrics.LLM_TOKENS.value(endpoint=stage, direction="input"),
+                    metrics.LLM_TOKENS.value(endpoint=stage, direction="output")) for stage in STAGES}
+
+
+def fallback_snapshot() -> dict[str, float]:
+    return {stage: metrics.FALLBACKS.value(endpoint=stage) for stage in STAGES}
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.input_tokens = 0.0
+        self.output_tokens = 0.0
+        self.fallbacks = 0.0
+
+    def summary(self) -> dict:
+        calls = len(self.latencies)
+        return {
+            "calls": calls,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "input_tokens_per_call": round(self.input_tokens / calls, 1) if calls else 0.0,
+            "output_tokens_per_call": round(self.output_tokens / calls, 1) if calls else 0.0,
+            "fallback_rate": round(self.fallbacks / calls, 3) if calls else 0.0,
+        }
+
+
+async def timed(stats: StageStats, coro):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        stats.latencies.append(time.perf_counter() - start)
+
+
+async def replay_once(case: TrainingCase, transcript: dict, stats: dict[str, StageStats]) -> tuple[str, int]:
+    history: list[ConversationMessage] = []
+    recorded = transcript["conversation"]
+    for i, message in enumerate(recorded):
+        if message["role"] != "user":
+            continue
+        request = PatientSimulationRequest(case=patient_context(case), conversation_history=list(history),
+                                           student_message=message["content"])
+        response = await timed(stats["patient"], ai_service.generate_patient_response(request))
+        history.append(ConversationMessage(role="user", content=message["content"]))
+        following = recorded[i + 1] if i + 1 < len(recorded) else None
+        reply = following["content"] if following and following["role"] == "assistant" else response.patient_response
+        history.append(ConversationMessage(role="assistant", content=reply))
+
+    comparing = ai_service.compare_diagnoses(transcript["diagnosis"], case.diagnosis, case_id=case.case_id)
+    result = await timed(stats["compare"], comparing)
+    feedback_request = FeedbackGenerationRequest(
+        case=feedback_context(case),
+        conversation=[FeedbackConversationMessage(sender=m.role, content=m.content) for m in history],
+        student_diagnosis=transcript["diagnosis"],
+        diagnosis_result=result,
+    )
+    feedback = await timed(stats["feedback"], ai_service.generate_feedback(feedback_request))
+    return result, feedback.score
+
+
+async def replay_case(case: TrainingCase, transcript: dict, repeats: int) -> dict:
+    stats = {stage: StageStats() for stage in STAGES}
+    tokens_before, fallbacks_before = token_snapshot(), fallback_snapshot()
+    results, scores = [], []
+    for _ in range(repeats):
+        result, score = await replay_once(case, transcript, stats)
+        results.append(result)
+        scores.append(score)
+    # Cases run one at a time, so counter deltas belong to this case
+    tokens_after, fallbacks_after = token_snapshot(), fallback_snapshot()
+    for stage in STAGES:
+        stats[stage].input_tokens = tokens_after[stage][0] - tokens_before[stage][0]
+        stats[stage].output_tokens = tokens_after[stage][1] - tokens_before[stage][1]
+        stats[stage].fallbacks = fallbacks_after[stage] - fallbacks_before[stage]
+
+    modal_result, modal_count = Counter(results).most_common(1)[0]
+    return {
+        "diagnosis": transcript["diagnosis"],
+        "expected": case.diagnosis,
+        "result": modal_result,
+        "result_agreement": round(modal_count / len(results), 3),
+        "scores": scores,
+        "score_mean": round(statistics.mean(scores), 2),
+        "score_stdev": round(statistics.pstdev(scores), 2),
+        "stages": {stage: stats[stage].summary() for stage in STAGES},
+    }
+
+
+def summarize(case_reports: dict[str, dict]) -> dict:
+    reports = list(case_reports.values())
+    if not reports:
+        return {}
+    totals = {
+        "cases": len(reports),
+        "score_mean": round(statistics.mean(r["score_mean"] for r in reports), 2),
+        "score_stdev_mean": round(statistics.mean(r["score_stdev"] for r in reports), 2),
+        "result_agreement_mean": round(statistics.mean(r["result_agreement"] for r in reports), 3),
+    }
+    for stage in STAGES:
+        stage_reports = [r["stages"][stage] for r in reports]
+        for field in ("p50_ms", "p95_ms", "input_tokens_per_call", "output_tokens_per_call", "fallback_rate"):
+            totals[f"{stage}_{field}"] = round(statistics.mean(s[field] for s in stage_reports), 3)
+    return totals
+
+
+async def run_benchmark(args) -> dict:
+    cases = {case.case_id: case for case in iter_cases(args.cases)}
+    if args.transcripts:
+        transcripts = load_transcripts(args.transcripts)[:args.limit]
+    else:
+        transcripts = synthesize_transcripts(cases, args.limit, args.turns)
+
+    if args.model:
+        ai_service.CLAUDE_MODEL = args.model
+    if args.patient_prompt:
+        with open(args.patient_prompt) as f:
+            ai_service.set_prompt("patient", f.read())
+    if args.feedback_prompt:
+        with open(args.feedback_prompt) as f:
+            ai_service.set_prompt("feedback", f.read())
+    # Measure the model, not the caches or hedging in front of it
+    ai_service.response_cache.max_history = -1
+    ai_service.LATENCY_BUDGET_PATIENT = 0
+
+    case_reports = {}
+    start = time.perf_counter()
+    for n, transcript in enumerate(transcripts, 1):
+        case = cases.get(transcript["case_id"])
+        if case is None:
+            print(f"  Skipping transcript for unknown case {transcript['case_id']}", file=sys.stderr)
+            continue
+        key = transcript.get("id") or f"{transcript['case_id']}#{n}"
+        case_reports[key] = await replay_case(case, transcript, args.repeats)
+        report = case_reports[key]
+        print(f"  [{n}/{len(transcripts)}] {key}: score {report['score_mean']} ± {report['score_stdev']}, "
+              f"result {report['result']} ({report['result_agreement']:.0%})", file=sys.stderr)
+
+    return {
+        "config": {
+            "model": ai_service.CLAUDE_MODEL,
+            "patient_prompt": args.patient_prompt or "default",
+            "feedback_prompt": args.feedback_prompt or "default",
+            "base_url": os.environ.get("ANTHROPIC_BASE_URL", "https://api.anthropic.com"),
+            "repeats": args.repeats,
+            "wall_seconds": round(time.perf_counter() - start, 2),
+        },
+        "summary": summarize(case_reports),
+        "cases": case_reports,
+    }
+
+
+def compare_reports(base: dict, new: dict) -> None:
+    print(f"{'metric':<40}{'base':>12}{'new':>12}{'change':>10}")
+    for metric, base_value in base["summary"].items():
+        new_value = new["summary"].get(metric)
+        if new_value is None:
+            continue
+        change = f"{(new_value - base_value) / base_value:+.1%}" if base_value else "n/a"
+        print(f"{metric:<40}{base_value:>12}{new_value:>12}{change:>10}")
+
+    shifted = []
+    for key, base_case in base["cases"].items():
+        new_case = new["cases"].get(key)
+        if new_case and (new_case["result"] != base_case["result"]
+                         or abs(new_case["score_mean"] - base_case["score_mean"]) >= 10):
+            shifted.append((key, base_case, new_case))
+    if shifted:
+        print(f"\n{len(shifted)} case(s) changed result or moved 10+ points:")
+        for key, base_case, new_case in shifted:
+            print(f"  {key}: {base_case['result']} {base_case['score_mean']} -> "
+                  f"{new_case['result']} {new_case['score_mean']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay transcripts through the AI pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Replay a corpus and write a report")
+    run.add_argument("--transcripts", help="JSONL transcripts (default: synthesize from training cases)")
+    run.add_argument("--cases", nargs="+", default=[DEFAULT_CASES_PATH], help="Case files, shard directories or globs")
+    run.add_argument("--limit", type=int, default=20, help="Maximum transcripts to replay")
+    run.add_argument("--turns", type=int, default=6, help="Student turns per synthesized transcript")
+    run.add_argument("--repeats", type=int, default=3, help="Replays per transcript, for score variance")
+    run.add_argument("--model", help="Override CLAUDE_MODEL")
+    run.add_argument("--patient-prompt", help="File with an alternative PATIENT_SIMULATION_PROMPT")
+    run.add_argument("--feedback-prompt", help="File with an alternative FEEDBACK_GENERATION_PROMPT")
+    run.add_argument("--out", help="Write the JSON report here (default: stdout)")
+
+    compare = subparsers.add_parser("compare", help="Diff two reports")
+    compare.add_argument("base")
+    compare.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        with open(args.base) as f, open(args.new) as g:
+            compare_reports(json.load(f), json.load(g))
+        return 0
+
+    report = asyncio.run(run_benchmark(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
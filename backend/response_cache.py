@@ -0,0 +1,122 @@
+"""
+Per-case cache of patient replies to common opening questions
+Early turns ("What brings you in today?") are near-identical across interviews, so the
+reply only depends on the case. Questions are normalized (case, filler words, contractions)
+and must then match exactly: one changed word ('when walking' / 'when resting') can change
+the answer. Each question keeps several LLM replies so students don't all hear the same sentence.
+"""
+
+import re
+import time
+import random
+from collections import OrderedDict
+from typing import Optional
+
+# Words that don't change what the student is asking
+FILLER_WORDS = {
+    "a", "an", "the", "so", "ok", "okay", "well", "please", "just", "now", "then",
+    "hi", "hello", "hey", "um", "uh", "could", "can", "would", "you", "me", "tell",
+    "let", "i", "to", "like", "know", "doctor", "dr", "sir", "maam", "mr", "mrs", "ms",
+}
+
+CONTRACTIONS = {
+    "what's": "what is", "how's": "how is", "it's": "it is", "that's": "that is",
+    "you've": "you have", "i'd": "i would", "i'm": "i am", "don't": "do not",
+    "doesn't": "does not", "haven't": "have not", "there's": "there is",
+}
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def normalize_question(text: str) -> tuple[str, ...]:
+    """Lowercase, expand contractions and drop filler; returns the remaining words in order"""
+    words = []
+    for word in _WORD_RE.findall(text.lower().replace("’", "'")):
+        for part in CONTRACTIONS.get(word, word).split():
+            part = part.strip("'")
+            if part and part not in FILLER_WORDS:
+                words.append(part)
+    return tuple(words)
+
+
+class _Entry:
+    __slots__ = ("replies", "samples", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.replies: list[str] = []
+        # LLM replies seen so far, including duplicates, so a terse case still fills up
+        self.samples = 0
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """LRU + TTL cache of replies keyed by (case, normalized question)"""
+
+    def __init__(self, max_entries: int = 2000, ttl: float = 3600.0, variants: int = 3,
+                 max_history: int = 2):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = variants
+        self.max_history = max_history
+        self._entries: OrderedDict[tuple[str, tuple[str, ...]], _Entry] = OrderedDict()
+        # case -> normalized questions cached for it, for invalidation
+        self._by_case: dict[str, set[tuple[str, ...]]] = {}
+        self._rng = random.Random()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cacheable(self, history_length: int, question: str) -> bool:
+        """Only early turns are cached; later replies depend on what was already said"""
+        return history_length <= self.max_history and bool(normalize_question(question))
+
+    def _drop(self, key: tuple[str, tuple[str, ...]]) -> None:
+        self._entries.pop(key, None)
+        questions = self._by_case.get(key[0])
+        if questions is not None:
+            questions.discard(key[1])
+            if not questions:
+                del self._by_case[key[0]]
+
+    def _find(self, case_key: str, words: tuple[str, ...]) -> Optional[tuple[str, tuple[str, ...]]]:
+        now = time.monotonic()
+        key = (case_key, words)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return key
+
+    def get(self, case_key: str, question: str) -> Optional[str]:
+        """A cached reply, or None if the question is new or still collecting variants"""
+        key = self._find(case_key, normalize_question(question))
+        if key is None:
+            return None
+        entry = self._entries[key]
+        if entry.samples < self.variants:
+            return None
+        return self._rng.choice(entry.replies)
+
+    def put(self, case_key: str, question: str, reply: str) -> None:
+        words = normalize_question(question)
+        if not words or not reply:
+            return
+        key = self._find(case_key, words)
+        if key is None:
+            key = (case_key, words)
+            self._entries[key] = _Entry(time.monotonic() + self.ttl)
+            self._by_case.setdefault(case_key, set()).add(words)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        entry = self._entries[key]
+        if entry.samples < self.variants:
+            entry.samples += 1
+            if reply not in entry.replies:
+                entry.replies.append(reply)
+
+    def invalidate(self, case_key: str) -> None:
+        for question in list(self._by_case.get(case_key, ())):
+            self._drop((case_key, question))
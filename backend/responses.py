@@ -0,0 +1,28 @@
+"""
+orjson-backed JSON responses
+The app's default response class. Returning one directly from an endpoint also skips
+FastAPI's response_model validation and jsonable_encoder pass, so the content must already
+be plain JSON types (dicts, lists, str, numbers, None). Large payloads like the case catalog
+and diagnosis feedback are built that way.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def dumps_line(content: Any) -> bytes:
+    """One NDJSON line"""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
@@ -203,3 +203,35 @@ class FrontendCaseResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class TrainingPatient(BaseModel):
+    age: int | str
+    gender: Optional[str] = None
+
+
+class TrainingPresentation(BaseModel):
+    chief_complaint: str
+    history: Optional[str] = ''
+    duration: Optional[str] = ''
+    severity: Optional[str] = ''
+    triggers: Optional[str] = ''
+
+
+class TrainingSymptoms(BaseModel):
+    reported: list[str] = []
+    negative: list[str] = []
+    exam_findings: list[str] = []
+
+
+class TrainingCase(BaseModel):
+    """One case in training_cases.json / generated JSONL shard format"""
+    case_id: str
+    patient: TrainingPatient
+    presentation: TrainingPresentation
+    symptoms: TrainingSymptoms = TrainingSymptoms()
+    diagnosis: str = 'Unknown'
+    description: Optional[str] = ''
+    precautions: list[str] = []
+    difficulty: int = 2
+    source: Optional[str] = 'Unknown'
@@ -0,0 +1,93 @@
+"""
+In-memory full-text index over the case bank for the instructor case picker
+Chief complaint, description, diagnosis and symptom names are tokenized into an inverted
+index and ranked with BM25. Field weights make a diagnosis or symptom hit outrank a passing
+mention in the description. The last query word is prefix-matched so results update while
+typing: the prefix is looked up by bisect in the sorted vocabulary.
+"""
+
+import re
+import math
+import bisect
+import heapq
+from typing import Iterable
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "i", "in",
+    "is", "it", "its", "my", "of", "on", "or", "that", "the", "this", "to", "was", "with",
+    "you", "your", "been", "can", "but", "not", "which", "also", "may", "other",
+}
+
+# Term frequency multiplier per field
+FIELD_WEIGHTS = {"diagnosis": 3, "chief_complaint": 2, "symptoms": 2, "description": 1}
+
+# A prefix-expanded term scores a little below the word typed in full
+PREFIX_PENALTY = 0.8
+MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """BM25 over weighted fields; documents are (case id, {field: text})"""
+
+    def __init__(self, documents: Iterable[tuple[int, dict[str, str]]], k1: float = 1.2, b: float = 0.75,
+                 max_expansions: int = 50):
+        self.k1 = k1
+        self.max_expansions = max_expansions
+        # term -> {case id: weighted term frequency}
+        self.postings: dict[str, dict[int, float]] = {}
+        lengths: dict[int, float] = {}
+        for case_id, fields in documents:
+            length = 0.0
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS.get(field, 1)
+                for token in tokenize(text or ""):
+                    postings = self.postings.setdefault(token, {})
+                    postings[case_id] = postings.get(case_id, 0.0) + weight
+                    length += weight
+            lengths[case_id] = length
+        count = len(lengths)
+        average = (sum(lengths.values()) / count) if count else 1.0
+        # BM25 length normalization, precomputed per document
+        self.norms = {case_id: k1 * (1 - b + b * length / (average or 1.0)) for case_id, length in lengths.items()}
+        self.idf = {term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for term, docs in self.postings.items()}
+        self.terms = sorted(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.norms)
+
+    def expand(self, word: str, prefix: bool) -> list[str]:
+        """Index terms matching `word`: itself, plus terms it prefixes when `prefix` is set"""
+        if not prefix or len(word) < MIN_PREFIX_LENGTH:
+            return [word] if word in self.postings else []
+        start = bisect.bisect_left(self.terms, word)
+        matches = []
+        for term in self.terms[start:start + self.max_expansions]:
+            if not term.startswith(word):
+                break
+            matches.append(term)
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """(case id, score) best first; the last word is a prefix unless the query ends in a space"""
+        words = tokenize(query)
+        prefix_last = bool(query) and not query[-1].isspace()
+        scores: dict[int, float] = {}
+        for i, word in enumerate(words):
+            # Best expansion per document, so a prefix matching many terms isn't counted many times
+            best: dict[int, float] = {}
+            for term in self.expand(word, prefix_last and i == len(words) - 1):
+                idf = self.idf[term] * (1.0 if term == word else PREFIX_PENALTY)
+                for case_id, tf in self.postings[term].items():
+                    score = idf * tf * (self.k1 + 1) / (tf + self.norms[case_id])
+                    if score > best.get(case_id, 0.0):
+                        best[case_id] = score
+            for case_id, score in best.items():
+                scores[case_id] = scores.get(case_id, 0.0) + score
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
@@ -1,107 +1,177 @@
 """
 Seed script to populate the database with training cases from training_cases.json
 Run this after setting up a new database to load all 62 cases.
+Also accepts JSONL shards from generate_cases.py (or /api/admin/cases/export), streamed and
+written in batches:
+
+    python seed_data.py generated_cases/ --append --batch-size 500
 """
 
 import os
 import sys
-import json
+import argparse
+from typing import Iterator
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from models import engine, Base, SessionLocal, Symptom, Case, CaseSymptom
+from schemas import TrainingCase
+from case_loader import iter_cases, iter_batches
+from symptom_vocab import SymptomTerm, get_vocabulary
+
+DEFAULT_BATCH_SIZE = 200
+
+# Names per IN (...) query, under SQLite's bound-parameter limit
+NAME_QUERY_CHUNK = 500
+
+
+def resolve_symptom_ids(db: Session, terms: dict[str, SymptomTerm], symptom_ids: dict[str, int]) -> None:
+    """Fill symptom_ids for every canonical term: one IN query per chunk of names not cached yet,
+    then a single insert for the names that are new to the database"""
+    missing = [name for name in terms if name not in symptom_ids]
+    for start in range(0, len(missing), NAME_QUERY_CHUNK):
+        chunk = missing[start:start + NAME_QUERY_CHUNK]
+        symptom_ids.update({name: symptom_id for symptom_id, name in
+                            db.query(Symptom.id, Symptom.name).filter(Symptom.name.in_(chunk))})
+    new = [Symptom(name=name, category=terms[name].category, severity_weight=3)
+           for name in missing if name not in symptom_ids]
+    if new:
+        db.add_all(new)
+        db.flush()
+        symptom_ids.update({symptom.name: symptom.id for symptom in new})
+
+
+def build_case(case_data: TrainingCase) -> Case:
+    presentation = case_data.presentation
+    return Case(
+        case_id=case_data.case_id,
+        age=str(case_data.patient.age),
+        gender=case_data.patient.gender,
+        chief_complaint=presentation.chief_complaint,
+        history=presentation.history or '',
+        duration=(presentation.duration or '')[:50],
+        severity=(presentation.severity or '')[:50],
+        triggers=presentation.triggers or '',
+        diagnosis=case_data.diagnosis or 'Unknown',
+        description=case_data.description or '',
+        difficulty=case_data.difficulty,
+        source=(case_data.source or 'Unknown')[:50]
+    )
+
+
+# CaseSymptom.symptom_type -> TrainingSymptoms field
+SYMPTOM_FIELDS = {'presenting': 'reported', 'absent': 'negative', 'exam_finding': 'exam_findings'}
+
+
+def export_case(case: Case, symptoms: dict[str, list[str]]) -> dict:
+    """Case row back in TrainingCase form (the inverse of build_case), ready for re-import"""
+    return {
+        "case_id": case.case_id,
+        "patient": {"age": case.age, "gender": case.gender},
+        "presentation": {
+            "chief_complaint": case.chief_complaint,
+            "history": case.history,
+            "duration": case.duration,
+            "severity": case.severity,
+            "triggers": case.triggers,
+        },
+        "symptoms": {field: symptoms.get(field, []) for field in SYMPTOM_FIELDS.values()},
+        "diagnosis": case.diagnosis,
+        "description": case.description,
+        "difficulty": case.difficulty,
+        "source": case.source,
+    }
 
 
-def get_or_create_symptom(db: Session, name: str, category: str = "other") -> Symptom:
-    symptom = db.query(Symptom).filter(Symptom.name == name).first()
-    if not symptom:
-        symptom = Symptom(name=name, category=category, severity_weight=3)
-        db.add(symptom)
-        db.commit()
-        db.refresh(symptom)
-    return symptom
-
-
-def categorize_symptom(name: str) -> str:
-    name_lower = name.lower()
-    if any(w in name_lower for w in ['fever', 'fatigue', 'malaise', 'weight', 'appetite', 'sweat']):
-        return 'general'
-    if any(w in name_lower for w in ['pain', 'ache', 'sore', 'cramp', 'tender']):
-        return 'pain'
-    if any(w in name_lower for w in ['cough', 'breath', 'wheez', 'chest', 'lung', 'nasal', 'throat', 'sputum']):
-        return 'respiratory'
-    if any(w in name_lower for w in ['nausea', 'vomit', 'diarrhea', 'constip', 'abdom', 'bowel', 'stool']):
-        return 'gastrointestinal'
-    if any(w in name_lower for w in ['rash', 'itch', 'skin', 'blister', 'lesion', 'red']):
-        return 'skin'
-    if any(w in name_lower for w in ['head', 'dizz', 'numb', 'tingle', 'confus', 'memory', 'vision']):
-        return 'neurological'
-    if any(w in name_lower for w in ['joint', 'muscle', 'back', 'neck', 'stiff', 'swell']):
-        return 'musculoskeletal'
-    if any(w in name_lower for w in ['urin', 'bladder', 'kidney']):
-        return 'urinary'
-    if any(w in name_lower for w in ['heart', 'pulse', 'blood pressure', 'palpit']):
-        return 'cardiovascular'
-    return 'other'
-
-
-def seed_database():
+def iter_case_exports(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+    """Every case as an export_case dict, in id order.
+
+    Cases stream from a server-side cursor batch_size rows at a time, and each batch's symptoms
+    come from one IN query, so memory is bounded by the batch rather than the case bank.
+    """
+    cases = db.execute(select(Case).order_by(Case.id).execution_options(yield_per=batch_size)).scalars()
+    for partition in cases.partitions():
+        symptoms: dict[int, dict[str, list[str]]] = {}
+        for case_id, symptom_type, name in (
+                db.query(CaseSymptom.case_id, CaseSymptom.symptom_type, Symptom.name).join(Symptom)
+                .filter(CaseSymptom.case_id.in_([case.id for case in partition])).order_by(CaseSymptom.id)):
+            symptoms.setdefault(case_id, {}).setdefault(SYMPTOM_FIELDS.get(symptom_type, 'reported'), []).append(name)
+        for case in partition:
+            yield export_case(case, symptoms.get(case.id, {}))
+
+
+def write_case_batch(db: Session, batch: list[TrainingCase], symptom_ids: dict[str, int]) -> int:
+    """Insert a batch of cases and their symptoms in a single transaction.
+
+    Symptom names are stored in canonical form (see symptom_vocab). symptom_ids is a
+    canonical name -> id cache shared across batches; it grows with the number of unique
+    symptoms, not with the number of cases. Cases whose case_id is already stored (including one
+    written by an earlier batch) are skipped, and a case_id repeated within the batch keeps its
+    first occurrence: a second insert would violate the unique constraint and abort the transaction.
+    Returns the number of cases inserted.
+    """
+    unique: dict[str, TrainingCase] = {}
+    for case_data in batch:
+        unique.setdefault(case_data.case_id, case_data)
+    existing = {row[0] for row in db.query(Case.case_id).filter(Case.case_id.in_(list(unique)))}
+    batch = [c for case_id, c in unique.items() if case_id not in existing]
+    if not batch:
+        return 0
+
+    cases = [build_case(case_data) for case_data in batch]
+    db.add_all(cases)
+    db.flush()
+
+    # Parse the whole batch first so each unique symptom is resolved once, not once per mention
+    vocab = get_vocabulary()
+    terms: dict[str, SymptomTerm] = {}
+    parsed = []
+    for case_data in batch:
+        entries = []
+        for symptom_type, names in (
+            ('presenting', case_data.symptoms.reported),
+            ('absent', case_data.symptoms.negative),
+            ('exam_finding', case_data.symptoms.exam_findings),
+        ):
+            for raw_name in names:
+                # A reported 'no fever' is an absent fever; exam findings keep their 'no'
+                for term, negated in vocab.parse(raw_name, negatable=symptom_type != 'exam_finding'):
+                    terms[term.name] = term
+                    entries.append((term.name, 'absent' if negated else symptom_type))
+        parsed.append(entries)
+    resolve_symptom_ids(db, terms, symptom_ids)
+
+    # Plain rows in one executemany; an ORM object per link costs more than the insert itself
+    links = [{"case_id": case.id, "symptom_id": symptom_ids[name], "symptom_type": symptom_type}
+             for case, entries in zip(cases, parsed) for name, symptom_type in dict.fromkeys(entries)]
+    if links:
+        db.execute(insert(CaseSymptom), links)
+    db.commit()
+    return len(cases)
+
+
+def seed_database(paths: list[str] | None = None, batch_size: int = DEFAULT_BATCH_SIZE, append: bool = False):
     Base.metadata.create_all(bind=engine)
     
     db = SessionLocal()
     
     try:
         existing_cases = db.query(Case).count()
-        if existing_cases > 0:
+        if existing_cases > 0 and not append:
             print(f"Database already has {existing_cases} cases. Skipping seed.")
-            print("To re-seed, delete existing cases first.")
+            print("To re-seed, delete existing cases first, or pass --append to add new cases only.")
             return
         
-        with open(os.path.join(os.path.dirname(__file__), 'training_cases.json'), 'r') as f:
-            data = json.load(f)
-        
-        cases_data = data.get('cases', [])
-        print(f"Loading {len(cases_data)} cases...")
+        paths = paths or [os.path.join(os.path.dirname(__file__), 'training_cases.json')]
+        print(f"Loading cases from {len(paths)} source(s) in batches of {batch_size}...")
         
-        for case_data in cases_data:
-            case = Case(
-                case_id=case_data['case_id'],
-                age=str(case_data['patient']['age']),
-                gender=case_data['patient']['gender'],
-                chief_complaint=case_data['presentation']['chief_complaint'],
-                history=case_data['presentation'].get('history', ''),
-                duration=(case_data['presentation'].get('duration', '') or '')[:50],
-                severity=(case_data['presentation'].get('severity', '') or '')[:50],
-                triggers=case_data['presentation'].get('triggers', ''),
-                diagnosis=case_data.get('diagnosis', 'Unknown'),
-                description=case_data.get('description', ''),
-                difficulty=case_data.get('difficulty', 2),
-                source=(case_data.get('source', 'Unknown') or 'Unknown')[:50]
-            )
-            db.add(case)
-            db.commit()
-            db.refresh(case)
-            
-            symptoms = case_data.get('symptoms', {})
-            
-            for symptom_name in symptoms.get('reported', []):
-                symptom = get_or_create_symptom(db, symptom_name, categorize_symptom(symptom_name))
-                case_symptom = CaseSymptom(case_id=case.id, symptom_id=symptom.id, symptom_type='presenting')
-                db.add(case_symptom)
-            
-            for symptom_name in symptoms.get('negative', []):
-                symptom = get_or_create_symptom(db, symptom_name, categorize_symptom(symptom_name))
-                case_symptom = CaseSymptom(case_id=case.id, symptom_id=symptom.id, symptom_type='absent')
-                db.add(case_symptom)
-            
-            for symptom_name in symptoms.get('exam_findings', []):
-                symptom = get_or_create_symptom(db, symptom_name, categorize_symptom(symptom_name))
-                case_symptom = CaseSymptom(case_id=case.id, symptom_id=symptom.id, symptom_type='exam_finding')
-                db.add(case_symptom)
-            
-            db.commit()
-            print(f"  Added: {case_data['case_id']}")
+        symptom_ids = {name: symptom_id for symptom_id, name in db.query(Symptom.id, Symptom.name)}
+        loaded = 0
+        for batch in iter_batches(iter_cases(paths), batch_size):
+            loaded += write_case_batch(db, batch, symptom_ids)
+            print(f"  Added {loaded} cases so far")
         
         total_cases = db.query(Case).count()
         total_symptoms = db.query(Symptom).count()
@@ -114,4 +184,9 @@ def seed_database():
 
 
 if __name__ == '__main__':
-    seed_database()
+    parser = argparse.ArgumentParser(description="Seed the case database")
+    parser.add_argument("paths", nargs="*", help="Case files, shard directories or globs (default: training_cases.json)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Cases per transaction")
+    parser.add_argument("--append", action="store_true", help="Add to a non-empty database, skipping known case_ids")
+    args = parser.parse_args()
+    seed_database(args.paths or None, batch_size=args.batch_size, append=args.append)
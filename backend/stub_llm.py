@@ -0,0 +1,171 @@
+"""
+Local stand-in for the Anthropic Messages API, for benchmarking without real API calls
+Supports plain and streaming (SSE) responses, configurable latency and token rate,
+and injected 429s and malformed JSON.
+
+Usage:
+    python stub_llm.py --port 8100 --latency-ms 300 --tokens-per-second 80 --rate-limit-rate 0.05
+    ANTHROPIC_BASE_URL=http://localhost:8100 ANTHROPIC_API_KEY=stub python main.py
+"""
+
+import os
+import sys
+import json
+import uuid
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+app = FastAPI(title="Stub Messages API")
+
+config = {
+    "latency_ms": float(os.environ.get("STUB_LATENCY_MS", 300)),
+    "tokens_per_second": float(os.environ.get("STUB_TOKENS_PER_SECOND", 80)),
+    "rate_limit_rate": float(os.environ.get("STUB_RATE_LIMIT_RATE", 0)),
+    "retry_after": float(os.environ.get("STUB_RETRY_AFTER", 1)),
+    "malformed_rate": float(os.environ.get("STUB_MALFORMED_RATE", 0)),
+}
+rng = random.Random(int(os.environ.get("STUB_SEED", 0)))
+
+STUB_FEEDBACK = {
+    "score": 72,
+    "breakdown": {"correct_diagnosis": 30, "key_questions": 14, "right_tests": 12,
+                  "time_efficiency": 8, "ruled_out_differentials": 8},
+    "decision_tree": {"id": "root", "label": "Presenting complaint", "type": "symptom", "asked": True,
+                      "children": [{"id": "diag", "label": "DIAGNOSIS", "type": "diagnosis",
+                                    "asked": True, "children": []}]},
+    "clues": [{"id": "c1", "text": "Symptom onset", "importance": "critical", "asked": True},
+              {"id": "c2", "text": "Associated symptoms", "importance": "helpful", "asked": False}],
+    "insight": {"summary": "Stub feedback for load testing.",
+                "strengths": ["Asked about onset", "Explored severity"],
+                "improvements": ["Ask about associated symptoms", "Consider an examination"],
+                "tip": "Work through the history systematically."},
+}
+
+PATIENT_REPLIES = [
+    "It started a few days ago and has been getting a bit worse.",
+    "No, I haven't noticed anything like that.",
+    "Yes, that's been bothering me quite a lot, especially at night.",
+    "I'd say it's about a 6 out of 10.",
+    "I'm not sure, doctor. I haven't really paid attention to that.",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def prompt_text(body: dict) -> str:
+    parts = [body.get("system") or ""] if isinstance(body.get("system"), str) else []
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+    return "\n".join(parts)
+
+
+def build_reply(body: dict) -> str:
+    """Pick a reply shaped like what the calling prompt expects"""
+    text = prompt_text(body)
+    if "Compare these two medical diagnoses" in text:
+        return rng.choice(["correct", "partial", "wrong"])
+    if "feedback analyst" in text.lower():
+        reply = json.dumps(STUB_FEEDBACK)
+        if rng.random() < config["malformed_rate"]:
+            # Truncated JSON, as when a generation is cut off at max_tokens
+            return reply[: len(reply) // 2]
+        return reply
+    if "HINT PROVIDER" in text:
+        return "Consider asking how the symptoms have changed over time."
+    return rng.choice(PATIENT_REPLIES)
+
+
+def rate_limited_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={"retry-after": str(config["retry_after"])},
+        content={"type": "error", "error": {"type": "rate_limit_error", "message": "Stub rate limit"}},
+    )
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    if rng.random() < config["rate_limit_rate"]:
+        return rate_limited_response()
+
+    reply = build_reply(body)
+    model = body.get("model", "stub")
+    input_tokens = estimate_tokens(prompt_text(body))
+    words = reply.split(" ")
+    per_token_delay = 1.0 / config["tokens_per_second"] if config["tokens_per_second"] > 0 else 0.0
+    message_id = f"msg_stub_{uuid.uuid4().hex[:16]}"
+
+    await asyncio.sleep(config["latency_ms"] / 1000)
+
+    if not body.get("stream"):
+        await asyncio.sleep(per_token_delay * estimate_tokens(reply))
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": estimate_tokens(reply)},
+        }
+
+    async def event_stream():
+        yield sse("message_start", {"type": "message_start", "message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 0}}})
+        yield sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                          "content_block": {"type": "text", "text": ""}})
+        for i, word in enumerate(words):
+            chunk = word if i == 0 else " " + word
+            await asyncio.sleep(per_token_delay * estimate_tokens(chunk))
+            yield sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                              "delta": {"type": "text_delta", "text": chunk}})
+        yield sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield sse("message_delta", {"type": "message_delta",
+                                    "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                    "usage": {"output_tokens": estimate_tokens(reply)}})
+        yield sse("message_stop", {"type": "message_stop"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Anthropic Messages API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"], help="Delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=config["tokens_per_second"], help="Output token rate")
+    parser.add_argument("--rate-limit-rate", type=float, default=config["rate_limit_rate"], help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=config["retry_after"], help="retry-after header value on 429s (seconds)")
+    parser.add_argument("--malformed-rate", type=float, default=config["malformed_rate"], help="Fraction of feedback replies with truncated JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config.update(latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second,
+                  rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                  malformed_rate=args.malformed_rate)
+    rng.seed(args.seed)
+    print(f"Stub Messages API on http://{args.host}:{args.port} with {config}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Canonical symptom vocabulary shared by seeding and runtime matching
+Case files, dataset.csv and conversation text spell the same symptom differently ('diarrhea',
+'diarrhoea', 'Diarrhoea'), and Symptom rows are unique only on the exact string, so two cases
+sharing a symptom could end up linked to different rows. Every phrase is normalized, stripped of
+a leading negation ('no high fever') and looked up in one alias -> canonical dict. Canonical
+names are the Symptom-severity.csv labels where the dataset has the symptom.
+"""
+
+import os
+import re
+import csv
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Variant spellings and synonyms -> canonical name
+ALIASES = {
+    "diarrhoea": ["diarrhea", "watery diarrhea", "loose stool", "loose stools"],
+    "vomiting": ["vomit", "throwing up", "throw up"],
+    "nausea": ["nauseated", "nauseous"],
+    "cough": ["coughing"],
+    "headache": ["head ache", "head pain"],
+    "dizziness": ["dizzy", "lightheaded", "lightheadedness"],
+    "itching": ["itchy", "itch", "pruritus"],
+    "fatigue": ["tired", "tiredness", "fatigue (tiredness)", "exhausted", "exhaustion"],
+    "skin rash": ["rash", "rashes"],
+    "breathlessness": ["shortness of breath", "short of breath", "difficulty breathing",
+                       "breathing difficulty", "dyspnea", "dyspnoea"],
+    "runny nose": ["stuffy or runny nose", "rhinorrhea"],
+    "congestion": ["nasal congestion", "stuffy nose", "blocked nose"],
+    "swelled lymph nodes": ["swollen lymph nodes", "enlarged lymph nodes", "swollen glands"],
+    "swelling joints": ["joint swelling", "swollen joints"],
+    "fast heart rate": ["tachycardia", "racing heart", "rapid heartbeat"],
+    "palpitations": ["heart palpitations"],
+    "sweating": ["diaphoresis"],
+    "stiff neck": ["neck stiffness"],
+    "loss of appetite": ["poor appetite", "decreased appetite"],
+    "irritability": ["irritable"],
+    "blood in sputum": ["hemoptysis", "haemoptysis", "coughing up blood"],
+    "bloody stool": ["blood in stool", "bloody stools"],
+    "burning micturition": ["painful urination", "burning urination", "dysuria"],
+    "polyuria": ["frequent urination", "frequent need to urinate"],
+    "muscle pain": ["myalgia", "muscle aches", "body aches"],
+    "redness of eyes": ["red eyes", "eye redness"],
+    "watering from eyes": ["watery eyes"],
+    "continuous sneezing": ["sneezing"],
+    "loss of smell": ["anosmia"],
+    "blurred and distorted vision": ["blurred vision", "blurry vision"],
+    "visual disturbances": ["vision changes"],
+    "altered sensorium": ["altered consciousness"],
+    "yellowish skin": ["jaundice"],
+    "weight loss": ["losing weight"],
+    "seizure": ["seizures"],
+    "sore": ["sores"],
+    "ache": ["aches"],
+}
+
+# Misspelled dataset labels -> the canonical name stored and shown instead
+LABEL_FIXES = {
+    "foul smell ofurine": "foul smell of urine",
+    "cold hands and feets": "cold hands and feet",
+    "swollen extremeties": "swollen extremities",
+    "scurring": "scarring",
+}
+
+NEGATION_RE = re.compile(r"^(?:no|not|denies|without|negative for|absence of)\s+")
+
+# Scraped case text sometimes lists several symptoms in one entry ('wheezing  - coughing')
+LIST_SPLIT_RE = re.compile(r"\s+-\s+|^\s*-\s*")
+
+# Entries that are scraping leftovers rather than symptoms
+JUNK_PHRASES = {"see description", "listed below"}
+JUNK_PREFIXES = ("a ", "an ", "or ", "the ", "see ")
+MAX_SYMPTOM_WORDS = 6
+
+# Checked in order: the first category with a keyword anywhere in the name wins
+CATEGORY_KEYWORDS = (
+    ('general', ('fever', 'fatigue', 'malaise', 'weight', 'appetite', 'sweat')),
+    ('pain', ('pain', 'ache', 'sore', 'cramp', 'tender')),
+    ('respiratory', ('cough', 'breath', 'wheez', 'chest', 'lung', 'nasal', 'throat', 'sputum')),
+    ('gastrointestinal', ('nausea', 'vomit', 'diarrh', 'constip', 'abdom', 'bowel', 'stool')),
+    ('skin', ('rash', 'itch', 'skin', 'blister', 'lesion', 'red')),
+    ('neurological', ('head', 'dizz', 'numb', 'tingle', 'confus', 'memory', 'vision')),
+    ('musculoskeletal', ('joint', 'muscle', 'back', 'neck', 'stiff', 'swell')),
+    ('urinary', ('urin', 'bladder', 'kidney')),
+    ('cardiovascular', ('heart', 'pulse', 'blood pressure', 'palpit')),
+)
+
+# One compiled alternation per category: a single C-level scan instead of a substring test per keyword
+CATEGORY_PATTERNS = tuple(
+    (category, re.compile("|".join(re.escape(word) for word in words))) for category, words in CATEGORY_KEYWORDS
+)
+
+
+def normalize_symptom_key(token: str) -> str:
+    """Normalize a dataset symptom token ('dischromic _patches' -> 'dischromic_patches')"""
+    return token.strip().lower().replace(' ', '')
+
+
+def symptom_label(key: str) -> str:
+    """Human-readable form of a symptom key"""
+    return key.replace('_', ' ')
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Lowercase, underscores to spaces, single spaces, no list markers or trailing punctuation"""
+    text = " ".join(phrase.lower().replace('_', ' ').split())
+    return text.lstrip("-*• ").rstrip(".,;: ")
+
+
+def split_negation(text: str) -> tuple[str, bool]:
+    """('no high fever') -> ('high fever', True) on a normalized phrase"""
+    match = NEGATION_RE.match(text)
+    if match:
+        return text[match.end():], True
+    return text, False
+
+
+def is_junk(text: str) -> bool:
+    return (text in JUNK_PHRASES or text.startswith(JUNK_PREFIXES)
+            or len(text.split()) > MAX_SYMPTOM_WORDS)
+
+
+def categorize_symptom(name: str) -> str:
+    """First category in CATEGORY_KEYWORDS with a keyword anywhere in the name"""
+    return _categorize(name.lower())
+
+
+@lru_cache(maxsize=8192)
+def _categorize(name: str) -> str:
+    for category, pattern in CATEGORY_PATTERNS:
+        if pattern.search(name):
+            return category
+    return 'other'
+
+
+class SymptomTerm(NamedTuple):
+    name: str
+    category: str
+    # dataset.csv key when the dataset knows the symptom
+    dataset_key: Optional[str]
+
+
+class SymptomVocabulary:
+    """Canonical terms and the alias -> canonical index over them.
+
+    Phrases outside the index are their own canonical term once normalized, so 'Burning' and
+    'burning' still share a row even though no alias lists them.
+    """
+
+    def __init__(self, severity_path: str):
+        self._terms: dict[str, SymptomTerm] = {}
+        self._aliases: dict[str, str] = {}
+        with open(severity_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if not row or not row[0].strip():
+                    continue
+                key = normalize_symptom_key(row[0])
+                label = normalize_phrase(symptom_label(key))
+                self._add(LABEL_FIXES.get(label, label), [label], key)
+        for name, aliases in ALIASES.items():
+            self._add(name, aliases, None)
+
+    def _add(self, name: str, aliases: list[str], dataset_key: Optional[str]) -> None:
+        term = self._terms.get(name)
+        if term is None or (dataset_key and not term.dataset_key):
+            self._terms[name] = SymptomTerm(name, categorize_symptom(name), dataset_key)
+        for alias in [name, *aliases]:
+            self._aliases[normalize_phrase(alias)] = name
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _canonical(self, text: str) -> Optional[str]:
+        name = self._aliases.get(text)
+        if name is None and text.endswith('s'):
+            # Plurals of known terms ('headaches', 'blisters')
+            name = self._aliases.get(text[:-1]) or (self._aliases.get(text[:-2]) if text.endswith('es') else None)
+        return name
+
+    @lru_cache(maxsize=8192)
+    def lookup(self, phrase: str, negatable: bool = True) -> Optional[tuple[SymptomTerm, bool]]:
+        """(canonical term, negated) for one phrase, or None for an empty or junk entry.
+
+        Exam findings pass negatable=False: 'no rebound' is the finding itself.
+        """
+        text = normalize_phrase(phrase)
+        negated = False
+        if negatable:
+            text, negated = split_negation(text)
+        if not text:
+            return None
+        name = self._canonical(text)
+        if name is not None:
+            return self._terms[name], negated
+        if is_junk(text):
+            return None
+        return SymptomTerm(text, categorize_symptom(text), None), negated
+
+    @lru_cache(maxsize=8192)
+    def parse(self, raw: str, negatable: bool = True) -> tuple[tuple[SymptomTerm, bool], ...]:
+        """Every symptom in one case-file entry, splitting bundled '- a - b' lists"""
+        found = []
+        for part in LIST_SPLIT_RE.split(raw):
+            match = self.lookup(part, negatable)
+            if match is not None:
+                found.append(match)
+        return tuple(found)
+
+    def surface_forms(self, name: str) -> tuple[str, ...]:
+        """The canonical name and every alias that maps to it"""
+        return self._forms().get(name, (name,))
+
+    @lru_cache(maxsize=1)
+    def _forms(self) -> dict[str, tuple[str, ...]]:
+        forms: dict[str, list[str]] = {}
+        for alias, name in self._aliases.items():
+            forms.setdefault(name, []).append(alias)
+        return {name: tuple(sorted(aliases, key=lambda alias: alias != name)) for name, aliases in forms.items()}
+
+
+@lru_cache(maxsize=1)
+def get_vocabulary() -> SymptomVocabulary:
+    """Build the vocabulary once per process"""
+    return SymptomVocabulary(os.path.join(DATA_DIR, 'Symptom-severity.csv'))
@@ -0,0 +1,181 @@
+"""
+Test suite for API endpoints, run in-process through TestClient
+Needs DATABASE_URL; a test case is added to that database if missing.
+"""
+
+import os
+import sys
+import json
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+import ai_service
+from circuit_breaker import CircuitBreaker
+from models import Base, engine, SessionLocal, Case
+from responses import dumps, dumps_line
+from schemas import TrainingCase
+from seed_data import write_case_batch
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+def ensure_test_case() -> int:
+    """Id of a small test case, inserted on first use"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        write_case_batch(db, [TrainingCase.model_validate({
+            "case_id": "api_test_case", "patient": {"age": 35, "gender": "female"},
+            "presentation": {"chief_complaint": "Cough and fever for three days"},
+            "diagnosis": "Pneumonia", "symptoms": {"reported": ["cough", "fever"]},
+        })], {})
+        return db.query(Case.id).filter(Case.case_id == "api_test_case").scalar()
+    finally:
+        db.close()
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("API TESTS")
+    print("="*60)
+
+    case_id = ensure_test_case()
+    client = TestClient(main.app)
+    saved_token = os.environ.get("ADMIN_TOKEN")
+    os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    admin = {"X-Admin-Token": ADMIN_TOKEN}
+
+    def submission(diagnosis="Pneumonia", case=case_id):
+        return {"case_id": case, "diagnosis": diagnosis, "conversation": [{"role": "user", "content": "Any cough?"}]}
+
+    print("\n[Serialization]")
+
+    def test_dumps():
+        payload = {"case": {"id": 1, "tags": ["a", "ü"], "score": 0.5, "note": None}, 2: True}
+        assert json.loads(dumps(payload)) == {"case": {"id": 1, "tags": ["a", "ü"], "score": 0.5, "note": None}, "2": True}
+        line = dumps_line({"index": 0})
+        assert line.endswith(b"\n") and json.loads(line) == {"index": 0}
+    run_test("orjson output matches the stdlib encoding", test_dumps)
+
+    def test_orjson_endpoints():
+        response = client.get(f"/api/cases/{case_id}")
+        assert response.status_code == 200 and response.headers["content-type"] == "application/json"
+        assert response.json()["id"] == case_id
+        usage = client.get("/api/admin/usage?group_by=case", headers=admin)
+        assert usage.status_code == 200 and usage.headers["content-type"] == "application/json"
+        assert set(usage.json()) == {"window_seconds", "group_by", "total", "groups"}
+        text = client.get("/metrics").text
+        assert 'endpoint="/api/cases/{case_id}"' in text and "http_request_duration_seconds_count" in text
+    run_test("endpoints, usage and metrics are served through the fast path", test_orjson_endpoints)
+
+    print("\n[Compression]")
+
+    def test_catalog_encoding_and_etag():
+        main.catalog_cache.invalidate()
+        plain = client.get("/api/cases", headers={"Accept-Encoding": "identity"})
+        assert plain.status_code == 200 and "content-encoding" not in plain.headers
+        etag = plain.headers["etag"]
+        for encoding in ("br", "gzip"):
+            response = client.get("/api/cases", headers={"Accept-Encoding": encoding})
+            assert response.headers["content-encoding"] == encoding, response.headers
+            assert response.headers["etag"] == etag and response.json() == plain.json()
+        cached = client.get("/api/cases", headers={"If-None-Match": etag, "Accept-Encoding": "br"})
+        assert cached.status_code == 304 and not cached.content
+    run_test("the catalog is served precompressed with an ETag", test_catalog_encoding_and_etag)
+
+    def test_gzip_middleware():
+        # Responses outside the snapshot go through GZipMiddleware above its minimum size
+        minimum = next(m.kwargs["minimum_size"] for m in main.app.user_middleware if m.cls is GZipMiddleware)
+        for url in (f"/api/cases/{case_id}", "/api/cases?limit=200"):
+            response = client.get(url, headers={"Accept-Encoding": "gzip"})
+            expected = "gzip" if len(response.content) >= minimum else None
+            assert response.headers.get("content-encoding") == expected, (url, len(response.content))
+    run_test("large JSON responses are gzipped", test_gzip_middleware)
+
+    print("\n[Batch grading]")
+
+    def test_batch_grade_auth():
+        body = {"submissions": [submission()]}
+        assert client.post("/api/batch-grade", json=body).status_code == 403
+        assert client.post("/api/batch-grade", json=body, headers={"X-Admin-Token": "wrong"}).status_code == 403
+        os.environ.pop("ADMIN_TOKEN")
+        try:
+            assert client.post("/api/batch-grade", json=body, headers=admin).status_code == 503
+        finally:
+            os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    run_test("batch grading requires the admin token", test_batch_grade_auth)
+
+    def test_batch_grade_cap():
+        body = {"submissions": [submission()] * (main.BATCH_GRADE_MAX_SUBMISSIONS + 1)}
+        assert client.post("/api/batch-grade", json=body, headers=admin).status_code == 422
+        response = client.post("/api/batch-grade", json={"submissions": [submission(case=-1)]}, headers=admin)
+        assert response.status_code == 200 and '"Case not found"' in response.text, response.text
+    run_test("batch grading rejects more than BATCH_GRADE_MAX_SUBMISSIONS", test_batch_grade_cap)
+
+    print("\n[Interview WebSocket]")
+
+    def test_ws_breaker_open():
+        saved_breaker = ai_service.breaker
+        ai_service.breaker = CircuitBreaker()
+        ai_service.breaker.force_open()
+        short_circuited = metrics.LLM_CALLS.value(endpoint="patient", outcome="short_circuited")
+        fallbacks = metrics.FALLBACKS.value(endpoint="patient")
+        try:
+            with client.websocket_connect(f"/ws/interview/{case_id}") as ws:
+                assert ws.receive_json() == {"type": "ready", "caseId": case_id}
+                ws.send_json({"type": "message", "content": "Have you had any cough?"})
+                reply = ws.receive_json()
+                # The fallback isn't streamed: the full message comes first
+                assert reply["type"] == "message" and reply["content"], reply
+                ws.send_json({"type": "hint"})
+                hint = ws.receive_json()
+                assert hint["type"] == "hint" and hint["hint"] and hint["hintNumber"] == 1, hint
+        finally:
+            ai_service.breaker = saved_breaker
+        assert metrics.LLM_CALLS.value(endpoint="patient", outcome="short_circuited") == short_circuited + 1
+        assert metrics.FALLBACKS.value(endpoint="patient") == fallbacks + 1
+    run_test("an open circuit serves the local reply and hint over the socket", test_ws_breaker_open)
+
+    def test_ws_malformed_frame():
+        with client.websocket_connect(f"/ws/interview/{case_id}") as ws:
+            ws.receive_json()
+            ws.send_text("{not json")
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"type": "message", "content": ""})
+            assert ws.receive_json() == {"type": "error", "detail": "Empty message"}
+    run_test("malformed frames get an error and the socket stays open", test_ws_malformed_frame)
+
+    if saved_token is None:
+        os.environ.pop("ADMIN_TOKEN", None)
+    else:
+        os.environ["ADMIN_TOKEN"] = saved_token
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} API test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,125 @@
+"""
+Test suite for streaming case import parsing and the export format
+"""
+
+import os
+import sys
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from case_loader import PayloadTooLargeError, aiter_jsonl_lines
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, Case
+from schemas import TrainingCase
+from seed_data import build_case, export_case, write_case_batch
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("CASE IMPORT/EXPORT TESTS")
+    print("="*60)
+
+    async def collect(chunks, **limits):
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return [item async for item in aiter_jsonl_lines(stream(), **limits)]
+
+    print("\n[Streamed lines]")
+
+    def test_chunk_boundaries():
+        body = b'{"a": 1}\n\n{"b": 2}\r\n{"c": 3}'
+        expected = [(1, b'{"a": 1}'), (3, b'{"b": 2}\r'), (4, b'{"c": 3}')]
+        for size in (1, 3, 7, len(body)):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            assert asyncio.run(collect(chunks)) == expected, f"chunk size {size}"
+    run_test("lines are reassembled across chunk boundaries", test_chunk_boundaries)
+
+    def test_empty_body():
+        assert asyncio.run(collect([])) == [] and asyncio.run(collect([b"\n", b"  \n"])) == []
+    run_test("blank bodies yield nothing", test_empty_body)
+
+    def test_size_limits():
+        body = b'{"a": 1}\n' + b'x' * 40 + b'\n{"c": 3}'
+        for size in (1, 7, len(body)):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            try:
+                asyncio.run(collect(chunks, max_line_bytes=16))
+                raise AssertionError(f"chunk size {size}: long line accepted")
+            except PayloadTooLargeError as e:
+                assert "Line 2" in str(e), str(e)
+        try:
+            asyncio.run(collect([body], max_body_bytes=len(body) - 1))
+            raise AssertionError("oversized body accepted")
+        except PayloadTooLargeError:
+            pass
+        assert len(asyncio.run(collect([body], max_line_bytes=40, max_body_bytes=len(body)))) == 3
+    run_test("oversized lines and bodies are rejected", test_size_limits)
+
+    print("\n[Export format]")
+
+    def test_round_trip():
+        case = TrainingCase.model_validate({
+            "case_id": "export_1", "patient": {"age": 42, "gender": "female"},
+            "presentation": {"chief_complaint": "Cough for a week", "duration": "1 week"},
+            "diagnosis": "Bronchitis", "difficulty": 1, "source": "test",
+        })
+        symptoms = {"reported": ["cough", "fatigue"], "negative": ["high fever"]}
+        exported = TrainingCase.model_validate(export_case(build_case(case), symptoms))
+        assert exported.case_id == "export_1" and exported.patient.age == "42"
+        assert exported.presentation.duration == "1 week" and exported.difficulty == 1
+        assert exported.symptoms.reported == ["cough", "fatigue"] and exported.symptoms.exam_findings == []
+    run_test("exported cases validate as TrainingCase", test_round_trip)
+
+    print("\n[Batched writes]")
+
+    def training_case(case_id, diagnosis="Bronchitis"):
+        return TrainingCase.model_validate({
+            "case_id": case_id, "patient": {"age": 30, "gender": "male"},
+            "presentation": {"chief_complaint": "Cough"}, "diagnosis": diagnosis,
+            "symptoms": {"reported": ["cough", "no fever"]},
+        })
+
+    def test_repeated_case_ids():
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            symptom_ids: dict[str, int] = {}
+            first = [training_case("dup_1"), training_case("dup_2"), training_case("dup_1", "Flu")]
+            assert write_case_batch(db, first, symptom_ids) == 2
+            second = [training_case("dup_2", "Flu"), training_case("dup_3")]
+            assert write_case_batch(db, second, symptom_ids) == 1
+            rows = sorted((c.case_id, c.diagnosis) for c in db.query(Case))
+            assert rows == [("dup_1", "Bronchitis"), ("dup_2", "Bronchitis"), ("dup_3", "Bronchitis")], rows
+        finally:
+            db.close()
+            engine.dispose()
+    run_test("a case_id seen in this or an earlier batch is written once", test_repeated_case_ids)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} case import/export test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,136 @@
+"""
+Test suite for the precompressed case catalog snapshot
+"""
+
+import os
+import sys
+import gzip
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import brotli
+from catalog import CatalogCache, Snapshot, choose_encoding, snapshot_response
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("CATALOG SNAPSHOT TESTS")
+    print("="*60)
+
+    print("\n[Content negotiation]")
+
+    def test_choose_encoding():
+        assert choose_encoding("gzip, deflate, br") == "br"
+        assert choose_encoding("gzip, deflate") == "gzip"
+        assert choose_encoding("br;q=0, gzip") == "gzip"
+        assert choose_encoding("gzip;q=0.5, br;q=0.2") == "gzip"
+        assert choose_encoding("*") == "br"
+        assert choose_encoding("") is None
+        assert choose_encoding("identity") is None
+    run_test("choose_encoding honours preference and q-values", test_choose_encoding)
+
+    print("\n[Snapshot]")
+
+    def make_rows(n):
+        specialties = ["Cardiology", "Neurology", "General Medicine"]
+        return [{"id": i, "title": f"Case {i}", "description": "a repetitive description " * 20,
+                 "specialty": specialties[i % 3], "difficulty": "Beginner" if i % 2 else "Advanced",
+                 "has_exams": i % 5 == 0} for i in range(1, n + 1)]
+
+    rows = make_rows(30)
+    body = Snapshot(rows).body
+
+    def test_encoded_roundtrip():
+        snapshot = Snapshot(rows)
+        assert gzip.decompress(snapshot.encoded("gzip")) == body
+        assert brotli.decompress(snapshot.encoded("br")) == body
+        assert len(snapshot.encoded("br")) < len(body) // 10
+        assert snapshot.encoded("gzip") is snapshot.encoded("gzip")
+    run_test("compressed bodies decode to the original", test_encoded_roundtrip)
+
+    def test_response_headers():
+        snapshot = Snapshot(rows)
+        resp = snapshot_response(snapshot, None, "gzip, br")
+        assert resp.status_code == 200 and resp.headers["content-encoding"] == "br"
+        assert resp.headers["etag"] == snapshot.etag and resp.headers["vary"] == "Accept-Encoding"
+        assert "content-encoding" not in snapshot_response(snapshot, None, "").headers
+        assert snapshot_response(snapshot, f'"other", {snapshot.etag}', "br").status_code == 304
+        assert snapshot_response(snapshot, '"stale"', "br").status_code == 200
+    run_test("ETag revalidation and Content-Encoding", test_response_headers)
+
+    print("\n[Cache]")
+
+    def test_cache_builds_once():
+        cache = CatalogCache(ttl=60)
+        builds = []
+        build = lambda: builds.append(1) or rows
+        first, hit = cache.get(build)
+        assert not hit
+        second, hit = cache.get(build)
+        assert hit and second is first and len(builds) == 1
+        cache.invalidate()
+        third, hit = cache.get(build)
+        assert not hit and third is not first and third.etag == first.etag
+    run_test("snapshot is built once until invalidated", test_cache_builds_once)
+
+    def test_cache_ttl():
+        cache = CatalogCache(ttl=0.01)
+        cache.get(lambda: rows)
+        time.sleep(0.02)
+        assert not cache.get(lambda: [])[1]
+    run_test("snapshot is rebuilt after the TTL", test_cache_ttl)
+
+    print("\n[Pagination]")
+
+    def collect(snapshot, limit, filters):
+        seen, after = [], None
+        while True:
+            page, after = snapshot.page(after, limit, filters)
+            assert len(page) <= limit
+            seen += [row["id"] for row in page]
+            if after is None:
+                return seen
+
+    def test_keyset_pages():
+        snapshot = Snapshot(list(reversed(rows)))
+        page, cursor = snapshot.page(None, 10, {})
+        assert [r["id"] for r in page] == list(range(1, 11)) and cursor == 10
+        assert collect(snapshot, 7, {}) == list(range(1, 31))
+        assert snapshot.page(30, 10, {}) == ([], None)
+        assert snapshot.page(None, 30, {})[1] is None
+    run_test("keyset pages cover every case once", test_keyset_pages)
+
+    def test_filtered_pages():
+        snapshot = Snapshot(rows)
+        filters = {"specialty": "neurology", "difficulty": "BEGINNER", "has_exams": None}
+        expected = [r["id"] for r in rows if r["specialty"] == "Neurology" and r["difficulty"] == "Beginner"]
+        assert collect(snapshot, 2, filters) == expected
+        assert collect(snapshot, 4, {"has_exams": True}) == [5, 10, 15, 20, 25, 30]
+        assert snapshot.page(None, 10, {"specialty": "Dermatology"}) == ([], None)
+    run_test("filters combine and stay keyset-ordered", test_filtered_pages)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} catalog test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,122 @@
+"""
+Test suite for the LLM circuit breaker
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+RESET = 0.05
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("CIRCUIT BREAKER TESTS")
+    print("="*60)
+
+    def opened(half_open_max_calls=1):
+        changes = []
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=RESET,
+                                 half_open_max_calls=half_open_max_calls, on_state_change=changes.append)
+        for _ in range(3):
+            breaker.record_failure()
+        return breaker, changes
+
+    print("\n[Opening]")
+
+    def test_threshold():
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=RESET)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED and breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == OPEN and not breaker.allow_request()
+    run_test("opens after failure_threshold consecutive failures", test_threshold)
+
+    def test_success_resets_count():
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=RESET)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+    run_test("a success resets the failure count", test_success_resets_count)
+
+    print("\n[Half-open probes]")
+
+    def test_probe_limit():
+        breaker, changes = opened(half_open_max_calls=2)
+        time.sleep(RESET)
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request() and breaker.allow_request()
+        assert not breaker.allow_request()
+        assert changes == [OPEN, HALF_OPEN]
+    run_test("half-open lets through at most half_open_max_calls probes", test_probe_limit)
+
+    def test_probe_success_closes():
+        breaker, changes = opened()
+        time.sleep(RESET)
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CLOSED and breaker.allow_request() and breaker.allow_request()
+        assert changes == [OPEN, HALF_OPEN, CLOSED]
+    run_test("a successful probe closes the circuit", test_probe_success_closes)
+
+    def test_probe_failure_reopens():
+        breaker, changes = opened()
+        time.sleep(RESET)
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == OPEN and not breaker.allow_request()
+        assert changes == [OPEN, HALF_OPEN, OPEN]
+    run_test("a failed probe re-opens the circuit", test_probe_failure_reopens)
+
+    def test_stale_probe():
+        breaker, _ = opened()
+        time.sleep(RESET)
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        # The probe never reports back; after another reset_timeout a new one may go out
+        time.sleep(RESET)
+        assert breaker.state == HALF_OPEN and breaker.allow_request()
+        assert not breaker.allow_request()
+    run_test("a probe that never reports back is replaced", test_stale_probe)
+
+    print("\n[Forced open]")
+
+    def test_force_open():
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=RESET)
+        breaker.force_open()
+        time.sleep(RESET)
+        assert breaker.state == OPEN and not breaker.allow_request()
+    run_test("force_open never moves to half-open", test_force_open)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} circuit breaker test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
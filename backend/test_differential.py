@@ -0,0 +1,164 @@
+"""
+Test suite for the local differential-diagnosis engine
+Runs against the bundled Kaggle dataset in data/
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from differential import disease_display_name, get_differential_model, mentioned_symptoms, normalize_symptom_key, same_disease
+from ai_schemas import HintCaseContext, HintConversationMessage, HintGenerationRequest
+from ai_service import FALLBACK_HINTS, generate_local_hint
+
+
+def test_all():
+    model = get_differential_model()
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("DIFFERENTIAL ENGINE TESTS")
+    print("="*60)
+
+    print("\n[Loading]")
+
+    def test_matrix_loaded():
+        assert len(model.diseases) >= 41, f"Expected 41+ diseases, got {len(model.diseases)}"
+        assert len(model.symptoms) > 100, f"Expected 100+ symptoms, got {len(model.symptoms)}"
+    run_test("dataset matrix loaded", test_matrix_loaded)
+
+    def test_normalize_key():
+        assert normalize_symptom_key(" dischromic _patches") == "dischromic_patches"
+    run_test("normalize_symptom_key strips inner spaces", test_normalize_key)
+
+    def test_resolve():
+        assert model.resolve("skin rash") == ("skin_rash",)
+        assert set(model.resolve("fever")) == {"high_fever", "mild_fever"}
+        assert model.resolve("nonexistent symptom xyz") == ()
+    run_test("resolve free-text phrases", test_resolve)
+
+    print("\n[Ranking]")
+
+    def test_rank_order():
+        ranked = model.rank(["skin rash", "itching", "nodal skin eruptions"], [])
+        assert ranked[0][0] == "Fungal infection", f"Top differential was {ranked[0][0]}"
+        probs = [p for _, p in ranked]
+        assert probs == sorted(probs, reverse=True), "Ranking not sorted"
+    run_test("rank puts best match first", test_rank_order)
+
+    def test_rank_unresolved():
+        assert model.rank(["nonexistent symptom xyz"], ["another made up complaint"]) == []
+        assert model.rank([], []) == []
+        assert model.rank([], ["cough"]), "A resolved denied symptom is still signal"
+    run_test("rank is empty when nothing resolves", test_rank_unresolved)
+
+    def test_denied_lowers_probability():
+        disclosed = ["cough", "high fever"]
+        before = dict(model.rank(disclosed, [], top_n=41))
+        after = dict(model.rank(disclosed, ["phlegm"], top_n=41))
+        assert after["Pneumonia"] < before["Pneumonia"], "Denied symptom should lower Pneumonia"
+    run_test("denied symptoms lower matching diseases", test_denied_lowers_probability)
+
+    def test_posterior_normalized():
+        post = model.posterior(["headache"], ["vomiting"])
+        assert abs(sum(post) - 1.0) < 1e-9
+    run_test("posterior sums to 1", test_posterior_normalized)
+
+    def test_ruled_out():
+        ruled_out = model.ruled_out(["chest pain"])
+        assert "Heart attack" in ruled_out, f"Got {ruled_out}"
+    run_test("ruled_out uses hallmark symptoms", test_ruled_out)
+
+    def test_rank_speed():
+        start = time.perf_counter()
+        for _ in range(200):
+            model.rank(["skin rash", "itching", "fatigue"], ["fever", "cough"])
+        per_call_ms = (time.perf_counter() - start) / 200 * 1000
+        assert per_call_ms < 1.0, f"rank took {per_call_ms:.3f}ms per call"
+    run_test("rank is sub-millisecond", test_rank_speed)
+
+    print("\n[Question Recommender]")
+
+    def test_recommend_skips_asked():
+        asked = ["skin rash", "itching"]
+        recs = model.recommend_questions(asked, [], asked_text="any joint pain?", top_n=10)
+        labels = [label for label, _ in recs]
+        assert recs, "Expected recommendations"
+        assert "skin rash" not in labels and "itching" not in labels and "joint pain" not in labels
+        gains = [g for _, g in recs]
+        assert gains == sorted(gains, reverse=True), "Recommendations not sorted by gain"
+    run_test("recommend_questions skips asked symptoms", test_recommend_skips_asked)
+
+    def test_recommend_positive_gain():
+        recs = model.recommend_questions(["cough"], [], top_n=1)
+        assert recs and recs[0][1] > 0, f"Got {recs}"
+    run_test("recommend_questions has positive gain", test_recommend_positive_gain)
+
+    def test_training_cases_folded_in():
+        assert "Shingles" in model.diseases, "Training case diagnoses should become candidates"
+    run_test("training cases extend the candidate set", test_training_cases_folded_in)
+
+    print("\n[Conversation Matching]")
+
+    def test_mentioned_symptoms():
+        found = mentioned_symptoms(["chest pain", "fever", "rash"], "do you have any chest discomfort or fever?")
+        assert found == ["chest pain", "fever"], f"Got {found}"
+    run_test("mentioned_symptoms", test_mentioned_symptoms)
+
+    print("\n[Disease names]")
+
+    def test_disease_names():
+        assert disease_display_name("(vertigo) Paroymsal  Positional Vertigo") == "Benign paroxysmal positional vertigo"
+        assert disease_display_name("Osteoarthristis") == "Osteoarthritis"
+        assert disease_display_name("Pneumonia") == "Pneumonia"
+        assert same_disease("(vertigo) Paroymsal  Positional Vertigo", "BPPV")
+        assert same_disease("Hypertension", "High Blood Pressure")
+        assert same_disease("Arthritis", "Rheumatoid Arthritis")
+        assert not same_disease("Common Cold", "Cold Sores")
+    run_test("dataset labels are cleaned and matched through aliases", test_disease_names)
+
+    print("\n[Local hints]")
+
+    def hint_request(presenting, diagnosis, asked):
+        case = HintCaseContext(case_id="t", presenting_symptoms=presenting, expected_diagnosis=diagnosis)
+        return HintGenerationRequest(case=case, conversation=[HintConversationMessage(role="user", content=asked)])
+
+    def test_hint_unresolved():
+        # Mentioned, but neither phrase is a dataset symptom: no differential from the bare prior
+        request = hint_request(["swaying sensation", "ringing ears"], "Benign paroxysmal positional vertigo",
+                               "any swaying sensation or ringing ears?")
+        assert generate_local_hint(request, 4) == FALLBACK_HINTS[3]
+    run_test("hint 4 falls back when no disclosed symptom resolves", test_hint_unresolved)
+
+    def test_hint_hides_diagnosis():
+        request = hint_request(["spinning movements", "loss of balance", "nausea"], "BPPV",
+                               "any spinning movements, loss of balance or nausea?")
+        hint = generate_local_hint(request, 4)
+        assert "could also fit" in hint and "vertigo" not in hint.lower(), hint
+        assert "(" not in hint, hint
+    run_test("hint 4 names cleaned differentials other than the diagnosis", test_hint_hides_diagnosis)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} differential test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
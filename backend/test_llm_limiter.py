@@ -0,0 +1,182 @@
+"""
+Test suite for the LLM call governor
+"""
+
+import os
+import sys
+import time
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_limiter import LLMGovernor, PRIORITY_PATIENT, PRIORITY_HINT, PRIORITY_FEEDBACK
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("LLM GOVERNOR TESTS")
+    print("="*60)
+
+    def governor(concurrency=1, requests=6000, tokens=600000):
+        return LLMGovernor(concurrency, requests, tokens)
+
+    print("\n[Admission order]")
+
+    def test_priority_order():
+        async def scenario():
+            gov = governor()
+            order = []
+
+            async def call(name, priority):
+                async with gov.slot(priority, 10):
+                    order.append(name)
+
+            await gov.acquire(PRIORITY_PATIENT, 10)
+            tasks = [asyncio.create_task(call(name, priority)) for name, priority in
+                     (("feedback", PRIORITY_FEEDBACK), ("hint", PRIORITY_HINT),
+                      ("patient", PRIORITY_PATIENT), ("feedback2", PRIORITY_FEEDBACK))]
+            await asyncio.sleep(0)
+            assert gov.queued == 4 and gov.active == 1
+            gov.release()
+            await asyncio.gather(*tasks)
+            return order, gov.active
+        order, active = asyncio.run(scenario())
+        assert order == ["patient", "hint", "feedback", "feedback2"], order
+        assert active == 0
+    run_test("higher priority is served first, FIFO within a priority", test_priority_order)
+
+    def test_concurrency_cap():
+        async def scenario():
+            gov = governor(concurrency=2)
+            peak = 0
+
+            async def call():
+                nonlocal peak
+                async with gov.slot(PRIORITY_HINT, 10):
+                    peak = max(peak, gov.active)
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(call() for _ in range(6)))
+            return peak, gov.active
+        assert asyncio.run(scenario()) == (2, 0)
+    run_test("never more than max_concurrency calls at once", test_concurrency_cap)
+
+    print("\n[Slot release]")
+
+    def test_timeout_while_queued():
+        async def scenario():
+            gov = governor()
+            await gov.acquire(PRIORITY_PATIENT, 10)
+            try:
+                await asyncio.wait_for(gov.acquire(PRIORITY_HINT, 10), timeout=0.01)
+                raise AssertionError("queued acquire should time out")
+            except asyncio.TimeoutError:
+                pass
+            assert gov.queued == 0 and gov.active == 1
+            gov.release()
+            await asyncio.wait_for(gov.acquire(PRIORITY_HINT, 10), timeout=1)
+            return gov.active
+        assert asyncio.run(scenario()) == 1
+    run_test("a waiter that times out leaves the queue", test_timeout_while_queued)
+
+    def test_cancel_holder():
+        async def scenario():
+            gov = governor()
+
+            async def call():
+                async with gov.slot(PRIORITY_PATIENT, 10):
+                    await asyncio.sleep(10)
+
+            task = asyncio.create_task(call())
+            await asyncio.sleep(0)
+            assert gov.active == 1
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return gov.active
+        assert asyncio.run(scenario()) == 0
+    run_test("cancelling a call inside its slot releases it", test_cancel_holder)
+
+    def test_cancel_after_grant():
+        async def scenario():
+            gov = governor()
+            await gov.acquire(PRIORITY_PATIENT, 10)
+            task = asyncio.create_task(gov.acquire(PRIORITY_HINT, 10))
+            await asyncio.sleep(0)
+            # Grant the slot and cancel before the waiter resumes
+            gov.release()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return gov.active
+        assert asyncio.run(scenario()) == 0
+    run_test("a slot granted to a cancelled waiter is given back", test_cancel_after_grant)
+
+    print("\n[Rate limits]")
+
+    def test_pause():
+        async def scenario():
+            gov = governor(concurrency=4)
+            gov.pause(0.1)
+            assert not gov.has_headroom()
+            start = time.monotonic()
+            async with gov.slot(PRIORITY_PATIENT, 10):
+                return time.monotonic() - start
+        assert asyncio.run(scenario()) >= 0.09
+    run_test("pause holds new calls until retry-after passes", test_pause)
+
+    def test_reconcile():
+        gov = governor(concurrency=4, tokens=60000)
+
+        async def scenario():
+            async with gov.slot(PRIORITY_FEEDBACK, 40000):
+                pass
+        asyncio.run(scenario())
+        before = gov.tokens.level
+        assert before < 20100
+        gov.reconcile(40000, 1000)
+        assert gov.tokens.level >= before + 39000
+        level = gov.tokens.level
+        gov.reconcile(1000, 5000)
+        assert gov.tokens.level < level + 100
+        gov.reconcile(1000, 0)
+        assert gov.tokens.level <= gov.tokens.capacity
+    run_test("reconcile refunds over-estimated tokens only", test_reconcile)
+
+    def test_token_budget_waits():
+        async def scenario():
+            gov = governor(concurrency=4, tokens=600)
+            await gov.acquire(PRIORITY_HINT, 600)
+            assert not gov.has_headroom()
+            try:
+                # 600 tokens/minute refills 10 per second: 100 more takes ~10s
+                await asyncio.wait_for(gov.acquire(PRIORITY_HINT, 100), timeout=0.05)
+                raise AssertionError("acquire should wait for the token budget")
+            except asyncio.TimeoutError:
+                pass
+            return gov.active, gov.queued
+        assert asyncio.run(scenario()) == (1, 0)
+    run_test("calls wait when the token budget is spent", test_token_budget_waits)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} LLM governor test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,143 @@
+"""
+Test suite for the /metrics registry and the LLM call instrumentation
+"""
+
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import anthropic
+
+import metrics
+import ai_service
+from circuit_breaker import CircuitBreaker
+from llm_limiter import LLMGovernor, PRIORITY_HINT
+
+
+class FakeMessages:
+    """Stands in for client.messages: replies, or raises the queued errors first"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        usage = SimpleNamespace(input_tokens=120, output_tokens=30)
+        return SimpleNamespace(content=[SimpleNamespace(text="ok")], usage=usage, model=ai_service.CLAUDE_MODEL)
+
+
+def server_error():
+    request = httpx.Request("POST", "http://llm.test/v1/messages")
+    return anthropic.InternalServerError("overloaded", response=httpx.Response(500, request=request), body=None)
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("METRICS TESTS")
+    print("="*60)
+
+    def with_fake_client(messages, make_call):
+        """Run make_call() through a fresh governor and breaker with the fake client"""
+        saved = ai_service.client, ai_service.governor, ai_service.breaker, ai_service.backoff_delay
+        ai_service.client = SimpleNamespace(messages=messages)
+        ai_service.governor = LLMGovernor(2, 600, 100000)
+        ai_service.breaker = CircuitBreaker()
+        ai_service.backoff_delay = lambda attempt: 0.0
+        try:
+            return asyncio.run(make_call())
+        finally:
+            ai_service.client, ai_service.governor, ai_service.breaker, ai_service.backoff_delay = saved
+
+    def call(endpoint, messages):
+        return with_fake_client(messages, lambda: ai_service.call_claude(
+            endpoint, PRIORITY_HINT, max_tokens=50, messages=[{"role": "user", "content": "hi"}]))
+
+    print("\n[Registry]")
+
+    def test_render():
+        counter = metrics.Counter("test_events_total", "Events", ("kind",))
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        histogram = metrics.Histogram("test_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.5, stage="x")
+        lines = counter.render() + histogram.render()
+        assert 'test_events_total{kind="a"} 3' in lines, lines
+        assert 'test_seconds_bucket{stage="x",le="0.1"} 0' in lines, lines
+        assert 'test_seconds_bucket{stage="x",le="+Inf"} 1' in lines and 'test_seconds_count{stage="x"} 1' in lines, lines
+    run_test("counters and histograms render in the text format", test_render)
+
+    print("\n[LLM calls]")
+
+    def test_governed_call():
+        endpoint = "test_metrics_ok"
+        call(endpoint, FakeMessages())
+        assert metrics.STAGE_LATENCY.count(stage="llm_queue", endpoint=endpoint) == 1
+        assert metrics.STAGE_LATENCY.count(stage="llm_call", endpoint=endpoint) == 1
+        assert metrics.LLM_CALLS.value(endpoint=endpoint, outcome="success") == 1
+        assert metrics.LLM_TOKENS.value(endpoint=endpoint, direction="input") == 120
+        assert metrics.LLM_TOKENS.value(endpoint=endpoint, direction="output") == 30
+        assert f'llm_calls_total{{endpoint="{endpoint}",outcome="success"}} 1' in metrics.render()
+    run_test("a governed call records queue and call stages, outcome and tokens", test_governed_call)
+
+    def test_retried_call():
+        endpoint = "test_metrics_retry"
+        messages = FakeMessages([server_error(), server_error()])
+        call(endpoint, messages)
+        assert messages.calls == 3
+        assert metrics.LLM_CALLS.value(endpoint=endpoint, outcome="error") == 2
+        assert metrics.LLM_RETRIES.value(endpoint=endpoint) == 2
+        assert metrics.LLM_CALLS.value(endpoint=endpoint, outcome="success") == 1
+        assert metrics.STAGE_LATENCY.count(stage="llm_queue", endpoint=endpoint) == 3
+    run_test("retries are counted per attempt", test_retried_call)
+
+    def test_timeout_without_budget():
+        endpoint = "test_metrics_timeout"
+        try:
+            call(endpoint, FakeMessages([asyncio.TimeoutError()]))
+            raise AssertionError("timeout should surface as LatencyBudgetExceeded")
+        except ai_service.LatencyBudgetExceeded as e:
+            assert str(e) == f"{endpoint} exceeded its latency budget", str(e)
+        assert metrics.LLM_CALLS.value(endpoint=endpoint, outcome="over_budget") == 1
+    run_test("a timeout with no endpoint budget is reported, not a TypeError", test_timeout_without_budget)
+
+    print("\n[Usage attribution]")
+
+    def test_compare_case_id():
+        with_fake_client(FakeMessages(), lambda: ai_service.compare_diagnoses(
+            "Community-acquired pneumonia", "Lobar consolidation", case_id="case_metrics_test"))
+        groups = ai_service.usage_tracker.summary(group_by="case", limit=500)["groups"]
+        row = next((g for g in groups if g["case"] == "case_metrics_test"), None)
+        assert row is not None and row["calls"] == 1 and row["input_tokens"] == 120, groups
+    run_test("diagnosis comparisons are attributed to their case", test_compare_case_id)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} metrics test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
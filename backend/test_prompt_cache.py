@@ -0,0 +1,191 @@
+"""
+Test suite for precompiled per-case prompts, including formatting micro-benchmarks
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ai_service
+from ai_schemas import (
+    PatientCaseContext, PatientSimulationRequest, ConversationMessage,
+    FeedbackCaseContext, FeedbackGenerationRequest, FeedbackConversationMessage,
+)
+from prompt_cache import CompiledPrompt, PromptCache
+
+
+def patient_request(turns: int = 6, **case_fields) -> PatientSimulationRequest:
+    case = PatientCaseContext(
+        case_id="case_7", age="34", gender="female", chief_complaint="Throbbing headache",
+        history="Headaches for two years", duration="6 hours", severity="8/10",
+        triggers="Bright light", diagnosis="Migraine", description="Recurrent unilateral headache",
+        presenting_symptoms=["headache", "nausea", "photophobia"],
+        absent_symptoms=["fever", "neck stiffness"], exam_findings=["normal fundoscopy"],
+        **case_fields)
+    history = []
+    for i in range(turns):
+        history.append(ConversationMessage(role="user", content=f"Question {i} about {{symptoms}}?"))
+        history.append(ConversationMessage(role="assistant", content=f"Answer {i}."))
+    return PatientSimulationRequest(case=case, conversation_history=history,
+                                    student_message="Does light make it worse?")
+
+
+def legacy_patient_prompt(request: PatientSimulationRequest) -> str:
+    return ai_service.PATIENT_SIMULATION_PROMPT.format(
+        case_data=ai_service.format_case_data_for_patient(request),
+        conversation_history=ai_service.format_conversation_history(request),
+        student_message=request.student_message)
+
+
+def cached_patient_prompt(cache: PromptCache, request: PatientSimulationRequest) -> str:
+    bound, _ = cache.get(ai_service.PATIENT_PROMPT, request.case,
+                         lambda: {"case_data": ai_service.format_case_data_for_patient(request)})
+    return bound.render(conversation_history=ai_service.format_conversation_history(request),
+                        student_message=request.student_message)
+
+
+def peak_allocation(fn) -> int:
+    fn()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("PROMPT CACHE TESTS")
+    print("="*60)
+
+    print("\n[Rendering]")
+
+    def test_patient_matches_format():
+        request = patient_request()
+        assert cached_patient_prompt(PromptCache(), request) == legacy_patient_prompt(request)
+    run_test("patient prompt matches str.format()", test_patient_matches_format)
+
+    def test_feedback_matches_format():
+        request = FeedbackGenerationRequest(
+            case=FeedbackCaseContext(case_id="case_7", title="Headache", description="Recurrent headache",
+                                     specialty="Neurology", difficulty="medium", expected_diagnosis="Migraine",
+                                     presenting_symptoms=["headache"]),
+            conversation=[FeedbackConversationMessage(sender="user", content="Any {aura}?"),
+                          FeedbackConversationMessage(sender="patient", content="No.")],
+            student_diagnosis="Migraine", diagnosis_result="correct")
+        expected = ai_service.FEEDBACK_GENERATION_PROMPT.format(
+            case_data=ai_service.format_case_data_for_feedback(request),
+            conversation=ai_service.format_conversation_for_feedback(request),
+            student_diagnosis=request.student_diagnosis, diagnosis_result=request.diagnosis_result)
+        bound, _ = PromptCache().get(ai_service.FEEDBACK_PROMPT, request.case,
+                                     lambda: {"case_data": ai_service.format_case_data_for_feedback(request)})
+        rendered = bound.render(conversation=ai_service.format_conversation_for_feedback(request),
+                                student_diagnosis=request.student_diagnosis,
+                                diagnosis_result=request.diagnosis_result)
+        assert rendered == expected
+        assert "{{" not in rendered
+    run_test("feedback prompt matches str.format() (escaped braces)", test_feedback_matches_format)
+
+    def test_hint_fields_interleaved():
+        prompt = CompiledPrompt("t", "A {case} B {turn} C {case} D", turn_fields=("turn",))
+        bound = prompt.bind({"case": "x"})
+        assert bound.chunks == ["A x B ", " C x D"] and bound.slots == ["turn"]
+        assert bound.render(turn="y") == "A x B y C x D"
+        assert ai_service.HINT_PROMPT.case_fields == {"presenting_symptoms", "absent_symptoms",
+                                                      "exam_findings", "diagnosis"}
+    run_test("case fields after a turn field are prerendered too", test_hint_fields_interleaved)
+
+    def test_rejects_unknown_turn_field():
+        try:
+            CompiledPrompt("t", "A {case}", turn_fields=("turn",))
+        except ValueError:
+            return
+        raise AssertionError("expected ValueError")
+    run_test("turn fields must exist in the template", test_rejects_unknown_turn_field)
+
+    print("\n[Caching]")
+
+    def test_case_rendered_once():
+        cache = PromptCache()
+        calls = []
+        request = patient_request()
+        values = lambda: calls.append(1) or {"case_data": "DATA"}
+        first, hit = cache.get(ai_service.PATIENT_PROMPT, request.case, values)
+        assert not hit
+        second, hit = cache.get(ai_service.PATIENT_PROMPT, patient_request(turns=1).case, values)
+        assert hit and second is first and len(calls) == 1
+    run_test("case data is rendered once across turns", test_case_rendered_once)
+
+    def test_edited_case_rebinds():
+        cache = PromptCache()
+        before = patient_request()
+        after = patient_request()
+        after.case.severity = "3/10"
+        old = cached_patient_prompt(cache, before)
+        new = cached_patient_prompt(cache, after)
+        assert "8/10" in old and "3/10" in new and len(cache) == 2
+        bound_old, _ = cache.get(ai_service.PATIENT_PROMPT, before.case, dict)
+        bound_new, _ = cache.get(ai_service.PATIENT_PROMPT, after.case, dict)
+        assert bound_old.digest != bound_new.digest
+    run_test("editing a case gives a new prompt and digest", test_edited_case_rebinds)
+
+    def test_lru():
+        cache = PromptCache(max_entries=2)
+        cases = [patient_request().case.model_copy(update={"case_id": f"case_{i}"}) for i in range(3)]
+        for case in cases[:2]:
+            cache.get(ai_service.PATIENT_PROMPT, case, lambda: {"case_data": ""})
+        cache.get(ai_service.PATIENT_PROMPT, cases[0], dict)
+        cache.get(ai_service.PATIENT_PROMPT, cases[2], lambda: {"case_data": ""})
+        assert cache.get(ai_service.PATIENT_PROMPT, cases[0], dict)[1]
+        assert not cache.get(ai_service.PATIENT_PROMPT, cases[1], lambda: {"case_data": ""})[1]
+    run_test("least recently used case is evicted", test_lru)
+
+    print("\n[Micro-benchmarks]")
+
+    def test_faster_than_format():
+        request = patient_request()
+        cache = PromptCache()
+        legacy = min(timeit.repeat(lambda: legacy_patient_prompt(request), number=500, repeat=5))
+        cached = min(timeit.repeat(lambda: cached_patient_prompt(cache, request), number=500, repeat=5))
+        print(f"    per turn: str.format {legacy / 500 * 1e6:.1f}us, cached {cached / 500 * 1e6:.1f}us "
+              f"({legacy / cached:.1f}x)")
+        assert cached < legacy, "cached prompt rendering should beat str.format()"
+    run_test("cached rendering is faster than str.format()", test_faster_than_format)
+
+    def test_allocates_less():
+        request = patient_request()
+        cache = PromptCache()
+        legacy = peak_allocation(lambda: legacy_patient_prompt(request))
+        cached = peak_allocation(lambda: cached_patient_prompt(cache, request))
+        print(f"    peak allocation per turn: str.format {legacy} B, cached {cached} B")
+        assert cached < legacy, "cached prompt rendering should allocate less than str.format()"
+    run_test("cached rendering allocates less than str.format()", test_allocates_less)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} prompt cache test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
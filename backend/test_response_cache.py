@@ -0,0 +1,106 @@
+"""
+Test suite for the per-case patient response cache
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import ResponseCache, normalize_question
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("RESPONSE CACHE TESTS")
+    print("="*60)
+
+    print("\n[Normalization]")
+
+    def test_normalize():
+        assert normalize_question("So, what brings you in today, doctor?") == ("what", "brings", "in", "today")
+        assert normalize_question("What's wrong?") == normalize_question("what is wrong")
+    run_test("normalize_question", test_normalize)
+
+    print("\n[Lookup]")
+
+    def test_collects_variants_before_serving():
+        cache = ResponseCache(variants=2)
+        cache.put("case_1", "What brings you in today?", "My head hurts.")
+        assert cache.get("case_1", "What brings you in today?") is None
+        cache.put("case_1", "What brings you in today?", "I've had a headache.")
+        assert cache.get("case_1", "What brings you in today?") in ("My head hurts.", "I've had a headache.")
+    run_test("serves only after collecting variants", test_collects_variants_before_serving)
+
+    def test_similar_question_hits():
+        cache = ResponseCache(variants=1)
+        cache.put("case_1", "What brings you in today?", "My head hurts.")
+        assert cache.get("case_1", "Hi, so what brings you in today?") == "My head hurts."
+        assert cache.get("case_1", "Do you have a fever?") is None
+    run_test("questions differing only in filler share an entry", test_similar_question_hits)
+
+    def test_near_miss_misses():
+        cache = ResponseCache(variants=1)
+        cache.put("case_1", "Do you have chest pain when walking?", "Yes, it comes on when I walk.")
+        assert cache.get("case_1", "Do you have chest pain when resting?") is None
+        assert cache.get("case_1", "Do you have chest pain when walking uphill?") is None
+        assert cache.get("case_1", "So do you have chest pain when walking?") == "Yes, it comes on when I walk."
+    run_test("a question differing by one word is not a hit", test_near_miss_misses)
+
+    def test_per_case():
+        cache = ResponseCache(variants=1)
+        cache.put("case_1", "What brings you in today?", "My head hurts.")
+        assert cache.get("case_2", "What brings you in today?") is None
+    run_test("entries are per case", test_per_case)
+
+    def test_history_depth():
+        cache = ResponseCache(max_history=2)
+        assert cache.cacheable(0, "What brings you in?")
+        assert not cache.cacheable(6, "What brings you in?")
+    run_test("only early turns are cacheable", test_history_depth)
+
+    print("\n[Eviction]")
+
+    def test_ttl():
+        cache = ResponseCache(variants=1, ttl=0.01)
+        cache.put("case_1", "What brings you in today?", "My head hurts.")
+        time.sleep(0.02)
+        assert cache.get("case_1", "What brings you in today?") is None
+        assert len(cache) == 0
+    run_test("expired entries are dropped", test_ttl)
+
+    def test_lru():
+        cache = ResponseCache(variants=1, max_entries=2)
+        cache.put("case_1", "What brings you in today?", "a")
+        cache.put("case_2", "What brings you in today?", "b")
+        cache.get("case_1", "What brings you in today?")
+        cache.put("case_3", "What brings you in today?", "c")
+        assert cache.get("case_2", "What brings you in today?") is None
+        assert cache.get("case_1", "What brings you in today?") == "a"
+    run_test("least recently used entry is evicted", test_lru)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} response cache test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
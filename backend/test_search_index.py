@@ -0,0 +1,115 @@
+"""
+Test suite for the in-memory BM25 case search index
+"""
+
+import os
+import sys
+import time
+import random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from search_index import SearchIndex, tokenize
+
+DOCUMENTS = [
+    (1, {"chief_complaint": "Stuffy nose and sore throat", "description": "A viral infection of the nose and throat.",
+         "diagnosis": "Common Cold", "symptoms": "runny nose sore throat"}),
+    (2, {"chief_complaint": "Burning feeling in my chest after meals", "description": "Acid flows back into the esophagus.",
+         "diagnosis": "GERD", "symptoms": "chest pain heartburn"}),
+    (3, {"chief_complaint": "Throbbing headache on one side", "description": "Recurrent headaches, sometimes with chest tightness.",
+         "diagnosis": "Migraine", "symptoms": "headache nausea light sensitivity"}),
+    (4, {"chief_complaint": "Crushing chest pain radiating to my arm", "description": "Blocked coronary artery.",
+         "diagnosis": "Heart Attack", "symptoms": "chest pain sweating"}),
+]
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("SEARCH INDEX TESTS")
+    print("="*60)
+
+    index = SearchIndex(DOCUMENTS)
+    ids = lambda results: [case_id for case_id, _ in results]
+
+    print("\n[Ranking]")
+
+    def test_tokenize():
+        assert tokenize("The pain in MY chest!") == ["pain", "chest"]
+    run_test("tokenize lowercases and drops stopwords", test_tokenize)
+
+    def test_field_weights():
+        results = ids(index.search("migraine "))
+        assert results == [3]
+        # Symptom and complaint hits outrank the passing mention in case 3's description
+        chest = ids(index.search("chest "))
+        assert set(chest[:2]) == {2, 4} and chest[-1] == 3
+    run_test("diagnosis and symptom hits outrank description mentions", test_field_weights)
+
+    def test_multi_word():
+        assert ids(index.search("chest pain sweating "))[0] == 4
+        assert ids(index.search("nose throat", limit=1)) == [1]
+    run_test("documents matching more query words rank first", test_multi_word)
+
+    def test_no_match():
+        assert index.search("zzzz") == [] and index.search("") == [] and index.search("the ") == []
+    run_test("unknown and stopword-only queries return nothing", test_no_match)
+
+    print("\n[Prefix matching]")
+
+    def test_prefix_last_word():
+        assert ids(index.search("migr")) == [3]
+        assert ids(index.search("heart at"))[0] == 4
+        # A trailing space means the last word is complete
+        assert index.search("migr ") == []
+    run_test("last word matches as a prefix while typing", test_prefix_last_word)
+
+    def test_exact_beats_prefix():
+        prefix_index = SearchIndex([(1, {"symptoms": "head"}), (2, {"symptoms": "headache"})])
+        assert ids(prefix_index.search("head")) == [1, 2]
+        assert prefix_index.expand("h", prefix=True) == []
+    run_test("exact terms outrank prefix expansions", test_exact_beats_prefix)
+
+    print("\n[Performance]")
+
+    def test_large_bank():
+        rng = random.Random(7)
+        vocabulary = [f"term{i}" for i in range(3000)] + ["chest", "pain", "fever", "rash", "cough"]
+        docs = [(i, {"description": " ".join(rng.choices(vocabulary, k=80)),
+                     "symptoms": " ".join(rng.choices(vocabulary, k=6))}) for i in range(5000)]
+        start = time.perf_counter()
+        big = SearchIndex(docs)
+        built = time.perf_counter() - start
+        queries = ["chest pain", "fever ra", "term12", "cough te"]
+        start = time.perf_counter()
+        for _ in range(20):
+            for query in queries:
+                assert big.search(query)
+        per_query = (time.perf_counter() - start) / (20 * len(queries))
+        print(f"    5000 cases: built in {built * 1000:.0f}ms, {per_query * 1000:.2f}ms per query")
+        assert per_query < 0.05, "search should answer in milliseconds"
+    run_test("5000-case bank answers in milliseconds", test_large_bank)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} search index test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
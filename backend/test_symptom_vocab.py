@@ -0,0 +1,114 @@
+"""
+Test suite for the canonical symptom vocabulary
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from symptom_vocab import categorize_symptom, get_vocabulary, normalize_phrase, split_negation
+from differential import get_differential_model, mentioned_symptoms
+
+
+def test_all():
+    passed = 0
+    failed = 0
+
+    def run_test(name, test_fn):
+        nonlocal passed, failed
+        try:
+            test_fn()
+            print(f"  PASS: {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {name} - {e}")
+            failed += 1
+
+    print("\n" + "="*60)
+    print("SYMPTOM VOCABULARY TESTS")
+    print("="*60)
+
+    vocab = get_vocabulary()
+    name = lambda phrase, negatable=True: vocab.lookup(phrase, negatable)[0].name
+
+    print("\n[Normalization]")
+
+    def test_normalize():
+        assert normalize_phrase("  Skin_Rash. ") == "skin rash"
+        assert normalize_phrase("- cloudy") == "cloudy"
+        assert normalize_phrase("dischromic  patches") == "dischromic patches"
+        assert split_negation("no high fever") == ("high fever", True)
+        assert split_negation("nose bleed") == ("nose bleed", False)
+    run_test("normalize_phrase and split_negation", test_normalize)
+
+    print("\n[Alias index]")
+
+    def test_aliases():
+        assert name("Diarrhea") == name("diarrhoea") == name("watery diarrhea") == "diarrhoea"
+        assert name("headaches") == name("Headache") == "headache"
+        assert name("coughing") == "cough" and name("rashes") == "skin rash"
+        assert name("fatigue (tiredness)") == name("tired") == "fatigue"
+        assert name("foul smell of urine") == name("foul_smell_of urine") == "foul smell of urine"
+    run_test("variant spellings share one canonical name", test_aliases)
+
+    def test_dataset_keys():
+        assert vocab.lookup("diarrhea")[0].dataset_key == "diarrhoea"
+        assert vocab.lookup("foul smell of urine")[0].dataset_key == "foul_smell_ofurine"
+        assert vocab.lookup("fever")[0].dataset_key is None
+    run_test("canonical terms carry their dataset key", test_dataset_keys)
+
+    def test_negation():
+        term, negated = vocab.lookup("no high fever")
+        assert term.name == "high fever" and negated
+        assert vocab.lookup("denies vomiting")[0].name == "vomiting"
+        assert vocab.lookup("no rebound", negatable=False) == vocab.lookup("No rebound.", negatable=False)
+        assert not vocab.lookup("no rebound", negatable=False)[1]
+    run_test("negated phrases resolve to the symptom they deny", test_negation)
+
+    def test_parse():
+        parsed = vocab.parse("headache  - fever  - chills  - abdominal pain")
+        assert [t.name for t, _ in parsed] == ["headache", "fever", "chills", "abdominal pain"]
+        assert vocab.parse("See description") == () and vocab.parse("a physical exam") == ()
+    run_test("bundled entries split and junk is dropped", test_parse)
+
+    def test_categories():
+        assert vocab.lookup("diarrhea")[0].category == "gastrointestinal"
+        assert vocab.lookup("Cough")[0].category == "respiratory"
+    run_test("terms are categorized once", test_categories)
+
+    def test_category_priority():
+        # Earlier categories win when a name has keywords from several
+        assert categorize_symptom("Fever 38C") == "general"
+        assert categorize_symptom("headache") == "pain"
+        assert categorize_symptom("chest pain") == "pain"
+        assert categorize_symptom("heartburn") == "cardiovascular"
+        assert categorize_symptom("hepatomegaly") == "other"
+    run_test("categorize_symptom keeps keyword priority", test_category_priority)
+
+    print("\n[Runtime matching]")
+
+    def test_resolve():
+        model = get_differential_model()
+        assert model.resolve("diarrhea") == ("diarrhoea",)
+        assert model.resolve("no itching") == () and model.resolve_denied("no itching") == ("itching",)
+        assert model.resolve_denied("itching") == ("itching",)
+        assert set(model.resolve("fever")) == {"high_fever", "mild_fever"}
+    run_test("differential resolves through the vocabulary", test_resolve)
+
+    def test_mentioned():
+        found = mentioned_symptoms(["diarrhoea", "dizziness", "no high fever"], "any diarrhea? feeling dizzy?")
+        assert found == ["diarrhoea", "dizziness"]
+    run_test("aliases count as mentions", test_mentioned)
+
+    print("\n" + "="*60)
+    print(f"RESULTS: {passed} passed, {failed} failed")
+    print("="*60 + "\n")
+
+    assert failed == 0, f"{failed} symptom vocabulary test(s) failed"
+
+
+if __name__ == "__main__":
+    try:
+        test_all()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,107 @@
+"""
+Per-call LLM token and cost accounting
+Every call made through ai_service.call_claude is recorded with its endpoint, case, model,
+token counts (including prompt-cache reads and writes) and latency. Totals are kept in
+per-minute buckets over a rolling window and served by GET /api/admin/usage.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Optional
+
+# USD per million tokens: (input, output, cache write, cache read)
+MODEL_PRICES = {
+    "claude-3-5-haiku-20241022": (0.80, 4.00, 1.00, 0.08),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00, 3.75, 0.30),
+    "claude-3-haiku-20240307": (0.25, 1.25, 0.30, 0.03),
+}
+
+FIELDS = ("calls", "input_tokens", "output_tokens", "cache_creation_tokens", "cache_read_tokens",
+          "latency_seconds", "cost_usd")
+GROUPS = {"endpoint": 0, "case": 1, "model": 2}
+
+
+def call_cost(model: str, input_tokens: int, output_tokens: int, cache_creation: int, cache_read: int) -> float:
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    return (input_tokens * prices[0] + output_tokens * prices[1]
+            + cache_creation * prices[2] + cache_read * prices[3]) / 1_000_000
+
+
+class UsageTracker:
+    """Rolling-window totals keyed by (endpoint, case, model)"""
+
+    def __init__(self, window_seconds: int = 3600, bucket_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        # (bucket start, {(endpoint, case, model): [FIELDS...]}), oldest first
+        self._buckets: deque[tuple[float, dict[tuple[str, str, str], list[float]]]] = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+    def record(self, endpoint: str, case_id: Optional[str], model: str, usage, latency: float) -> dict:
+        """Add one call; `usage` is the Messages API usage object. Returns the call's figures."""
+        figures = {
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_creation_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        }
+        figures["cost_usd"] = call_cost(model, figures["input_tokens"], figures["output_tokens"],
+                                        figures["cache_creation_tokens"], figures["cache_read_tokens"])
+        row = (1, figures["input_tokens"], figures["output_tokens"], figures["cache_creation_tokens"],
+               figures["cache_read_tokens"], latency, figures["cost_usd"])
+
+        now = time.time()
+        start = now - now % self.bucket_seconds
+        key = (endpoint, case_id or "", model)
+        with self._lock:
+            self._expire(now)
+            if not self._buckets or self._buckets[-1][0] != start:
+                self._buckets.append((start, {}))
+            totals = self._buckets[-1][1].setdefault(key, [0.0] * len(FIELDS))
+            for i, value in enumerate(row):
+                totals[i] += value
+        return figures
+
+    def summary(self, window_seconds: Optional[int] = None, group_by: str = "endpoint", limit: int = 20) -> dict:
+        """Totals over the last `window_seconds`, grouped and sorted by cost"""
+        now = time.time()
+        window = min(window_seconds or self.window_seconds, self.window_seconds)
+        index = GROUPS[group_by]
+        groups: dict[str, list[float]] = {}
+        with self._lock:
+            self._expire(now)
+            for start, entries in self._buckets:
+                if start <= now - window - self.bucket_seconds:
+                    continue
+                for key, totals in entries.items():
+                    merged = groups.setdefault(key[index], [0.0] * len(FIELDS))
+                    for i, value in enumerate(totals):
+                        merged[i] += value
+
+        def describe(totals: list[float]) -> dict:
+            row = dict(zip(FIELDS, totals))
+            calls = row["calls"] or 1
+            prompt_tokens = row["input_tokens"] + row["cache_creation_tokens"] + row["cache_read_tokens"]
+            for field in FIELDS[:5]:
+                row[field] = int(row[field])
+            row["avg_latency_ms"] = round(row.pop("latency_seconds") / calls * 1000, 1)
+            row["cost_usd"] = round(row["cost_usd"], 6)
+            # Share of prompt tokens served from the prompt cache
+            row["cache_hit_ratio"] = round(row["cache_read_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0
+            return row
+
+        overall = [sum(column) for column in zip(*groups.values())] if groups else [0.0] * len(FIELDS)
+        ranked = sorted(groups.items(), key=lambda item: item[1][FIELDS.index("cost_usd")], reverse=True)
+        return {
+            "window_seconds": window,
+            "group_by": group_by,
+            "total": describe(overall),
+            "groups": [{group_by: name or None, **describe(totals)} for name, totals in ranked[:limit]],
+        }
@@ -174,6 +174,7 @@ export default function Chat() {
           case_id: caseId,
           conversation,
           student_message: userMessage.content,
+          hints_used: hintsUsed,
         }),
       });
 